@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Compare benchmark results against a stored baseline.
+
+Accepts pytest-benchmark JSON (--benchmark-json) or load_test.py output.
+Exits with status 1 when any timing regressed by more than the tolerance, or
+an endpoint's error rate rose more than the error tolerance above the baseline.
+
+    python benchmarks/compare.py bench_output.json benchmarks/baselines/service.json
+    python benchmarks/compare.py bench_output.json benchmarks/baselines/service.json --update
+"""
+
+import argparse
+import json
+import sys
+
+# Load metrics with this suffix are the fraction of failed requests, not seconds
+ERROR_RATE_SUFFIX = '.error_rate'
+
+def normalize(results):
+    """Flatten a results document into {metric_name: value} (seconds or error rate, lower is better)"""
+    if 'results' in results and 'kind' in results:
+        # Already a stored baseline
+        return dict(results['results'])
+
+    if 'benchmarks' in results:
+        # pytest-benchmark output
+        return {bench['name']: bench['stats']['median'] for bench in results['benchmarks']}
+
+    if 'endpoints' in results:
+        # load_test.py output
+        metrics = {}
+        for endpoint, stats in results['endpoints'].items():
+            if not stats['count']:
+                continue
+            metrics[f"{endpoint}.p50"] = stats['p50_ms'] / 1000
+            metrics[f"{endpoint}.p95"] = stats['p95_ms'] / 1000
+            metrics[f"{endpoint}{ERROR_RATE_SUFFIX}"] = stats.get('errors', 0) / stats['count']
+        return metrics
+
+    raise ValueError("Unrecognized results format")
+
+def compare(current, baseline, tolerance, error_tolerance=0.01):
+    """Return (rows, regressions) comparing current metrics against the baseline"""
+    rows = []
+    regressions = []
+    for name in sorted(set(current) | set(baseline)):
+        if name not in baseline or name not in current:
+            rows.append((name, baseline.get(name), current.get(name), None))
+            continue
+        if name.endswith(ERROR_RATE_SUFFIX):
+            # Baseline error rates are usually 0, so compare the absolute increase rather than a ratio
+            rows.append((name, baseline[name], current[name], None))
+            if current[name] - baseline[name] > error_tolerance:
+                regressions.append(name)
+            continue
+        ratio = current[name] / baseline[name] if baseline[name] else float('inf')
+        rows.append((name, baseline[name], current[name], ratio))
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return rows, regressions
+
+def _format_value(name, value):
+    if value is None:
+        return '-'
+    if name.endswith(ERROR_RATE_SUFFIX):
+        return f"{value:.2%}"
+    return f"{value * 1000:.3f}ms"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('results', help='Results JSON file')
+    parser.add_argument('baseline', help='Baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown ratio before failing (default: 0.25 = 25%%)')
+    parser.add_argument('--error-tolerance', type=float, default=0.01,
+                        help='Allowed error rate increase before failing (default: 0.01 = 1 point)')
+    parser.add_argument('--update', action='store_true', help='Overwrite the baseline with these results')
+    args = parser.parse_args(argv)
+
+    with open(args.results) as f:
+        results = json.load(f)
+    current = normalize(results)
+
+    if args.update:
+        kind = 'load' if 'endpoints' in results else 'microbenchmark'
+        with open(args.baseline, 'w') as f:
+            json.dump({"kind": kind, "unit": "seconds", "results": current}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline written to {args.baseline} ({len(current)} metrics)")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = normalize(json.load(f))
+
+    rows, regressions = compare(current, baseline, args.tolerance, args.error_tolerance)
+    print(f"{'metric':<60} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for name, base, cur, ratio in rows:
+        ratio_text = '-' if ratio is None else f"{ratio:.2f}x"
+        marker = '  REGRESSION' if name in regressions else ''
+        print(f"{name:<60} {_format_value(name, base):>12} {_format_value(name, cur):>12} {ratio_text:>8}{marker}")
+
+    if regressions:
+        limits = f"{args.tolerance:.0%}"
+        if any(name.endswith(ERROR_RATE_SUFFIX) for name in current):
+            limits += f" (error rates by more than {args.error_tolerance:.0%})"
+        print(f"\n{len(regressions)} metric(s) regressed by more than {limits}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
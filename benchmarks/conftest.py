@@ -0,0 +1,36 @@
+import os
+import pytest
+from wellness_tracking.main import create_app
+from wellness_tracking.repository import db
+from data_generator import populate, user_ids
+
+BENCH_USERS = int(os.getenv('BENCH_USERS', '50'))
+BENCH_DAYS = int(os.getenv('BENCH_DAYS', '365'))
+
+@pytest.fixture(scope='session')
+def bench_app(tmp_path_factory):
+    """Application backed by a file database populated with synthetic data"""
+    db_file = tmp_path_factory.mktemp('bench') / 'bench.db'
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_file}'
+    })
+
+    with app.app_context():
+        db.create_all(bind_key=None)
+        populate(db, BENCH_USERS, BENCH_DAYS)
+        # Build metrics rows up front so writes are measured in steady state, not on first-write backfills
+        app.extensions['metrics_backfill'].backfill_all()
+        yield app
+        db.session.remove()
+
+@pytest.fixture
+def bench_context(bench_app):
+    """Push an application context for a single benchmark"""
+    with bench_app.app_context():
+        yield bench_app
+        db.session.remove()
+
+@pytest.fixture(scope='session')
+def bench_user_ids():
+    return user_ids(BENCH_USERS)
@@ -0,0 +1,67 @@
+"""
+Synthetic data generator for benchmarks and load tests.
+Produces N users x M days x activity types of deterministic wellness data.
+"""
+
+import random
+from datetime import date, datetime, timedelta
+
+ACTIVITY_UNITS = {
+    "meditation": "minutes",
+    "workout": "minutes",
+    "hydration": "liters",
+    "sleep": "hours",
+    "running": "minutes",
+    "walking": "minutes"
+}
+
+VALUE_RANGES = {
+    "meditation": (5.0, 45.0),
+    "workout": (10.0, 90.0),
+    "hydration": (0.5, 3.5),
+    "sleep": (4.0, 10.0),
+    "running": (10.0, 60.0),
+    "walking": (10.0, 120.0)
+}
+
+def user_ids(n_users, prefix="bench_user"):
+    """Deterministic user ids"""
+    return [f"{prefix}_{i}" for i in range(n_users)]
+
+def generate_activities(n_users, n_days, activity_types=None, end_date=None, seed=42):
+    """Yield activity records for n_users over the n_days ending at end_date"""
+    rng = random.Random(seed)
+    activity_types = activity_types or list(ACTIVITY_UNITS)
+    end_date = end_date or date.today()
+
+    for user_id in user_ids(n_users):
+        for offset in range(n_days):
+            activity_date = end_date - timedelta(days=offset)
+            for activity_type in activity_types:
+                low, high = VALUE_RANGES[activity_type]
+                yield {
+                    "user_id": user_id,
+                    "date": activity_date.isoformat(),
+                    "activity_type": activity_type,
+                    "value": round(rng.uniform(low, high), 1),
+                    "unit": ACTIVITY_UNITS[activity_type]
+                }
+
+def populate(db, n_users, n_days, activity_types=None, end_date=None, seed=42, chunk_size=5000):
+    """Bulk insert generated activities into the database, returns the number of rows"""
+    from wellness_tracking.repository import WellnessActivity
+
+    created_at = datetime.utcnow()
+    rows = 0
+    chunk = []
+    for record in generate_activities(n_users, n_days, activity_types, end_date, seed):
+        chunk.append(dict(record, date=date.fromisoformat(record["date"]), created_at=created_at))
+        if len(chunk) >= chunk_size:
+            db.session.execute(WellnessActivity.__table__.insert(), chunk)
+            rows += len(chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(WellnessActivity.__table__.insert(), chunk)
+        rows += len(chunk)
+    db.session.commit()
+    return rows
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+HTTP load scenario for the wellness tracking service.
+
+Drives a weighted mix of log / sync / history / summary requests from a pool
+of worker threads and records per-endpoint latency percentiles as JSON.
+
+Against running services (python start_server.py):
+    python benchmarks/load_test.py --base-url http://localhost:5000
+
+Self-contained (starts the app and the local mock device API in-process):
+    python benchmarks/load_test.py --spawn --output load_output.json
+    python benchmarks/compare.py load_output.json benchmarks/baselines/load.json
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_generator import ACTIVITY_UNITS, populate, user_ids  # noqa: E402
+
+DEFAULT_MIX = "log=40,history=25,summary=25,sync=10"
+SUMMARY_PERIODS = ('week', 'month', 'year')
+
+def parse_mix(mix):
+    """Parse 'log=40,history=25,...' into (names, weights)"""
+    names, weights = [], []
+    for part in mix.split(','):
+        name, weight = part.split('=')
+        names.append(name.strip())
+        weights.append(float(weight))
+    return names, weights
+
+def _request(session, base_url, operation, user_id, rng):
+    if operation == 'log':
+        activity_type = rng.choice(list(ACTIVITY_UNITS))
+        return session.post(f"{base_url}/api/activities", json={
+            "user_id": user_id,
+            "activity_type": activity_type,
+            "value": round(rng.uniform(1.0, 60.0), 1),
+            "unit": ACTIVITY_UNITS[activity_type]
+        })
+    if operation == 'history':
+        return session.get(f"{base_url}/api/activities/{user_id}")
+    if operation == 'summary':
+        return session.get(f"{base_url}/api/summary/{user_id}", params={"period": rng.choice(SUMMARY_PERIODS)})
+    if operation == 'sync':
+        return session.post(f"{base_url}/api/sync-device", json={"user_id": user_id})
+    raise ValueError(f"Unknown operation: {operation}")
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_load(base_url, duration, concurrency, users, mix, seed=1):
+    """Run the scenario and return the results document"""
+    names, weights = parse_mix(mix)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_id):
+        rng = random.Random(seed + worker_id)
+        session = requests.Session()
+        local_latencies = defaultdict(list)
+        local_errors = defaultdict(int)
+        while time.perf_counter() < deadline:
+            operation = rng.choices(names, weights)[0]
+            user_id = rng.choice(users)
+            started = time.perf_counter()
+            try:
+                response = _request(session, base_url, operation, user_id, rng)
+                failed = response.status_code >= 400
+            except requests.RequestException:
+                failed = True
+            local_latencies[operation].append((time.perf_counter() - started) * 1000)
+            if failed:
+                local_errors[operation] += 1
+        with lock:
+            for operation, values in local_latencies.items():
+                latencies[operation].extend(values)
+            for operation, count in local_errors.items():
+                errors[operation] += count
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    total = 0
+    for operation in names:
+        values = sorted(latencies[operation])
+        total += len(values)
+        endpoints[operation] = {
+            "count": len(values),
+            "errors": errors[operation],
+            "mean_ms": round(sum(values) / len(values), 3) if values else 0.0,
+            "p50_ms": round(_percentile(values, 50), 3),
+            "p95_ms": round(_percentile(values, 95), 3),
+            "p99_ms": round(_percentile(values, 99), 3)
+        }
+
+    return {
+        "scenario": {"mix": mix, "duration_s": duration, "concurrency": concurrency, "users": len(users)},
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "endpoints": endpoints
+    }
+
+def _load_mock_app():
+    """Import the mock device API module from mock-service/"""
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mock-service', 'mock_api.py')
+    spec = importlib.util.spec_from_file_location('mock_api', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.app
+
+def _serve(app):
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+def spawn_services(n_users, n_days):
+    """Start the mock device API and the wellness app in-process, returns (base_url, shutdown)"""
+    from wellness_tracking.main import create_app
+    from wellness_tracking.repository import db
+
+    mock_server, mock_url = _serve(_load_mock_app())
+
+    workdir = tempfile.mkdtemp(prefix='wellness-load-')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'load.db')}",
+        'DEVICE_API_BASE': mock_url
+    })
+    with app.app_context():
+        db.create_all(bind_key=None)
+        populate(db, n_users, n_days)
+
+    app_server, app_url = _serve(app)
+
+    def shutdown():
+        app_server.shutdown()
+        mock_server.shutdown()
+
+    return app_url, shutdown
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--spawn', action='store_true', help='Start the app and mock device API in-process')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run (default: 10)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--days', type=int, default=90, help='Days of history to seed with --spawn')
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--output', default='load_output.json')
+    args = parser.parse_args(argv)
+
+    base_url, shutdown = args.base_url, None
+    if args.spawn:
+        base_url, shutdown = spawn_services(args.users, args.days)
+
+    try:
+        results = run_load(base_url, args.duration, args.concurrency, user_ids(args.users), args.mix)
+    finally:
+        if shutdown:
+            shutdown()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+        f.write('\n')
+
+    print(f"{results['requests']} requests in {results['elapsed_s']}s ({results['throughput_rps']} req/s)")
+    for operation, stats in results['endpoints'].items():
+        print(f"  {operation:<8} n={stats['count']:<6} err={stats['errors']:<4} "
+              f"p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms")
+    print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+Microbenchmarks for each ActivityService method.
+
+Run with:
+    python -m pytest benchmarks/ --benchmark-json=bench_output.json
+    python benchmarks/compare.py bench_output.json benchmarks/baselines/service.json
+"""
+
+import itertools
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from wellness_tracking.service import ActivityService
+from data_generator import generate_activities
+
+def _cycle(values):
+    iterator = itertools.cycle(values)
+    return lambda: next(iterator)
+
+def test_log_activity(benchmark, bench_context, bench_user_ids):
+    next_user = _cycle(bench_user_ids)
+    benchmark(lambda: ActivityService.log_activity(next_user(), 'meditation', 15.0, 'minutes'))
+
+def test_get_user_activities(benchmark, bench_context, bench_user_ids):
+    next_user = _cycle(bench_user_ids)
+    benchmark(lambda: ActivityService.get_user_activities(next_user()))
+
+def test_get_user_activities_filtered(benchmark, bench_context, bench_user_ids):
+    next_user = _cycle(bench_user_ids)
+    result = benchmark(lambda: ActivityService.get_user_activities(
+        next_user(), activity_type='running'))
+    assert result['activities']
+
+@pytest.mark.parametrize('period', ['week', 'month', 'year'])
+def test_get_user_summary(benchmark, bench_context, bench_user_ids, period):
+    next_user = _cycle(bench_user_ids)
+    benchmark(lambda: ActivityService.get_user_summary(next_user(), period=period))
+
+def test_sync_device_data(benchmark, bench_context):
+    # One week of device data per sync, matching the mock device API
+    device_data = list(generate_activities(1, 7, ['running', 'sleep'], seed=7))
+    user_id = device_data[0]['user_id']
+    benchmark(lambda: ActivityService.sync_device_data(user_id, device_data))
+
+def test_get_sync_status(benchmark, bench_context, bench_user_ids):
+    next_user = _cycle(bench_user_ids)
+    benchmark(lambda: ActivityService.get_sync_status(next_user()))
@@ -0,0 +1,36 @@
+"""
+Validation cost per 100k records for the single/batch and device-sync validators.
+
+Run with:
+    python -m pytest benchmarks/test_validation_benchmarks.py --benchmark-json=bench_output.json
+"""
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from wellness_tracking.service import ACTIVITY_VALIDATOR, DEVICE_RECORD_VALIDATOR
+from data_generator import generate_activities
+
+VALIDATION_RECORDS = 100000
+
+@pytest.fixture(scope='module')
+def device_records():
+    # 100 users x ~167 days x 6 types, one in every 50 rows made invalid
+    records = []
+    for index, record in enumerate(generate_activities(100, VALIDATION_RECORDS // 600 + 1, seed=11)):
+        if len(records) == VALIDATION_RECORDS:
+            break
+        if index % 50 == 0:
+            record = dict(record, activity_type='flying')
+        records.append(record)
+    return records
+
+def test_validate_activities_100k(benchmark, device_records):
+    valid, rejected = benchmark.pedantic(ACTIVITY_VALIDATOR.partition, args=(device_records,), rounds=5)
+    assert len(valid) + len(rejected) == VALIDATION_RECORDS
+    assert len(rejected) == VALIDATION_RECORDS // 50
+
+def test_validate_device_records_100k(benchmark, device_records):
+    valid, rejected = benchmark.pedantic(DEVICE_RECORD_VALIDATOR.partition, args=(device_records,), rounds=5)
+    assert len(rejected) == VALIDATION_RECORDS // 50
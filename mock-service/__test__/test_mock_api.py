@@ -0,0 +1,72 @@
+import importlib.util
+import gzip
+import json
+import os
+import pytest
+
+_spec = importlib.util.spec_from_file_location(
+    'mock_api', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mock_api.py'))
+mock_api = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(mock_api)
+
+@pytest.fixture
+def client():
+    mock_api.app.config['TESTING'] = True
+    return mock_api.app.test_client()
+
+def _get(client, query, **kwargs):
+    response = client.get(f'/device-activity?{query}', **kwargs)
+    return response, response.get_data()
+
+def test_default_response_is_a_week_newest_first(client):
+    """Test the default response keeps the original shape: one week, newest first"""
+    response, body = _get(client, 'user_id=u1&end_date=2025-01-10')
+    records = json.loads(body)
+    dates = [record['date'] for record in records]
+    assert response.status_code == 200
+    assert dates[0] == '2025-01-10' and dates[-1] == '2025-01-04'
+    assert dates == sorted(dates, reverse=True)
+    assert all(record['user_id'] == 'u1' for record in records)
+
+def test_data_is_deterministic_per_user(client):
+    """Test the same user and seed always get the same records"""
+    _, first = _get(client, 'user_id=u1&end_date=2025-01-10&days=30')
+    _, second = _get(client, 'user_id=u1&end_date=2025-01-10&days=30')
+    _, other = _get(client, 'user_id=u2&end_date=2025-01-10&days=30')
+    assert first == second
+    assert first != other
+
+def test_cursor_pagination_covers_history(client):
+    """Test following X-Next-Cursor returns every record exactly once, oldest first"""
+    _, body = _get(client, 'user_id=u1&end_date=2025-01-10&days=365')
+    expected = sorted(json.loads(body), key=lambda record: record['date'])
+
+    pages, cursor = [], None
+    while True:
+        query = 'user_id=u1&end_date=2025-01-10&days=365&limit=100' + (f'&cursor={cursor}' if cursor else '')
+        response, body = _get(client, query)
+        pages.extend(json.loads(body))
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+    assert [r['date'] for r in pages] == [r['date'] for r in expected]
+    assert len(pages) == len(expected)
+
+def test_since_ndjson_and_gzip(client):
+    """Test since filtering, NDJSON output and gzip encoding"""
+    response, body = _get(client, 'user_id=u1&end_date=2025-01-10&days=365&since=2025-01-08&format=ndjson',
+                          headers={'Accept-Encoding': 'gzip'})
+    assert response.mimetype == 'application/x-ndjson'
+    # Two days of records are below the gzip threshold
+    assert 'Content-Encoding' not in response.headers
+    records = [json.loads(line) for line in body.decode().splitlines()]
+    assert {record['date'] for record in records} == {'2025-01-09', '2025-01-10'}
+
+    response, body = _get(client, 'user_id=u1&days=365', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(json.loads(gzip.decompress(body))) >= 365
+
+def test_error_injection(client):
+    """Test injected errors return 5xx"""
+    response, _ = _get(client, 'user_id=u1&error_rate=1')
+    assert response.status_code in (500, 503)
@@ -1,43 +1,204 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from datetime import date, timedelta
+import base64
+import json
+import os
 import random
+import time
+import zlib
+
+# Activity types the device reports, with their unit and value range
+DEVICE_ACTIVITIES = {
+    "running": ("minutes", 10.0, 60.0),
+    "walking": ("minutes", 10.0, 120.0),
+    "workout": ("minutes", 15.0, 90.0),
+    "meditation": ("minutes", 5.0, 30.0),
+    "hydration": ("liters", 1.0, 3.0),
+    "sleep": ("hours", 6.0, 9.0)
+}
+ACTIVITY_NAMES = sorted(DEVICE_ACTIVITIES)
+
+# Defaults, overridable per process through the environment and per request through query parameters
+SEED = int(os.getenv('MOCK_SEED', '42'))
+DEFAULT_DAYS = int(os.getenv('MOCK_DEFAULT_DAYS', '7'))
+MAX_DAYS = int(os.getenv('MOCK_MAX_DAYS', '3650'))
+MAX_PAGE_SIZE = int(os.getenv('MOCK_MAX_PAGE_SIZE', '10000'))
+LATENCY_MS = float(os.getenv('MOCK_LATENCY_MS', '0'))
+LATENCY_JITTER_MS = float(os.getenv('MOCK_LATENCY_JITTER_MS', '0'))
+ERROR_RATE = float(os.getenv('MOCK_ERROR_RATE', '0'))
+DRIP_MS = float(os.getenv('MOCK_DRIP_MS', '0'))
+GZIP_MIN_BYTES = int(os.getenv('MOCK_GZIP_MIN_BYTES', '1024'))
 
 app = Flask(__name__)
 
-activity_type = ["running", "walking", "hydration_liters", "meditation", "sleep"]
+# Chaos decisions must not disturb the seeded data, so they use their own generator
+_chaos = random.Random()
+
+
+def day_records(user_id, day, seed=SEED):
+    """Deterministic device records for one user and day (1-3 activities)"""
+    rng = random.Random(f"{seed}:{user_id}:{day.isoformat()}")
+    records = []
+    for activity_type in rng.sample(ACTIVITY_NAMES, rng.randint(1, 3)):
+        unit, low, high = DEVICE_ACTIVITIES[activity_type]
+        records.append({
+            "user_id": user_id,
+            "date": day.isoformat(),
+            "activity_type": activity_type,
+            "value": round(rng.uniform(low, high), 1),
+            "unit": unit
+        })
+    return records
+
+
+def encode_cursor(day, index):
+    return base64.urlsafe_b64encode(f"{day.toordinal()}:{index}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    ordinal, index = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+    return date.fromordinal(int(ordinal)), int(index)
+
+
+def iter_records(user_id, start, end, seed=SEED, newest_first=False, after=None):
+    """Yield (day, index, record) for days in [start, end], optionally resuming after a cursor position"""
+    span = range((end - start).days + 1)
+    offsets = reversed(span) if newest_first else span
+    for offset in offsets:
+        day = start + timedelta(days=offset)
+        if after is not None and day < after[0]:
+            continue
+        for index, record in enumerate(day_records(user_id, day, seed)):
+            if after is not None and (day, index) <= after:
+                continue
+            yield day, index, record
+
+
+def _param(name, default, cast=float):
+    value = request.args.get(name)
+    return default if value is None else cast(value)
+
+
+def _inject_latency():
+    latency = _param('latency_ms', LATENCY_MS)
+    jitter = _param('jitter_ms', LATENCY_JITTER_MS)
+    delay = latency + (_chaos.uniform(0, jitter) if jitter else 0)
+    if delay > 0:
+        time.sleep(delay / 1000)
+
+
+def _injected_error():
+    error_rate = _param('error_rate', ERROR_RATE)
+    if error_rate and _chaos.random() < error_rate:
+        if _chaos.random() < 0.5:
+            response = jsonify({"error": "Device API temporarily unavailable"})
+            response.status_code = 503
+            response.headers['Retry-After'] = '1'
+            return response
+        return jsonify({"error": "Internal device API error"}), 500
+    return None
+
+
+def _render(records, ndjson, drip_seconds):
+    """Yield the response body in chunks, one record per chunk"""
+    if ndjson:
+        for record in records:
+            yield json.dumps(record) + '\n'
+            if drip_seconds:
+                time.sleep(drip_seconds)
+        return
+
+    yield '['
+    for position, record in enumerate(records):
+        yield (',' if position else '') + json.dumps(record)
+        if drip_seconds:
+            time.sleep(drip_seconds)
+    yield ']'
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
 
 @app.route('/device-activity', methods=['GET'])
 def get_device_activity():
-    """Mock device activity data API"""
+    """Mock device activity data API
+
+    Query parameters:
+        user_id     user to generate data for
+        days        history length in days, ending at end_date (default 7, up to MOCK_MAX_DAYS)
+        end_date    last day of history (default today)
+        since       only return records after this date (YYYY-MM-DD)
+        limit       page size; enables cursor pagination (oldest first, X-Next-Cursor header)
+        cursor      continue after a previous page
+        seed        override the data seed
+        format      json (default) or ndjson
+        latency_ms, jitter_ms, error_rate, drip_ms    fault injection
+    """
     user_id = request.args.get('user_id', 'default_user')
-    
-    # Generate mock data
-    device_data = []
-    
-    # Generate data for the last 7 days
-    for i in range(7):
-        activity_date = date.today() - timedelta(days=i)
-        
-        # Simulate different activity data
-        data = {
-            "user_id": user_id,
-            "date": activity_date.isoformat(),
-            "activity_type": random.choice(activity_type),
-            "value": round(random.uniform(1.0, 3.0), 1),
-            "unit": "minutes"
-            # "hydration_liters": round(random.uniform(1.0, 3.0), 1),
-            # "sleep_hours": round(random.uniform(6.0, 9.0), 1),
-            # "exercise_minutes": random.randint(0, 60),
-            # "meditation_minutes": random.randint(0, 30)
-        }
-        device_data.append(data)
-    
-    return jsonify(device_data)
+
+    _inject_latency()
+    error = _injected_error()
+    if error is not None:
+        return error
+
+    try:
+        days = min(_param('days', DEFAULT_DAYS, int), MAX_DAYS)
+        end = date.fromisoformat(request.args['end_date']) if request.args.get('end_date') else date.today()
+        start = end - timedelta(days=max(days, 1) - 1)
+        if request.args.get('since'):
+            start = max(start, date.fromisoformat(request.args['since']) + timedelta(days=1))
+        seed = _param('seed', SEED, int)
+        limit = _param('limit', None, int)
+        after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+
+    headers = {}
+    if limit is None and after is None:
+        # Unpaginated responses keep the original newest-first order
+        records = (record for _, _, record in iter_records(user_id, start, end, seed, newest_first=True))
+        expected_records = 2 * ((end - start).days + 1)
+    else:
+        limit = max(1, min(limit or MAX_PAGE_SIZE, MAX_PAGE_SIZE))
+        page = []
+        for day, index, record in iter_records(user_id, start, end, seed, after=after):
+            if len(page) == limit:
+                headers['X-Next-Cursor'] = encode_cursor(*last)
+                break
+            page.append(record)
+            last = (day, index)
+        records = iter(page)
+        expected_records = len(page)
+
+    wants_ndjson = request.args.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best == 'application/x-ndjson'
+    drip_seconds = _param('drip_ms', DRIP_MS) / 1000
+    body = _render(records, wants_ndjson, drip_seconds)
+
+    # Bodies are streamed, so estimate their size (~100 bytes per record) to skip gzip for small ones
+    if 'gzip' in request.headers.get('Accept-Encoding', '') and expected_records * 100 >= GZIP_MIN_BYTES:
+        body = _gzip(body)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+
+    mimetype = 'application/x-ndjson' if wants_ndjson else 'application/json'
+    return Response(body, mimetype=mimetype, headers=headers)
+
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check"""
     return jsonify({"status": "healthy", "service": "mock-device-api"})
 
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5001)
+    # For load tests run it under a multi-worker server instead, e.g.:
+    #   gunicorn -w 4 -b 0.0.0.0:5001 mock_api:app
+    app.run(debug=True, host='0.0.0.0', port=5001, threaded=True)
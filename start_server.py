@@ -14,15 +14,9 @@ def start_services():
     """Start both wellness tracking service and mock service"""
     print("Starting Wellness Tracking Services...")
     
-    # Change to wellness-tracking directory
-    os.chdir('wellness_tracking')
-    
     # Start wellness tracking service
     print("Starting Wellness Tracking Service on port 5000...")
-    wellness_process = subprocess.Popen([sys.executable, 'main.py'])
-    
-    # Change back to root directory
-    os.chdir('..')
+    wellness_process = subprocess.Popen([sys.executable, '-m', 'wellness_tracking.main'])
     
     # Change to mock-service directory
     os.chdir('mock-service')
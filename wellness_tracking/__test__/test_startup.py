@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from wellness_tracking.main import create_app
+from wellness_tracking.repository import db
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Cumulative import time allowed for wellness_tracking.main, override for slow CI machines
+IMPORT_TIME_BUDGET_MS = float(os.getenv('IMPORT_TIME_BUDGET_MS', '1500'))
+
+def _run_python(*args):
+    return subprocess.run([sys.executable, *args], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+
+def _cumulative_import_ms(stderr, module):
+    """Extract a module's cumulative time from `python -X importtime` output"""
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.strip() == module:
+            return int(cumulative) / 1000
+    raise AssertionError(f"{module} not found in importtime output")
+
+def test_import_time_budget():
+    """Test importing the app module stays within the startup budget"""
+    # Best of three, so a busy machine (e.g. parallel test workers) does not count against the budget
+    elapsed_ms = min(
+        _cumulative_import_ms(_run_python('-X', 'importtime', '-c', 'import wellness_tracking.main').stderr,
+                              'wellness_tracking.main')
+        for _ in range(3)
+    )
+    assert elapsed_ms <= IMPORT_TIME_BUDGET_MS, \
+        f"importing wellness_tracking.main took {elapsed_ms:.0f}ms (budget {IMPORT_TIME_BUDGET_MS:.0f}ms)"
+
+def test_import_has_no_side_effects():
+    """Test importing the app loads no HTTP client or dotenv and leaves sys.path alone"""
+    result = _run_python('-c', (
+        'import sys; before = list(sys.path); import wellness_tracking.main; '
+        'print(sorted(m for m in ("requests", "dotenv") if m in sys.modules)); '
+        'print(sys.path == before)'
+    ))
+    loaded, path_unchanged = result.stdout.splitlines()
+    assert loaded == '[]'
+    assert path_unchanged == 'True'
+
+def test_schema_creation_is_gated():
+    """Test create_app skips DDL when AUTO_CREATE_SCHEMA is off"""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'AUTO_CREATE_SCHEMA': False
+    })
+    with app.app_context():
+        assert not db.inspect(db.engine).get_table_names()
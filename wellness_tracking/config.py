@@ -0,0 +1,107 @@
+import json
+import os
+from functools import lru_cache
+
+# Project root, used for the default SQLite location
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def env_flag(name, default=False):
+    """Read a boolean flag from the environment"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+@lru_cache(maxsize=None)
+def load_config():
+    """Load environment variables (.env included) into a config mapping, once per process"""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    # Use absolute path to avoid multiple instance folders
+    db_path = os.path.join(BASE_DIR, 'instance', 'wellness.db')
+    # One shard bind (shard0, shard1, ...) per comma-separated URL; sharding is off when empty
+    shard_urls = [url.strip() for url in os.getenv('SHARD_DATABASE_URLS', '').split(',') if url.strip()]
+
+    config = {
+        'SQLALCHEMY_DATABASE_URI': os.getenv('DATABASE_URL', f'sqlite:///{db_path}'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        # Run db.create_all() at startup; turn off for workers of an already migrated database
+        'AUTO_CREATE_SCHEMA': env_flag('AUTO_CREATE_SCHEMA', True),
+        # User-keyed tables are spread over these binds by consistent hashing; the default
+        # database keeps the shard directory. Each bind gets its own connection pool.
+        'SQLALCHEMY_BINDS': {f'shard{i}': url for i, url in enumerate(shard_urls)},
+        'SHARD_BINDS': [f'shard{i}' for i in range(len(shard_urls))],
+        'SHARD_VNODES': int(os.getenv('SHARD_VNODES', '64')),
+        'SHARD_DIRECTORY_TTL': float(os.getenv('SHARD_DIRECTORY_TTL', '5')),
+        # Timezone for users who have not set one
+        'DEFAULT_TIMEZONE': os.getenv('DEFAULT_TIMEZONE', 'UTC'),
+        # Users whose timezone each worker keeps cached
+        'TIMEZONE_CACHE_SIZE': int(os.getenv('TIMEZONE_CACHE_SIZE', '10000')),
+        'DEVICE_API_BASE': os.getenv('DEVICE_API_BASE', 'http://localhost:5001'),
+        # Seconds to connect to the device API, and to wait for each read of its response
+        'DEVICE_API_CONNECT_TIMEOUT': float(os.getenv('DEVICE_API_CONNECT_TIMEOUT', '5')),
+        'DEVICE_API_READ_TIMEOUT': float(os.getenv('DEVICE_API_READ_TIMEOUT', '30')),
+        # Device sync inserts this many records per statement; responses list at most SYNC_RESPONSE_PREVIEW
+        'SYNC_CHUNK_SIZE': int(os.getenv('SYNC_CHUNK_SIZE', '1000')),
+        'SYNC_RESPONSE_PREVIEW': int(os.getenv('SYNC_RESPONSE_PREVIEW', '100')),
+        'BATCH_MAX_ACTIVITIES': int(os.getenv('BATCH_MAX_ACTIVITIES', '1000')),
+        # Daily goals per activity type as JSON, e.g. {"hydration": 2.5}; merged over the defaults
+        'ACTIVITY_GOALS': json.loads(os.getenv('ACTIVITY_GOALS', '{}')),
+
+        # Activity change feed (/api/stream)
+        'STREAM_HEARTBEAT_SECONDS': float(os.getenv('STREAM_HEARTBEAT_SECONDS', '15')),
+        'STREAM_MAX_SECONDS': float(os.getenv('STREAM_MAX_SECONDS', '300')),
+        'LONG_POLL_TIMEOUT': float(os.getenv('LONG_POLL_TIMEOUT', '25')),
+
+        # Profiling configuration (disabled unless explicitly turned on)
+        'PROFILER_ENABLED': env_flag('PROFILER_ENABLED'),
+        'PROFILER_SECRET': os.getenv('PROFILER_SECRET'),
+        'PROFILER_ADMIN_TOKEN': os.getenv('PROFILER_ADMIN_TOKEN'),
+        'PROFILER_SAMPLE_RATE': float(os.getenv('PROFILER_SAMPLE_RATE', '0')),
+        'PROFILER_ENGINE': os.getenv('PROFILER_ENGINE', 'cprofile'),
+        'PROFILER_MAX_PROFILES': int(os.getenv('PROFILER_MAX_PROFILES', '50')),
+
+        # Write-behind buffering for activity logging (disabled by default)
+        'WRITE_BEHIND_ENABLED': env_flag('WRITE_BEHIND_ENABLED'),
+        'WRITE_BEHIND_FLUSH_MS': int(os.getenv('WRITE_BEHIND_FLUSH_MS', '200')),
+        'WRITE_BEHIND_MAX_ROWS': int(os.getenv('WRITE_BEHIND_MAX_ROWS', '500')),
+        'WRITE_BEHIND_MAX_PENDING': int(os.getenv('WRITE_BEHIND_MAX_PENDING', '10000')),
+        'WRITE_BEHIND_JOURNAL': os.getenv('WRITE_BEHIND_JOURNAL'),
+        'WRITE_BEHIND_FSYNC': env_flag('WRITE_BEHIND_FSYNC'),
+
+        # Transactional outbox: post-write events commit with the write and are delivered in the background
+        'OUTBOX_ENABLED': env_flag('OUTBOX_ENABLED'),
+        'OUTBOX_BATCH_SIZE': int(os.getenv('OUTBOX_BATCH_SIZE', '100')),
+        'OUTBOX_INTERVAL_MS': int(os.getenv('OUTBOX_INTERVAL_MS', '200')),
+        'OUTBOX_MAX_ATTEMPTS': int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8')),
+        'OUTBOX_RETRY_BASE_MS': int(os.getenv('OUTBOX_RETRY_BASE_MS', '500')),
+        'OUTBOX_LEASE_SECONDS': float(os.getenv('OUTBOX_LEASE_SECONDS', '30')),
+
+        # Background rebuilds of derived metrics rows, kept off the write path
+        'METRICS_BACKFILL_ENABLED': env_flag('METRICS_BACKFILL_ENABLED', True),
+        'METRICS_BACKFILL_BATCH_SIZE': int(os.getenv('METRICS_BACKFILL_BATCH_SIZE', '100')),
+        'METRICS_BACKFILL_INTERVAL_MS': int(os.getenv('METRICS_BACKFILL_INTERVAL_MS', '1000')),
+
+        # In-process hot-user activity store (disabled by default; single worker or sticky routing only)
+        'HOT_STORE_ENABLED': env_flag('HOT_STORE_ENABLED'),
+        'HOT_STORE_WINDOW_DAYS': int(os.getenv('HOT_STORE_WINDOW_DAYS', '90')),
+        'HOT_STORE_MEMORY_BYTES': int(os.getenv('HOT_STORE_MEMORY_BYTES', str(64 * 1024 * 1024))),
+        'HOT_STORE_ADMIT_AFTER': int(os.getenv('HOT_STORE_ADMIT_AFTER', '2')),
+        'HOT_STORE_MAX_STRINGS': int(os.getenv('HOT_STORE_MAX_STRINGS', '4096')),
+
+        # Response compression for buffered JSON/MessagePack bodies (br needs the optional brotli package)
+        'COMPRESSION_ENABLED': env_flag('COMPRESSION_ENABLED', True),
+        'COMPRESSION_MIN_BYTES': int(os.getenv('COMPRESSION_MIN_BYTES', '1024')),
+        'COMPRESSION_GZIP_LEVEL': int(os.getenv('COMPRESSION_GZIP_LEVEL', '6')),
+        'COMPRESSION_BROTLI_QUALITY': int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5')),
+
+        # Rate limiting and load shedding (disabled by default)
+        'RATE_LIMIT_ENABLED': env_flag('RATE_LIMIT_ENABLED'),
+        'RATE_LIMIT_STORAGE_URL': os.getenv('RATE_LIMIT_STORAGE_URL', 'memory://')
+    }
+
+    if os.getenv('LOAD_SHED_MAX_IN_FLIGHT'):
+        config['LOAD_SHED_MAX_IN_FLIGHT'] = int(os.getenv('LOAD_SHED_MAX_IN_FLIGHT'))
+
+    return config
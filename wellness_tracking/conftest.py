@@ -0,0 +1,89 @@
+"""
+Shared test fixtures.
+
+The schema is created once per session (once per worker under pytest-xdist)
+in an in-memory SQLite template; every app built with `make_app` gets its own
+copy through the SQLite backup API instead of running create_all. Device
+sync calls go to the mock device API served on an ephemeral port, so tests
+never depend on a service listening on port 5001.
+"""
+
+import importlib.util
+import os
+import sqlite3
+import threading
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.pool import StaticPool
+from werkzeug.serving import make_server
+from wellness_tracking.main import create_app
+from wellness_tracking.repository import db
+
+MOCK_API_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mock-service', 'mock_api.py')
+
+
+def _connect():
+    # Background workers (write buffer, outbox, streams) use the connection from other threads
+    return sqlite3.connect(':memory:', check_same_thread=False)
+
+
+@pytest.fixture(scope='session')
+def db_template():
+    """In-memory database with the full schema, built once per session"""
+    template = _connect()
+    engine = sa.create_engine('sqlite://', creator=lambda: template, poolclass=StaticPool)
+    db.metadata.create_all(engine)
+    yield template
+    engine.dispose()
+    template.close()
+
+
+@pytest.fixture(scope='session')
+def device_api():
+    """Base URL of the mock device API served in a background thread"""
+    spec = importlib.util.spec_from_file_location('mock_api', MOCK_API_PATH)
+    mock_api = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mock_api)
+
+    server = make_server('127.0.0.1', 0, mock_api.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    thread.join()
+
+
+@pytest.fixture
+def make_app(db_template, device_api):
+    """Build test apps on a private copy of the template database: make_app({...config})"""
+    connections = []
+
+    def _make_app(test_config=None):
+        connection = _connect()
+        db_template.backup(connection)
+        connections.append(connection)
+        return create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'SQLALCHEMY_ENGINE_OPTIONS': {'creator': lambda: connection, 'poolclass': StaticPool},
+            'AUTO_CREATE_SCHEMA': False,
+            'DEVICE_API_BASE': device_api,
+            # Its periodic scan would share the test's connection; tests run the backfill by hand
+            'METRICS_BACKFILL_ENABLED': False,
+            **(test_config or {})
+        })
+
+    yield _make_app
+    for connection in connections:
+        connection.close()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as client:
+        yield client
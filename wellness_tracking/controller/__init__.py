@@ -1,3 +1,3 @@
-from .routes import activity_bp
+from .routes import activity_bp, admin_bp, stream_bp, user_bp
 
-__all__ = ['activity_bp']
+__all__ = ['activity_bp', 'admin_bp', 'stream_bp', 'user_bp']
@@ -0,0 +1,64 @@
+from flask import Response, json, request
+
+JSON_MIMETYPE = 'application/json'
+COLUMNAR_MIMETYPE = 'application/vnd.wellness.columnar+json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+# Row fields sent as codes into a per-response dictionary in the columnar shape
+DICTIONARY_FIELDS = frozenset(['activity_type', 'unit'])
+
+
+def _msgpack():
+    """Return the msgpack module when installed (optional dependency)"""
+    try:
+        import msgpack
+        return msgpack
+    except ImportError:
+        return None
+
+
+def to_columnar(rows):
+    """Turn a list of row dicts into one array per field, with repeated strings dictionary-encoded"""
+    fields = list(rows[0]) if rows else []
+    columns = {field: [row[field] for row in rows] for field in fields}
+    dictionaries = {}
+    for field in DICTIONARY_FIELDS.intersection(fields):
+        codes = {}
+        columns[field] = [codes.setdefault(value, len(codes)) for value in columns[field]]
+        dictionaries[field] = list(codes)
+    return {
+        "count": len(rows),
+        "columns": columns,
+        "dictionaries": dictionaries
+    }
+
+
+def respond(payload, status_code=200, rows_key=None):
+    """Render a read payload in the negotiated representation.
+
+    JSON by default; `?format=columnar` or `Accept: application/vnd.wellness.columnar+json`
+    turns the list under `rows_key` into columns, and `Accept: application/msgpack`
+    (when msgpack is installed) encodes the result as MessagePack.
+    """
+    msgpack = _msgpack()
+    offers = [JSON_MIMETYPE]
+    if rows_key is not None:
+        offers.append(COLUMNAR_MIMETYPE)
+    if msgpack is not None:
+        offers.extend(MSGPACK_MIMETYPES)
+    mimetype = request.accept_mimetypes.best_match(offers, default=JSON_MIMETYPE)
+
+    if rows_key is not None and (mimetype == COLUMNAR_MIMETYPE or request.args.get('format') == 'columnar'):
+        payload = dict(payload)
+        payload[rows_key] = to_columnar(payload[rows_key])
+        payload['format'] = 'columnar'
+
+    if mimetype in MSGPACK_MIMETYPES:
+        body = msgpack.packb(payload, use_bin_type=True)
+        mimetype = MSGPACK_MIMETYPES[0]
+    else:
+        body = json.dumps(payload)
+
+    response = Response(body, status=status_code, mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
@@ -1,3 +1,6 @@
 from .activity_controller import activity_bp
+from .admin_controller import admin_bp
+from .stream_controller import stream_bp
+from .user_controller import user_bp
 
-__all__ = ['activity_bp']
+__all__ = ['activity_bp', 'admin_bp', 'stream_bp', 'user_bp']
@@ -1,21 +1,7 @@
 import pytest
 import json
 from datetime import datetime, date, timedelta
-from wellness_tracking.main import create_app
-from wellness_tracking.repository import db, WellnessActivity, DeviceSync
-
-@pytest.fixture
-def client():
-    """Create test client"""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    
-    with app.test_client() as client:
-        with app.app_context():
-            db.create_all()
-            yield client
-            db.drop_all()
+from wellness_tracking.repository import db, WellnessActivity
 
 @pytest.fixture
 def sample_user_id():
@@ -189,5 +175,125 @@ def test_get_sync_status_no_records(client, sample_user_id):
     assert data['user_id'] == sample_user_id
     assert 'message' in data
 
+def test_log_activities_batch_rejects_rows_individually(client, sample_user_id):
+    """Test batch logging stores valid rows and reports invalid ones"""
+    activities = [
+        {"user_id": sample_user_id, "activity_type": "running", "value": 30.0, "unit": "minutes"},
+        {"user_id": sample_user_id, "activity_type": "invalid_type", "value": 1.0, "unit": "minutes"},
+        {"user_id": sample_user_id, "activity_type": "sleep", "value": 8.0, "unit": "hours"}
+    ]
+    
+    response = client.post('/api/activities/batch',
+                          data=json.dumps({"activities": activities}),
+                          content_type='application/json')
+    
+    assert response.status_code == 201
+    data = json.loads(response.data)
+    assert data['logged_count'] == 2
+    assert len(data['activity_ids']) == 2
+    assert data['rejected'][0]['index'] == 1
+    
+    response = client.get(f'/api/activities/{sample_user_id}')
+    assert len(json.loads(response.data)['activities']) == 2
+
+def test_log_activities_batch_rejects_malformed_field_types(client, sample_user_id):
+    """Test rows with object, array or null fields are rejected without failing the batch"""
+    activities = [
+        {"user_id": sample_user_id, "activity_type": "running", "value": 30.0, "unit": "minutes"},
+        {"user_id": sample_user_id, "activity_type": {"a": 1}, "value": 1.0, "unit": "minutes"},
+        {"user_id": None, "activity_type": "sleep", "value": 8.0, "unit": "hours"},
+        {"user_id": sample_user_id, "activity_type": "sleep", "value": 8.0, "unit": ["hours"]}
+    ]
+
+    response = client.post('/api/activities/batch',
+                          data=json.dumps({"activities": activities}),
+                          content_type='application/json')
+
+    assert response.status_code == 201
+    data = json.loads(response.data)
+    assert data['logged_count'] == 1
+    assert [row['index'] for row in data['rejected']] == [1, 2, 3]
+
+def test_log_activity_null_user_id(client):
+    """Test a single write with a null user_id is a client error"""
+    response = client.post('/api/activities',
+                          data=json.dumps({"user_id": None, "activity_type": "sleep", "value": 8.0, "unit": "hours"}),
+                          content_type='application/json')
+    assert response.status_code == 400
+
+def test_non_finite_values_are_rejected(client, sample_user_id):
+    """Test NaN and Infinity, which the JSON parser accepts, are validation errors and never stored"""
+    row = '{"user_id": "%s", "activity_type": "hydration", "value": %s, "unit": "liters"}'
+    response = client.post('/api/activities', data=row % (sample_user_id, 'NaN'), content_type='application/json')
+    assert response.status_code == 400
+
+    response = client.post('/api/activities/batch',
+                          data='{"activities": [%s, %s]}' % (row % (sample_user_id, 'Infinity'),
+                                                             row % (sample_user_id, '1.5')),
+                          content_type='application/json')
+    assert response.status_code == 201
+    assert [row['index'] for row in json.loads(response.data)['rejected']] == [0]
+
+    summary = json.loads(client.get(f'/api/summary/{sample_user_id}').data)
+    assert summary['summary']['hydration']['total_value'] == 1.5
+
+def test_log_activities_batch_without_valid_rows(client):
+    """Test a batch with no valid rows is rejected"""
+    response = client.post('/api/activities/batch',
+                          data=json.dumps({"activities": [{"user_id": "u1"}]}),
+                          content_type='application/json')
+    assert response.status_code == 400
+    
+    response = client.post('/api/activities/batch',
+                          data=json.dumps({"activities": []}),
+                          content_type='application/json')
+    assert response.status_code == 400
+
+def _log_walks(client, user_id, count):
+    activities = [{
+        "user_id": user_id,
+        "activity_type": "walking" if i % 2 else "sleep",
+        "value": float(i),
+        "unit": "minutes" if i % 2 else "hours",
+        "date": f"2024-02-{i % 28 + 1:02d}"
+    } for i in range(count)]
+    assert client.post('/api/activities/batch', json={"activities": activities}).status_code == 201
+
+def test_get_user_activities_columnar(client):
+    """Test the columnar representation via query parameter and Accept header"""
+    _log_walks(client, "columnar_user", 6)
+    rows = client.get('/api/activities/columnar_user').get_json()['activities']
+
+    for response in (
+        client.get('/api/activities/columnar_user?format=columnar'),
+        client.get('/api/activities/columnar_user', headers={'Accept': 'application/vnd.wellness.columnar+json'})
+    ):
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['format'] == 'columnar'
+        table = data['activities']
+        assert table['count'] == len(rows) == 6
+        assert table['columns']['value'] == [row['value'] for row in rows]
+        assert table['columns']['id'] == [row['id'] for row in rows]
+        types = table['dictionaries']['activity_type']
+        assert [types[code] for code in table['columns']['activity_type']] == [row['activity_type'] for row in rows]
+        units = table['dictionaries']['unit']
+        assert sorted(units) == ['hours', 'minutes']
+        assert [units[code] for code in table['columns']['unit']] == [row['unit'] for row in rows]
+
+    response = client.get('/api/activities/columnar_user', headers={'Accept': 'application/vnd.wellness.columnar+json'})
+    assert response.mimetype == 'application/vnd.wellness.columnar+json'
+    assert 'Accept' in response.headers['Vary']
+
+def test_get_user_activities_msgpack(client):
+    """Test MessagePack is served to clients that ask for it when msgpack is installed"""
+    msgpack = pytest.importorskip('msgpack')
+    _log_walks(client, "msgpack_user", 4)
+
+    response = client.get('/api/activities/msgpack_user', headers={'Accept': 'application/msgpack'})
+    assert response.mimetype == 'application/msgpack'
+    data = msgpack.unpackb(response.data, raw=False)
+    assert data == client.get('/api/activities/msgpack_user').get_json()
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -0,0 +1,121 @@
+import pytest
+import json
+import threading
+import time
+from wellness_tracking.service import InProcessChangeFeed
+
+@pytest.fixture
+def app(make_app):
+    return make_app({
+        'STREAM_HEARTBEAT_SECONDS': 0.1,
+        'STREAM_MAX_SECONDS': 1
+    })
+
+def _log_later(app, user_id, delay=0.2):
+    def log():
+        time.sleep(delay)
+        app.test_client().post('/api/activities',
+                               data=json.dumps({
+                                   "user_id": user_id,
+                                   "activity_type": "meditation",
+                                   "value": 15.0,
+                                   "unit": "minutes"
+                               }),
+                               content_type='application/json')
+    thread = threading.Thread(target=log)
+    thread.start()
+    return thread
+
+def test_feed_cursor_and_reset():
+    """Test events are returned after the cursor and dropped history forces a reset"""
+    feed = InProcessChangeFeed(history=2)
+    first = feed.publish('user_1', {"type": "activity"})
+    feed.publish('user_2', {"type": "activity"})
+    events, cursor, reset = feed.wait_for_events('user_1', 0, timeout=0)
+    assert [sequence for sequence, _ in events] == [first]
+    assert cursor == first and not reset
+
+    for _ in range(3):
+        feed.publish('user_1', {"type": "activity"})
+    events, cursor, reset = feed.wait_for_events('user_1', first, timeout=0)
+    assert reset and events == []
+    assert cursor == feed.latest_cursor()
+
+def test_feed_cursor_ahead_of_the_feed_resets():
+    """Test a cursor from before a restart, beyond the latest sequence, forces a reset"""
+    feed = InProcessChangeFeed()
+    for _ in range(3):
+        feed.publish('u1', {"type": "activity"})
+    assert feed.wait_for_events('u1', 500, timeout=0) == ([], 3, True)
+
+@pytest.mark.parametrize('cursor', ['500', 'deadbeef-1', 'deadbeef-500'])
+def test_long_poll_resets_cursors_from_another_feed(app, cursor):
+    """Test cursors issued by a restarted process or another worker are answered with a reset"""
+    feed = app.extensions['change_feed']
+    for _ in range(3):
+        feed.publish('user_1', {"type": "activity"})
+    response = app.test_client().get('/api/stream/user_1?mode=poll&timeout=0',
+                                     headers={'Last-Event-ID': cursor})
+    data = json.loads(response.data)
+    assert data['reset'] is True and data['events'] == []
+    assert data['cursor'] == f"{feed.epoch}-3"
+
+def test_sse_stream_resets_stale_cursor(app):
+    """Test an SSE client resuming with a cursor from another epoch is told to refetch first"""
+    response = app.test_client().get('/api/stream/user_1', headers={
+        'Accept': 'text/event-stream',
+        'Last-Event-ID': 'deadbeef-7'
+    })
+    body = response.get_data(as_text=True)
+    assert f"id: {app.extensions['change_feed'].epoch}-0\nevent: reset" in body
+
+def test_long_poll_returns_new_activity(app):
+    """Test a long-poll request wakes up when an activity is logged"""
+    thread = _log_later(app, 'user_1')
+    response = app.test_client().get('/api/stream/user_1?mode=poll&timeout=5')
+    thread.join()
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert len(data['events']) == 1
+    event = data['events'][0]
+    assert event['type'] == 'activity'
+    assert event['summary_delta'] == {"meditation": {"total_value": 15.0, "unit": "minutes", "count": 1}}
+    assert data['cursor'] == event['id']
+
+def test_long_poll_times_out_empty(app):
+    """Test a long-poll with no changes returns an empty batch and the same cursor"""
+    response = app.test_client().get('/api/stream/user_1?mode=poll&timeout=0.1&cursor=0')
+    data = json.loads(response.data)
+    assert data['events'] == []
+    assert data['cursor'] == f"{app.extensions['change_feed'].epoch}-0"
+
+@pytest.mark.parametrize('timeout', ['abc', '-1', 'nan', 'inf'])
+def test_long_poll_rejects_invalid_timeout(app, timeout):
+    """Test a malformed or negative timeout is a client error"""
+    response = app.test_client().get(f'/api/stream/user_1?timeout={timeout}', headers={'Accept': 'application/json'})
+    assert response.status_code == 400
+
+def test_long_poll_timeout_is_clamped(app, monkeypatch):
+    """Test long-poll waits no longer than LONG_POLL_TIMEOUT"""
+    app.config['LONG_POLL_TIMEOUT'] = 0.1
+    waits = []
+    feed = app.extensions['change_feed']
+    wait_for_events = feed.wait_for_events
+    monkeypatch.setattr(feed, 'wait_for_events',
+                        lambda user_id, cursor, timeout: waits.append(timeout) or wait_for_events(user_id, cursor, timeout))
+    response = app.test_client().get('/api/stream/user_1?mode=poll&timeout=3600&cursor=0')
+    assert response.status_code == 200
+    assert waits == [0.1]
+
+def test_sse_stream_pushes_activity(app):
+    """Test the SSE stream emits logged activities as events"""
+    thread = _log_later(app, 'user_1')
+    response = app.test_client().get('/api/stream/user_1', headers={'Accept': 'text/event-stream'})
+    body = response.get_data(as_text=True)
+    thread.join()
+
+    assert response.mimetype == 'text/event-stream'
+    assert 'event: activity' in body
+    data_line = next(line for line in body.splitlines() if line.startswith('data: '))
+    assert json.loads(data_line[len('data: '):])['activity']['user_id'] == 'user_1'
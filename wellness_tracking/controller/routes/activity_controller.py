@@ -1,15 +1,12 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from datetime import datetime
-import requests
-from ...service import ActivityService
+from ...service import ActivityService, ACTIVITY_VALIDATOR, DeviceFetchError, MetricsService, ValidationError, WriteBufferFull
 from ...repository import db
+from ..representation import respond
 
 # Create Blueprint
 activity_bp = Blueprint('activity', __name__)
 
-# Mock API URL
-MOCK_API_BASE = "http://localhost:5001"  # Local mock API service
-
 @activity_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -19,18 +16,11 @@ def health_check():
 def log_activity():
     """Log wellness activity"""
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['user_id', 'activity_type', 'value', 'unit']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Missing required field: {field}"}), 400
-        
-        # Validate activity type
-        valid_activity_types = ['meditation', 'workout', 'hydration', 'sleep', 'running', 'walking']
-        if data['activity_type'] not in valid_activity_types:
-            return jsonify({"error": f"Invalid activity type. Must be one of: {valid_activity_types}"}), 400
+        # Validate required fields and activity type
+        try:
+            data = ACTIVITY_VALIDATOR.validate(request.get_json())
+        except ValidationError as e:
+            return jsonify({"error": str(e)}), 400
         
         # Call service layer
         result = ActivityService.log_activity(
@@ -40,12 +30,52 @@ def log_activity():
             unit=data['unit']
         )
         
+        # Buffered writes are acknowledged before they reach the database
+        status_code = 202 if result.get('buffered') else 201
+        
         return jsonify({
             "message": "Activity logged successfully",
             "activity_id": result['activity_id'],
             "activity": result['activity']
-        }), 201
+        }), status_code
+        
+    except WriteBufferFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@activity_bp.route('/api/activities/batch', methods=['POST'])
+def log_activities():
+    """Log a batch of wellness activities, rejecting invalid rows individually"""
+    try:
+        data = request.get_json()
+        records = data.get('activities') if isinstance(data, dict) else None
+        
+        max_batch = current_app.config.get('BATCH_MAX_ACTIVITIES', 1000)
+        if not isinstance(records, list) or not records:
+            return jsonify({"error": "activities must be a non-empty list"}), 400
+        if len(records) > max_batch:
+            return jsonify({"error": f"At most {max_batch} activities per batch"}), 400
+        
+        valid, rejected = ACTIVITY_VALIDATOR.partition(records)
+        if not valid:
+            return jsonify({"error": "No valid activities", "rejected": rejected}), 400
         
+        # Call service layer
+        result = ActivityService.log_activities(valid)
+        
+        # Buffered writes are acknowledged before they reach the database
+        status_code = 202 if result['buffered'] else 201
+        
+        return jsonify({
+            "message": "Activities logged successfully",
+            "logged_count": len(valid),
+            "activity_ids": result['activity_ids'],
+            "rejected": rejected
+        }), status_code
+        
+    except WriteBufferFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -66,7 +96,7 @@ def get_user_activities(user_id):
             activity_type=activity_type
         )
         
-        return jsonify(result), 200
+        return respond(result, 200, rows_key='activities')
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -86,13 +116,25 @@ def get_user_summary(user_id):
             end_date=end_date
         )
         
-        return jsonify(result), 200
+        return respond(result, 200)
         
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@activity_bp.route('/api/metrics/<user_id>', methods=['GET'])
+def get_user_metrics(user_id):
+    """Get user's streaks, rolling averages and goal progress"""
+    try:
+        # Call service layer (reads the precomputed per-user state row)
+        result = MetricsService.get_metrics(user_id)
+        
+        return respond(result, 200)
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @activity_bp.route('/api/sync-device', methods=['POST'])
 def sync_device_data():
     """Sync device data"""
@@ -103,33 +145,19 @@ def sync_device_data():
         if not user_id:
             return jsonify({"error": "user_id is required"}), 400
         
-        # Call Mock API to get device data
+        # Call service layer (fetches from the device API, concurrent syncs for a user are coalesced)
         try:
-            # In production environment, this would call the real device API
-            response = requests.get(f"{MOCK_API_BASE}/device-activity?user_id={user_id}")
-            device_data = response.json()
-            
-            # Simulate device data response
-            # device_data = [
-            #     {
-            #         "user_id": user_id,
-            #         "date": datetime.now().date().isoformat(),
-            #         "activity_type": "running",
-            #         "value": 30.0,
-            #         "unit": "minutes"
-            #     }
-            # ]
-            
-        except Exception as e:
+            result = ActivityService.sync_user_device(user_id)
+        except DeviceFetchError as e:
             return jsonify({"error": f"Failed to fetch device data: {str(e)}"}), 500
         
-        # Call service layer
-        result = ActivityService.sync_device_data(user_id, device_data)
-        
         return jsonify({
             "message": "Device data synced successfully",
             "user_id": user_id,
-            "synced_activities": result['synced_activities']
+            "synced_count": result['synced_count'],
+            "synced_activities": result['synced_activities'],
+            "rejected_count": result['rejected_count'],
+            "rejected": result['rejected']
         }), 200
             
     except Exception as e:
@@ -0,0 +1,46 @@
+from flask import Blueprint, Response, current_app, jsonify, request
+import hmac
+
+# Create Blueprint
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+def _check_admin():
+    """Return an error response unless profiling is enabled and the caller is an admin"""
+    store = current_app.extensions.get('profiler')
+    if store is None:
+        return None, (jsonify({"error": "Profiler is not enabled"}), 404)
+
+    token = current_app.config.get('PROFILER_ADMIN_TOKEN')
+    provided = request.headers.get('X-Admin-Token', '')
+    if not token or not hmac.compare_digest(token.encode(), provided.encode()):
+        return None, (jsonify({"error": "Forbidden"}), 403)
+
+    return store, None
+
+@admin_bp.route('/profiles', methods=['GET'])
+def list_profiles():
+    """List captured request profiles, newest first"""
+    store, error = _check_admin()
+    if error:
+        return error
+    return jsonify({"profiles": store.list()}), 200
+
+@admin_bp.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Get a captured profile as a text report, or as raw pstats data with ?format=pstats"""
+    store, error = _check_admin()
+    if error:
+        return error
+
+    profile = store.get(profile_id)
+    if profile is None:
+        return jsonify({"error": "Profile not found"}), 404
+
+    if request.args.get('format') == 'pstats':
+        if profile['raw'] is None:
+            return jsonify({"error": "Raw stats are only available for cProfile captures"}), 400
+        return Response(profile['raw'], mimetype='application/octet-stream', headers={
+            "Content-Disposition": f"attachment; filename={profile_id}.pstats"
+        })
+
+    return jsonify({"profile": profile['metadata'], "report": profile['report']}), 200
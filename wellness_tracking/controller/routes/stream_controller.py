@@ -0,0 +1,94 @@
+from flask import Blueprint, Response, current_app, request, jsonify
+import json
+import math
+import time
+
+# Create Blueprint
+stream_bp = Blueprint('stream', __name__)
+
+def _start_cursor(feed):
+    """Resume from ?cursor= or Last-Event-ID, else start from now.
+
+    Returns (sequence, stale); a cursor from another feed epoch is stale and
+    the client has to refetch. Raises ValueError when malformed.
+    """
+    cursor = request.args.get('cursor', request.headers.get('Last-Event-ID'))
+    if cursor is None or cursor == '':
+        return feed.latest_cursor(), False
+    epoch, separator, sequence = cursor.rpartition('-')
+    sequence = int(sequence)
+    if separator and not epoch:
+        raise ValueError(cursor)
+    if epoch and epoch != feed.epoch:
+        return feed.latest_cursor(), True
+    return sequence, False
+
+def _format_cursor(feed, sequence):
+    """Cursor handed to clients: `<epoch>-<sequence>`, or the bare sequence when the feed has no epoch"""
+    return sequence if feed.epoch is None else f"{feed.epoch}-{sequence}"
+
+def _poll_timeout():
+    """Long-poll wait from ?timeout=, clamped to LONG_POLL_TIMEOUT; raises ValueError when invalid"""
+    max_timeout = current_app.config.get('LONG_POLL_TIMEOUT', 25)
+    timeout = float(request.args.get('timeout', max_timeout))
+    if not math.isfinite(timeout) or timeout < 0:
+        raise ValueError(timeout)
+    return min(timeout, max_timeout)
+
+def _sse_message(cursor, event):
+    return f"id: {cursor}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+@stream_bp.route('/api/stream/<user_id>', methods=['GET'])
+def stream_activity_updates(user_id):
+    """Stream new activities and summary deltas (SSE, or long-poll with ?mode=poll)"""
+    try:
+        feed = current_app.extensions['change_feed']
+        cursor, stale = _start_cursor(feed)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    wants_sse = request.args.get('mode') != 'poll' and request.accept_mimetypes.best == 'text/event-stream'
+    if not wants_sse:
+        # Long-poll fallback: wait for the next events after the cursor and return them as JSON
+        try:
+            timeout = _poll_timeout()
+        except ValueError:
+            return jsonify({"error": "Invalid timeout: must be a non-negative number of seconds"}), 400
+        if stale:
+            events, reset = [], True
+        else:
+            events, cursor, reset = feed.wait_for_events(user_id, cursor, timeout)
+        return jsonify({
+            "user_id": user_id,
+            "cursor": _format_cursor(feed, cursor),
+            "reset": reset,
+            "events": [dict(event, id=_format_cursor(feed, sequence)) for sequence, event in events]
+        }), 200
+
+    heartbeat = current_app.config.get('STREAM_HEARTBEAT_SECONDS', 15)
+    max_seconds = current_app.config.get('STREAM_MAX_SECONDS', 300)
+
+    def generate(cursor):
+        # Clients reconnect with Last-Event-ID once the stream closes
+        yield "retry: 3000\n\n"
+        if stale:
+            yield _sse_message(_format_cursor(feed, cursor), {"type": "reset"})
+        deadline = time.monotonic() + max_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            events, cursor, reset = feed.wait_for_events(user_id, cursor, min(heartbeat, remaining))
+            if reset:
+                yield _sse_message(_format_cursor(feed, cursor), {"type": "reset"})
+            elif not events:
+                yield ": keep-alive\n\n"
+            for sequence, event in events:
+                yield _sse_message(_format_cursor(feed, sequence), event)
+
+    return Response(generate(cursor), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
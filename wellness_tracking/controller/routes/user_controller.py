@@ -0,0 +1,32 @@
+from flask import Blueprint, request, jsonify
+from ...service import UserService
+
+# Create Blueprint
+user_bp = Blueprint('user', __name__)
+
+@user_bp.route('/api/users/<user_id>/timezone', methods=['GET'])
+def get_timezone(user_id):
+    """Get user's timezone"""
+    try:
+        result = UserService.get_timezone(user_id)
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@user_bp.route('/api/users/<user_id>/timezone', methods=['PUT'])
+def set_timezone(user_id):
+    """Set user's timezone"""
+    try:
+        data = request.get_json()
+        
+        if not data or 'timezone' not in data:
+            return jsonify({"error": "Missing required field: timezone"}), 400
+        
+        result = UserService.set_timezone(user_id, data['timezone'])
+        return jsonify(result), 200
+        
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,38 +1,58 @@
-from flask import Flask
-from flask_cors import CORS
-from dotenv import load_dotenv
 import os
 import sys
 
-# Add the parent directory to the path so we can import modules
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if __name__ == '__main__' and not __package__:
+    # Allow `python main.py` from inside wellness_tracking/ as well as `python -m wellness_tracking.main`
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from wellness_tracking.repository import db
-from wellness_tracking.controller.routes import activity_bp
+from flask import Flask
+from flask_cors import CORS
 
-# Load environment variables
-load_dotenv()
+from wellness_tracking.config import load_config
+from wellness_tracking.repository import create_missing_indexes, create_shard_schema, db, init_sharding
+from wellness_tracking.controller.routes import activity_bp, admin_bp, stream_bp, user_bp
+from wellness_tracking.middleware import init_compression, init_profiler, init_rate_limiter
+from wellness_tracking.service import init_change_feed, init_hot_store, init_metrics_backfill, init_outbox, init_write_buffer
 
-def create_app():
+def create_app(test_config=None):
     """Application factory pattern"""
     app = Flask(__name__)
-    
-    # Configuration - Use absolute path to avoid multiple instance folders
-    db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'wellness.db')
-    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', f'sqlite:///{db_path}')
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    
+
+    # Configuration is read from the environment once per process
+    app.config.update(load_config())
+
+    if test_config:
+        app.config.update(test_config)
+
     # Initialize extensions
     db.init_app(app)
+    init_sharding(app)
     CORS(app)
-    
+    init_profiler(app)
+    init_rate_limiter(app)
+    init_compression(app)
+    init_change_feed(app)
+    init_hot_store(app)
+
     # Register blueprints
     app.register_blueprint(activity_bp)
-    
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(stream_bp)
+    app.register_blueprint(user_bp)
+
     # Create database tables
-    with app.app_context():
-        db.create_all()
-    
+    if app.config['AUTO_CREATE_SCHEMA']:
+        with app.app_context():
+            # Shard binds share the default metadata, create_shard_schema() builds their tables
+            db.create_all(bind_key=None)
+            create_missing_indexes(db.engine)
+        create_shard_schema(app)
+
+    # Start background workers once the schema exists
+    init_write_buffer(app)
+    init_outbox(app)
+    init_metrics_backfill(app)
+
     return app
 
 if __name__ == '__main__':
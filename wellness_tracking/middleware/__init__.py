@@ -0,0 +1,18 @@
+from .compression import init_compression
+from .profiler import init_profiler, sign_profile_request
+from .rate_limit import (
+    RateLimitBackend,
+    InMemoryRateLimitBackend,
+    RedisRateLimitBackend,
+    init_rate_limiter
+)
+
+__all__ = [
+    'init_compression',
+    'init_profiler',
+    'sign_profile_request',
+    'RateLimitBackend',
+    'InMemoryRateLimitBackend',
+    'RedisRateLimitBackend',
+    'init_rate_limiter'
+]
@@ -0,0 +1,77 @@
+import gzip
+import json
+import pytest
+from wellness_tracking.middleware.compression import choose_encoding
+
+def _compressing_app(make_app, **config):
+    return make_app({
+        'COMPRESSION_ENABLED': True,
+        'COMPRESSION_MIN_BYTES': 512,
+        **config
+    })
+
+def _log_activities(client, user_id, count):
+    activities = [{
+        "user_id": user_id,
+        "activity_type": "walking",
+        "value": float(i),
+        "unit": "minutes",
+        "date": f"2024-01-{i % 28 + 1:02d}"
+    } for i in range(count)]
+    response = client.post('/api/activities/batch', json={"activities": activities})
+    assert response.status_code == 201
+
+def test_choose_encoding():
+    """Test br is preferred only when available and q=0 refuses an encoding"""
+    assert choose_encoding('gzip, deflate, br', brotli_available=True) == 'br'
+    assert choose_encoding('gzip, deflate, br', brotli_available=False) == 'gzip'
+    assert choose_encoding('br;q=0.5, gzip', brotli_available=True) == 'gzip'
+    assert choose_encoding('gzip;q=0', brotli_available=False) is None
+    assert choose_encoding('', brotli_available=True) is None
+
+def test_large_json_is_gzipped(make_app):
+    """Test responses above the threshold are gzipped for clients that accept it"""
+    client = _compressing_app(make_app).test_client()
+    _log_activities(client, 'user_1', 50)
+
+    response = client.get('/api/activities/user_1', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert len(json.loads(gzip.decompress(response.data))['activities']) == 50
+
+    plain = client.get('/api/activities/user_1')
+    assert 'Content-Encoding' not in plain.headers
+    assert len(plain.get_json()['activities']) == 50
+    assert len(response.data) < len(plain.data)
+
+def test_small_and_error_responses_are_not_compressed(make_app):
+    """Test bodies under the threshold and error responses are sent as is"""
+    client = _compressing_app(make_app).test_client()
+
+    response = client.get('/api/activities/user_1', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json()['activities'] == []
+
+    response = client.get('/api/summary/user_1?period=decade', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 400
+    assert 'Content-Encoding' not in response.headers
+
+def test_compression_can_be_disabled(make_app):
+    """Test COMPRESSION_ENABLED=False leaves responses untouched"""
+    client = _compressing_app(make_app, COMPRESSION_ENABLED=False).test_client()
+    _log_activities(client, 'user_1', 50)
+
+    response = client.get('/api/activities/user_1', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert len(response.get_json()['activities']) == 50
+
+def test_brotli_when_installed(make_app):
+    """Test br is used when the optional brotli package is installed"""
+    brotli = pytest.importorskip('brotli')
+    client = _compressing_app(make_app).test_client()
+    _log_activities(client, 'user_1', 50)
+
+    response = client.get('/api/activities/user_1', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert len(json.loads(brotli.decompress(response.data))['activities']) == 50
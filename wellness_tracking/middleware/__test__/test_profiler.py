@@ -0,0 +1,73 @@
+import pytest
+import json
+import time
+from wellness_tracking.middleware import sign_profile_request
+
+SECRET = "profiling-secret"
+ADMIN_TOKEN = "admin-token"
+
+@pytest.fixture
+def client(make_app):
+    """Create test client with the profiler enabled"""
+    app = make_app({'PROFILER_ENABLED': True, 'PROFILER_SECRET': SECRET, 'PROFILER_ADMIN_TOKEN': ADMIN_TOKEN})
+
+    with app.test_client() as client:
+        with app.app_context():
+            yield client
+
+def test_profiler_disabled_registers_no_hooks(make_app):
+    """Test a disabled profiler adds no request hooks"""
+    app = make_app()
+    assert 'profiler' not in app.extensions
+    assert not any(hook.__name__ == '_start_profile' for hook in app.before_request_funcs.get(None, []))
+
+    response = app.test_client().get('/admin/profiles', headers={'X-Admin-Token': ADMIN_TOKEN})
+    assert response.status_code == 404
+
+def test_unsigned_request_is_not_profiled(client):
+    """Test requests without a valid signature are not profiled"""
+    response = client.get('/api/summary/user_1', headers={'X-Profile-Request': '123.bad'})
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response.headers
+
+def test_signed_request_is_profiled_and_retrievable(client):
+    """Test a signed request is captured and exposed through the admin endpoints"""
+    path = '/api/summary/user_1'
+    header = sign_profile_request(SECRET, path, time.time() + 60)
+
+    response = client.get(path, headers={'X-Profile-Request': header})
+    assert response.status_code == 200
+    profile_id = response.headers['X-Profile-Id']
+
+    response = client.get('/admin/profiles', headers={'X-Admin-Token': ADMIN_TOKEN})
+    assert response.status_code == 200
+    profiles = json.loads(response.data)['profiles']
+    assert profiles[0]['id'] == profile_id
+    assert profiles[0]['path'] == path
+
+    response = client.get(f'/admin/profiles/{profile_id}', headers={'X-Admin-Token': ADMIN_TOKEN})
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert 'get_user_summary' in data['report']
+
+def test_signature_is_bound_to_path(client):
+    """Test a signature for one path does not profile another"""
+    header = sign_profile_request(SECRET, '/api/summary/user_1', time.time() + 60)
+    response = client.get('/api/summary/user_2', headers={'X-Profile-Request': header})
+    assert 'X-Profile-Id' not in response.headers
+
+def test_admin_requires_token(client):
+    """Test admin endpoints reject missing tokens"""
+    response = client.get('/admin/profiles')
+    assert response.status_code == 403
+
+def test_non_ascii_signature_is_rejected(client):
+    """Test a non-ASCII profiling header is treated as unsigned instead of failing the request"""
+    response = client.get('/api/summary/user_1', headers={'X-Profile-Request': '9999999999.é'})
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response.headers
+
+def test_non_ascii_admin_token_is_forbidden(client):
+    """Test a non-ASCII admin token is rejected with 403"""
+    response = client.get('/admin/profiles', headers={'X-Admin-Token': 'é'})
+    assert response.status_code == 403
@@ -0,0 +1,110 @@
+import pytest
+import json
+import threading
+import sqlalchemy as sa
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
+from wellness_tracking.middleware import InMemoryRateLimitBackend
+from wellness_tracking.middleware.rate_limit import _pool_capacity
+
+def _limited_app(make_app, **config):
+    return make_app({
+        'RATE_LIMIT_ENABLED': True,
+        **config
+    })
+
+def test_token_bucket_refills():
+    """Test the in-memory bucket allows a burst then reports a retry delay"""
+    backend = InMemoryRateLimitBackend()
+    assert backend.consume('key', rate=1.0, capacity=2) == (True, 0.0)
+    assert backend.consume('key', rate=1.0, capacity=2) == (True, 0.0)
+    allowed, retry_after = backend.consume('key', rate=1.0, capacity=2)
+    assert not allowed
+    assert 0 < retry_after <= 1.0
+
+def test_bucket_count_is_capped_by_evicting_least_recently_used():
+    """Test active keys beyond max_keys evict the least recently used bucket"""
+    backend = InMemoryRateLimitBackend(max_keys=2)
+    backend.consume('a', rate=0.001, capacity=1)
+    backend.consume('b', rate=0.001, capacity=1)
+    assert backend.consume('a', rate=0.001, capacity=1)[0] is False
+    backend.consume('c', rate=0.001, capacity=1)
+
+    assert list(backend._buckets) == ['a', 'c']
+    # 'a' was used recently and is still limited; 'b' was dropped and starts full
+    assert backend.consume('a', rate=0.001, capacity=1)[0] is False
+    assert backend.consume('b', rate=0.001, capacity=1)[0] is True
+    assert len(backend._buckets) == 2
+
+def test_rate_limit_is_per_user_and_route(make_app):
+    """Test exhausting one user's bucket does not affect other users or routes"""
+    app = _limited_app(make_app, RATE_LIMITS={'activity.get_user_summary': (0.001, 2)})
+    client = app.test_client()
+
+    assert client.get('/api/summary/user_1').status_code == 200
+    assert client.get('/api/summary/user_1').status_code == 200
+    response = client.get('/api/summary/user_1')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+    assert client.get('/api/summary/user_2').status_code == 200
+    assert client.get('/api/activities/user_1').status_code == 200
+    assert client.get('/health').status_code == 200
+
+def test_load_shedding_returns_503(make_app):
+    """Test requests beyond the in-flight limit are shed with Retry-After"""
+    app = _limited_app(make_app, LOAD_SHED_MAX_IN_FLIGHT=1)
+    entered = threading.Event()
+    release = threading.Event()
+
+    @app.route('/slow')
+    def slow():
+        entered.set()
+        release.wait(5)
+        return 'ok'
+
+    worker = threading.Thread(target=lambda: app.test_client().get('/slow'))
+    worker.start()
+    entered.wait(5)
+    try:
+        response = app.test_client().get('/api/summary/user_1')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+    finally:
+        release.set()
+        worker.join()
+
+    assert app.test_client().get('/api/summary/user_1').status_code == 200
+
+def test_concurrency_cap(make_app):
+    """Test an endpoint rejects requests once its concurrency cap is reached"""
+    app = _limited_app(make_app, CONCURRENCY_LIMITS={'activity.get_sync_status': 1})
+    entered = threading.Event()
+    release = threading.Event()
+
+    original = app.view_functions['activity.get_sync_status']
+
+    def held(user_id):
+        entered.set()
+        release.wait(5)
+        return original(user_id)
+
+    app.view_functions['activity.get_sync_status'] = held
+    worker = threading.Thread(target=lambda: app.test_client().get('/api/sync-status/user_1'))
+    worker.start()
+    entered.wait(5)
+    try:
+        response = app.test_client().get('/api/sync-status/user_2')
+        assert response.status_code == 503
+        assert 'error' in json.loads(response.data)
+    finally:
+        release.set()
+        worker.join()
+
+def test_pool_capacity_from_engine_options():
+    """Test the default shedding limit follows pool_size plus the configured max_overflow"""
+    queued = sa.create_engine('sqlite:///:memory:', poolclass=QueuePool, pool_size=4)
+    assert _pool_capacity(queued, {}) == 14
+    assert _pool_capacity(queued, {'max_overflow': 2}) == 6
+    assert _pool_capacity(queued, {'max_overflow': -1}) is None
+    assert _pool_capacity(sa.create_engine('sqlite:///:memory:', poolclass=StaticPool), {}) is None
+    assert _pool_capacity(sa.create_engine('sqlite:///:memory:', poolclass=NullPool), {}) is None
@@ -0,0 +1,66 @@
+import gzip
+from flask import request
+from werkzeug.http import parse_accept_header
+
+# Response types worth compressing; streamed responses (SSE) are never buffered for compression
+COMPRESSIBLE_MIMETYPES = frozenset([
+    'application/json',
+    'application/vnd.wellness.columnar+json',
+    'application/msgpack'
+])
+
+
+def _brotli():
+    """Return the brotli module when installed (optional dependency)"""
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def choose_encoding(accept_encoding, brotli_available):
+    """Pick br or gzip from an Accept-Encoding header, preferring br on equal quality"""
+    accepted = parse_accept_header(accept_encoding)
+    candidates = [('br', accepted.quality('br'))] if brotli_available else []
+    candidates.append(('gzip', accepted.quality('gzip')))
+    encoding, quality = max(candidates, key=lambda candidate: candidate[1])
+    return encoding if quality > 0 else None
+
+
+def init_compression(app):
+    """Compress buffered responses above COMPRESSION_MIN_BYTES when COMPRESSION_ENABLED is set"""
+    if not app.config.get('COMPRESSION_ENABLED'):
+        return None
+
+    min_bytes = app.config.get('COMPRESSION_MIN_BYTES', 1024)
+    gzip_level = app.config.get('COMPRESSION_GZIP_LEVEL', 6)
+    brotli_quality = app.config.get('COMPRESSION_BROTLI_QUALITY', 5)
+    brotli = _brotli()
+
+    @app.after_request
+    def _compress(response):
+        if (response.is_streamed or response.direct_passthrough
+                or not 200 <= response.status_code < 300
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        data = response.get_data()
+        if len(data) < min_bytes:
+            return response
+
+        # The representation depends on Accept-Encoding from here on, whether or not we compress
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''), brotli is not None)
+        if encoding is None:
+            return response
+
+        if encoding == 'br':
+            response.set_data(brotli.compress(data, quality=brotli_quality))
+        else:
+            response.set_data(gzip.compress(data, compresslevel=gzip_level))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    return _compress
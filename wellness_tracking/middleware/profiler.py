@@ -0,0 +1,181 @@
+import cProfile
+import hashlib
+import hmac
+import io
+import marshal
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from flask import g, request
+
+PROFILE_HEADER = 'X-Profile-Request'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+
+
+def sign_profile_request(secret, path, expires):
+    """Build the X-Profile-Request header value for a path, valid until `expires` (unix time)"""
+    digest = hmac.new(secret.encode(), f"{int(expires)}:{path}".encode(), hashlib.sha256).hexdigest()
+    return f"{int(expires)}.{digest}"
+
+
+def _verify_signature(secret, path, header_value):
+    """Check a signed profiling header against the request path"""
+    try:
+        expires, _ = header_value.split('.', 1)
+        expires = int(expires)
+    except ValueError:
+        return False
+    if expires < time.time():
+        return False
+    expected = sign_profile_request(secret, path, expires)
+    # Compare bytes: compare_digest rejects str holding non-ASCII characters
+    return hmac.compare_digest(expected.encode(), header_value.encode())
+
+
+class ProfileStore:
+    """Bounded in-memory store of captured request profiles (oldest evicted first)"""
+
+    def __init__(self, max_profiles=50):
+        self.max_profiles = max_profiles
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, metadata, report, raw=None):
+        profile_id = uuid.uuid4().hex
+        entry = dict(metadata, id=profile_id)
+        with self._lock:
+            self._profiles[profile_id] = {"metadata": entry, "report": report, "raw": raw}
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def list(self):
+        with self._lock:
+            return [profile["metadata"] for profile in reversed(self._profiles.values())]
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+class _CProfileSession:
+    """Deterministic profiler backed by the standard library cProfile"""
+
+    engine = 'cprofile'
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def report(self):
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=stream)
+        stats.sort_stats('cumulative').print_stats(50)
+        return stream.getvalue()
+
+    def raw(self):
+        self._profile.create_stats()
+        return marshal.dumps(self._profile.stats)
+
+
+class _PyinstrumentSession:
+    """Sampling profiler backed by pyinstrument (optional dependency)"""
+
+    engine = 'pyinstrument'
+
+    def __init__(self, interval):
+        from pyinstrument import Profiler
+        self._profiler = Profiler(interval=interval)
+
+    def start(self):
+        self._profiler.start()
+
+    def stop(self):
+        self._profiler.stop()
+
+    def report(self):
+        return self._profiler.output_text(unicode=False, color=False)
+
+    def raw(self):
+        return None
+
+
+def _should_profile(app):
+    """Decide whether the current request is profiled (signed header or sampling)"""
+    header_value = request.headers.get(PROFILE_HEADER)
+    secret = app.config.get('PROFILER_SECRET')
+    if header_value and secret and _verify_signature(secret, request.path, header_value):
+        return True
+    sample_rate = app.config.get('PROFILER_SAMPLE_RATE', 0.0)
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def _new_session(app):
+    if app.config.get('PROFILER_ENGINE') == 'pyinstrument':
+        try:
+            return _PyinstrumentSession(app.config.get('PROFILER_SAMPLE_INTERVAL', 0.001))
+        except ImportError:
+            app.logger.warning("pyinstrument is not installed, falling back to cProfile")
+    return _CProfileSession()
+
+
+def init_profiler(app):
+    """Register on-demand profiling hooks.
+
+    Nothing is registered unless PROFILER_ENABLED is set, so a disabled
+    profiler adds no per-request work at all.
+    """
+    if not app.config.get('PROFILER_ENABLED'):
+        return None
+
+    store = ProfileStore(app.config.get('PROFILER_MAX_PROFILES', 50))
+    app.extensions['profiler'] = store
+
+    @app.before_request
+    def _start_profile():
+        if not _should_profile(app):
+            return
+        session = _new_session(app)
+        try:
+            session.start()
+        except ValueError:
+            # Another profiler is already active in this interpreter
+            return
+        g._profile_session = session
+        g._profile_started = time.perf_counter()
+
+    @app.after_request
+    def _finish_profile(response):
+        session = g.pop('_profile_session', None)
+        if session is None:
+            return response
+        session.stop()
+        duration_ms = (time.perf_counter() - g.pop('_profile_started')) * 1000
+        profile_id = store.add({
+            "method": request.method,
+            "path": request.path,
+            "query": request.query_string.decode(),
+            "status_code": response.status_code,
+            "duration_ms": round(duration_ms, 3),
+            "engine": session.engine,
+            "created_at": datetime.utcnow().isoformat()
+        }, session.report(), session.raw())
+        response.headers[PROFILE_ID_HEADER] = profile_id
+        return response
+
+    @app.teardown_request
+    def _abort_profile(exc):
+        session = g.pop('_profile_session', None)
+        if session is not None:
+            session.stop()
+
+    return store
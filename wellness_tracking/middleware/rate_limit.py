@@ -0,0 +1,198 @@
+import math
+from collections import OrderedDict
+import threading
+import time
+from flask import g, jsonify, request
+from sqlalchemy.pool import QueuePool
+
+# Per-endpoint token buckets: endpoint -> (tokens per second, burst capacity)
+DEFAULT_RATE_LIMITS = {
+    'activity.log_activity': (5.0, 20),
+    'activity.log_activities': (1.0, 5),
+    'activity.get_user_activities': (2.0, 10),
+    'activity.get_user_summary': (2.0, 10),
+    'activity.get_user_metrics': (2.0, 10),
+    'activity.sync_device_data': (0.2, 3),
+    'activity.get_sync_status': (2.0, 10)
+}
+
+# Maximum concurrent requests for the expensive endpoints
+DEFAULT_CONCURRENCY_LIMITS = {
+    'activity.sync_device_data': 4,
+    'activity.get_user_summary': 8
+}
+
+# Long-lived streams are not counted as in-flight work
+EXEMPT_ENDPOINTS = frozenset(['activity.health_check', 'stream.stream_activity_updates', 'static'])
+
+
+class RateLimitBackend:
+    """Token bucket storage interface; implementations must be safe to share across threads"""
+
+    def consume(self, key, rate, capacity, cost=1):
+        """Take `cost` tokens from the bucket, returns (allowed, seconds until allowed)"""
+        raise NotImplementedError
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Process-local token buckets"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        # Least recently used first, so the bucket to evict is always at the front
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, capacity, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (cost - tokens) / rate
+
+            # Keys come from clients, cap them; a dropped bucket just starts full again
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Token buckets shared by all workers through Redis (requires the redis package)"""
+
+    _SCRIPT = """
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local rate = tonumber(ARGV[1])
+    local capacity = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local now = tonumber(ARGV[4])
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url, prefix='ratelimit:'):
+        import redis
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._consume = self._client.register_script(self._SCRIPT)
+
+    def consume(self, key, rate, capacity, cost=1):
+        allowed, tokens = self._consume(keys=[self.prefix + key], args=[rate, capacity, cost, time.time()])
+        if allowed:
+            return True, 0.0
+        return False, (cost - float(tokens)) / rate
+
+
+def create_backend(url):
+    """Build a rate limit backend from a storage URL (memory:// or redis://...)"""
+    if not url or url.startswith('memory://'):
+        return InMemoryRateLimitBackend()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisRateLimitBackend(url)
+    raise ValueError(f"Unsupported rate limit storage: {url}")
+
+
+def _rate_limit_subject():
+    """Identify the caller: the user_id in the URL or JSON body, else the client address"""
+    user_id = (request.view_args or {}).get('user_id')
+    if user_id is None and request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            user_id = data.get('user_id')
+    return f"user:{user_id}" if user_id else f"ip:{request.remote_addr}"
+
+
+def _too_many(message, status_code, retry_after):
+    response = jsonify({"error": message})
+    response.status_code = status_code
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+# SQLAlchemy's QueuePool default when SQLALCHEMY_ENGINE_OPTIONS sets no max_overflow
+DEFAULT_MAX_OVERFLOW = 10
+
+
+def _pool_capacity(engine, engine_options):
+    """Connections the engine can hand out before requests start queueing, or None if unbounded.
+
+    Only QueuePool has a fixed size; StaticPool, NullPool and friends report None.
+    """
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return None
+    max_overflow = engine_options.get('max_overflow', DEFAULT_MAX_OVERFLOW)
+    if max_overflow < 0:
+        return None
+    return pool.size() + max_overflow
+
+
+def init_rate_limiter(app):
+    """Register rate limiting, concurrency caps and load shedding when RATE_LIMIT_ENABLED is set"""
+    if not app.config.get('RATE_LIMIT_ENABLED'):
+        return None
+
+    from ..repository import db
+
+    backend = app.config.get('RATE_LIMIT_BACKEND') or create_backend(app.config.get('RATE_LIMIT_STORAGE_URL'))
+    rate_limits = dict(DEFAULT_RATE_LIMITS, **app.config.get('RATE_LIMITS', {}))
+    semaphores = {
+        endpoint: threading.BoundedSemaphore(limit)
+        for endpoint, limit in dict(DEFAULT_CONCURRENCY_LIMITS, **app.config.get('CONCURRENCY_LIMITS', {})).items()
+        if limit
+    }
+    state = {"in_flight": 0, "max_in_flight": app.config.get('LOAD_SHED_MAX_IN_FLIGHT')}
+    lock = threading.Lock()
+    app.extensions['rate_limiter'] = backend
+
+    @app.before_request
+    def _shed_load():
+        if request.endpoint in EXEMPT_ENDPOINTS or request.blueprint == 'admin':
+            return None
+
+        with lock:
+            if state["max_in_flight"] is None:
+                # Default to the database pool size so we shed before requests queue on connections
+                state["max_in_flight"] = _pool_capacity(db.engine, app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})) or 0
+            if state["max_in_flight"] and state["in_flight"] >= state["max_in_flight"]:
+                return _too_many("Service overloaded, retry later", 503, 1)
+            state["in_flight"] += 1
+        g._rate_limit_in_flight = True
+
+        semaphore = semaphores.get(request.endpoint)
+        if semaphore is not None:
+            if not semaphore.acquire(blocking=False):
+                return _too_many("Too many concurrent requests for this endpoint", 503, 1)
+            g._rate_limit_semaphore = semaphore
+
+        rule = rate_limits.get(request.endpoint)
+        if rule is not None:
+            rate, capacity = rule
+            allowed, retry_after = backend.consume(f"{request.endpoint}:{_rate_limit_subject()}", rate, capacity)
+            if not allowed:
+                return _too_many("Rate limit exceeded", 429, retry_after)
+        return None
+
+    @app.teardown_request
+    def _release(exc):
+        semaphore = g.pop('_rate_limit_semaphore', None)
+        if semaphore is not None:
+            semaphore.release()
+        if g.pop('_rate_limit_in_flight', None):
+            with lock:
+                state["in_flight"] -= 1
+
+    return backend
@@ -1,3 +1,32 @@
-from .models import db, WellnessActivity, DeviceSync
+from .models import db, WellnessActivity, DeviceSync, UserProfile, UserMetrics, OutboxEvent, ShardPlacement, create_missing_indexes
+from .sharding import (
+    HashRing,
+    ShardRouter,
+    fan_out,
+    group_by_shard,
+    init_sharding,
+    create_shard_schema,
+    shard_by_user,
+    use_bind,
+    use_shard
+)
 
-__all__ = ['db', 'WellnessActivity', 'DeviceSync']
+__all__ = [
+    'db',
+    'WellnessActivity',
+    'DeviceSync',
+    'UserProfile',
+    'UserMetrics',
+    'OutboxEvent',
+    'ShardPlacement',
+    'create_missing_indexes',
+    'HashRing',
+    'ShardRouter',
+    'fan_out',
+    'group_by_shard',
+    'init_sharding',
+    'create_shard_schema',
+    'shard_by_user',
+    'use_bind',
+    'use_shard'
+]
@@ -0,0 +1,169 @@
+import pytest
+from datetime import date
+import sqlalchemy as sa
+from collections import Counter
+from wellness_tracking.main import create_app
+from wellness_tracking.repository import HashRing, db, fan_out, reshard, use_shard, WellnessActivity
+from wellness_tracking.service import ActivityService, UserService
+
+USERS = [f"user_{i}" for i in range(24)]
+
+def _sharded_app(tmp_path, shards):
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'directory.db'}",
+        'SQLALCHEMY_BINDS': {f'shard{i}': f"sqlite:///{tmp_path / f'shard{i}.db'}" for i in range(3)},
+        'SHARD_BINDS': [f'shard{i}' for i in range(shards)],
+        'SHARD_DIRECTORY_TTL': 0
+    })
+
+def _users_on(app, bind_key):
+    with app.app_context():
+        with db.engines[bind_key].connect() as connection:
+            return set(connection.execute(sa.select(WellnessActivity.user_id).distinct()).scalars())
+
+@pytest.fixture
+def app(tmp_path):
+    return _sharded_app(tmp_path, 2)
+
+def test_hash_ring_is_balanced_and_stable():
+    """Test users spread evenly and adding a shard moves only about 1/N of them"""
+    users = [f"u{i}" for i in range(6000)]
+    two = HashRing(['shard0', 'shard1'])
+    three = HashRing(['shard0', 'shard1', 'shard2'])
+
+    counts = Counter(three.node_for(user) for user in users)
+    assert min(counts.values()) > 1400
+    moved = [user for user in users if two.node_for(user) != three.node_for(user)]
+    assert all(three.node_for(user) == 'shard2' for user in moved)
+    assert len(moved) < 2600
+
+def test_writes_and_reads_are_routed_to_the_user_shard(app):
+    """Test each user's rows land on its ring shard only and are read back from there"""
+    with app.app_context():
+        for user_id in USERS:
+            ActivityService.log_activity(user_id, 'running', 30.0, 'minutes')
+        ActivityService.log_activities([{"user_id": user_id, "activity_type": "sleep", "value": 8.0, "unit": "hours"}
+                                        for user_id in USERS])
+        UserService.set_timezone(USERS[0], 'Europe/Berlin')
+        router = app.extensions['shard_router']
+        expected = {bind_key: {user for user in USERS if router.shard_for(user) == bind_key}
+                    for bind_key in router.bind_keys}
+
+        for user_id in USERS:
+            assert len(ActivityService.get_user_activities(user_id)['activities']) == 2
+        assert UserService.get_timezone(USERS[0])['timezone'] == 'Europe/Berlin'
+
+        counts = fan_out(lambda: db.session.query(sa.func.count(WellnessActivity.id)).scalar())
+
+    assert all(expected.values())
+    for bind_key, users in expected.items():
+        assert _users_on(app, bind_key) == users
+        assert counts[bind_key] == 2 * len(users)
+
+def test_device_sync_routes_rows_by_user(app):
+    """Test synced rows for other users go to their own shards"""
+    records = [{"user_id": user_id, "date": "2024-01-01", "activity_type": "running", "value": 5.0, "unit": "minutes"}
+               for user_id in USERS[:6]]
+    with app.app_context():
+        ActivityService.sync_device_data(USERS[0], records)
+        for user_id in USERS[:6]:
+            with use_shard(user_id):
+                assert WellnessActivity.query.filter_by(user_id=user_id).count() == 1
+        assert ActivityService.get_sync_status(USERS[0])['last_sync_date']
+
+def test_reshard_moves_users_online(tmp_path):
+    """Test pin + rebalance moves users to a new shard without losing rows"""
+    old = _sharded_app(tmp_path, 2)
+    with old.app_context():
+        for user_id in USERS:
+            ActivityService.log_activity(user_id, 'running', 30.0, 'minutes')
+            ActivityService.log_activity(user_id, 'walking', 10.0, 'minutes')
+    pinned = reshard.pin(old, ['shard0', 'shard1', 'shard2'])
+    assert pinned > 0
+
+    new = _sharded_app(tmp_path, 3)
+    with new.app_context():
+        # Pinned users are still served from their old shard before the move
+        assert all(len(ActivityService.get_user_activities(user_id)['activities']) == 2 for user_id in USERS)
+
+    moved = reshard.rebalance(new, settle_seconds=0)
+    assert len(moved) == pinned
+    assert all(rows == 2 for rows in moved.values())
+
+    router = new.extensions['shard_router']
+    with new.app_context():
+        assert router.placements() == {}
+        assert all(len(ActivityService.get_user_activities(user_id)['activities']) == 2 for user_id in USERS)
+    for bind_key in router.bind_keys:
+        assert _users_on(new, bind_key) == {user for user in USERS if router.ring.node_for(user) == bind_key}
+
+def test_move_keeps_rows_committed_during_the_drain(tmp_path, monkeypatch):
+    """Test a write landing on the old shard after the post-flip copy is moved, not deleted"""
+    app = _sharded_app(tmp_path, 2)
+    user_id = USERS[0]
+    with app.app_context():
+        ActivityService.log_activity(user_id, 'running', 30.0, 'minutes')
+        source = app.extensions['shard_router'].shard_for(user_id)
+    target = 'shard1' if source == 'shard0' else 'shard0'
+
+    copy_user = reshard._copy_user
+    calls = []
+
+    def copy_then_late_write(source_engine, target_engine, moved_user, copied):
+        count = copy_user(source_engine, target_engine, moved_user, copied)
+        calls.append(count)
+        if len(calls) == 2:
+            # A writer that routed to the old shard before the flip commits now
+            with source_engine.begin() as connection:
+                connection.execute(WellnessActivity.__table__.insert(), [{
+                    "user_id": moved_user, "date": date.today(), "activity_type": "walking",
+                    "value": 5.0, "unit": "minutes"
+                }])
+        return count
+
+    monkeypatch.setattr(reshard, '_copy_user', copy_then_late_write)
+    assert reshard.move_user(app, user_id, target, settle_seconds=0) == 2
+
+    assert _users_on(app, source) == set()
+    with app.app_context():
+        activities = ActivityService.get_user_activities(user_id)['activities']
+        assert sorted(a['activity_type'] for a in activities) == ['running', 'walking']
+
+def test_router_reloads_only_changed_placements(tmp_path):
+    """Test directory reloads pick up new pins and tombstones incrementally"""
+    app = _sharded_app(tmp_path, 2)
+    router = app.extensions['shard_router']
+    user_id = USERS[0]
+    home = router.ring.node_for(user_id)
+    other = 'shard1' if home == 'shard0' else 'shard0'
+
+    with app.app_context():
+        reshard._set_placement(app, user_id, other)
+        reshard._set_placement(app, USERS[1], other)
+        reshard._set_placement(app, user_id, None)
+
+    fresh = _sharded_app(tmp_path, 2).extensions['shard_router']
+    with app.app_context():
+        fresh.reload()
+        assert fresh.placements() == {USERS[1]: other}
+        assert fresh.shard_for(user_id) == home
+        version = fresh._version
+        fresh.reload()
+        assert fresh._version == version
+
+def test_startup_creates_indexes_missing_from_existing_tables(tmp_path):
+    """Test an index added to a model is created on existing default and shard tables"""
+    app = _sharded_app(tmp_path, 2)
+    with app.app_context():
+        engines = [db.engine, db.engines['shard0'], db.engines['shard1']]
+    for engine in engines:
+        with engine.begin() as connection:
+            connection.execute(sa.text("DROP INDEX idx_user_date_rollup"))
+        engine.dispose()
+
+    app = _sharded_app(tmp_path, 2)
+    with app.app_context():
+        for engine in [db.engine, db.engines['shard0'], db.engines['shard1']]:
+            indexes = {index['name'] for index in sa.inspect(engine).get_indexes('wellness_activity')}
+            assert 'idx_user_date_rollup' in indexes
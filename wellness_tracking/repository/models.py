@@ -1,7 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from .sharding import RoutingSession
 
-db = SQLAlchemy()
+# The routing session sends user-keyed tables to the user's shard when sharding is enabled
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 class WellnessActivity(db.Model):
     """Wellness activity data model"""
@@ -11,9 +13,11 @@ class WellnessActivity(db.Model):
     activity_type = db.Column(db.String(50), nullable=False)  # meditation, workout, hydration, sleep
     value = db.Column(db.Float, nullable=False)  # Value (minutes, liters, hours, etc.)
     unit = db.Column(db.String(20), nullable=False)  # Unit
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)  # UTC timestamp
     
-    __table_args__ = (db.Index('idx_user_date', 'user_id', 'date'),)
+    # `date` is the local-day key in the user's timezone, precomputed at write time.
+    # The index covers the summary rollup columns so range scans never touch the table.
+    __table_args__ = (db.Index('idx_user_date_rollup', 'user_id', 'date', 'activity_type', 'value', 'unit'),)
 
 class DeviceSync(db.Model):
     """Device synchronization record model"""
@@ -21,3 +25,55 @@ class DeviceSync(db.Model):
     user_id = db.Column(db.String(50), nullable=False)
     sync_date = db.Column(db.Date, nullable=False)
     last_sync_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class UserProfile(db.Model):
+    """Per-user settings model"""
+    user_id = db.Column(db.String(50), primary_key=True)
+    timezone = db.Column(db.String(64), nullable=False, default='UTC')  # IANA name, e.g. Europe/Berlin
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class UserMetrics(db.Model):
+    """Derived per-user metrics state, maintained incrementally on writes"""
+    user_id = db.Column(db.String(50), primary_key=True)
+    # {activity_type: [last active day ordinal, current streak, longest streak, daily totals newest first, unit]}
+    state = db.Column(db.JSON, nullable=False, default=dict)
+    # Set when the state must be rebuilt from the activity table (done by the metrics backfill worker)
+    stale = db.Column(db.Boolean, nullable=False, default=False, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class OutboxEvent(db.Model):
+    """Post-write event committed with the write and delivered by the outbox dispatcher"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(50), nullable=False)
+    event_type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Delivery attempts so far; the event is retried no earlier than available_at
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.String(500))
+    # Lease taken by the dispatcher delivering the event; expired leases can be claimed again
+    claimed_by = db.Column(db.String(32))
+    claimed_until = db.Column(db.DateTime)
+
+    # Dispatchers look up a user's earlier events before claiming one
+    __table_args__ = (db.Index('idx_outbox_user_id', 'user_id', 'id'),)
+
+class ShardPlacement(db.Model):
+    """Shard directory entry pinning a user to a shard bind (default bind only)"""
+    user_id = db.Column(db.String(50), primary_key=True)
+    # None once the user is unpinned and placed by the hash ring again
+    bind_key = db.Column(db.String(50))
+    # Directory-wide change counter, so routers only reload entries changed since their last read
+    version = db.Column(db.Integer, nullable=False, default=0, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+def create_missing_indexes(bind, tables=None):
+    """Create model indexes absent from existing tables.
+
+    create_all only builds indexes together with a new table, so an index
+    added or renamed on a model never reaches an existing database otherwise.
+    """
+    for table in db.metadata.sorted_tables if tables is None else tables:
+        for index in table.indexes:
+            index.create(bind, checkfirst=True)
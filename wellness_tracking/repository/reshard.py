@@ -0,0 +1,236 @@
+"""
+Move users between shards while the service keeps running.
+
+Adding a shard (e.g. a third URL in SHARD_DATABASE_URLS) takes three steps:
+
+    # 1. Pin every user whose shard changes under the new ring to where their data is now
+    python -m wellness_tracking.repository.reshard pin --to shard0,shard1,shard2
+    # 2. Deploy the new SHARD_DATABASE_URLS; pinned users keep being served from their old shard
+    # 3. Copy pinned users to their ring shard, then unpin them
+    python -m wellness_tracking.repository.reshard rebalance
+
+Each move copies the user's rows, flips the directory entry and waits for
+workers to reload the directory. Then it drains the old shard: it copies
+rows written there in the meantime and deletes exactly the rows already
+copied, repeating until nothing is left. A write that routed to the old shard
+before the flip and commits late is copied on the next pass, not deleted.
+Until the flip the target copy is disposable, so an interrupted move can
+simply be rerun.
+"""
+
+import argparse
+import sys
+import time
+import sqlalchemy as sa
+from .models import db, ShardPlacement, WellnessActivity, DeviceSync, UserProfile, UserMetrics
+from .sharding import HashRing
+
+# Tables copied per user, those with surrogate ids get fresh ids on the target
+_ID_TABLES = (WellnessActivity.__table__, DeviceSync.__table__)
+_PROFILE_TABLE = UserProfile.__table__
+# Derived state is not copied, it is rebuilt from the moved rows on the next read
+_DERIVED_TABLES = (UserMetrics.__table__,)
+
+
+def _router(app):
+    router = app.extensions.get('shard_router')
+    if router is None:
+        raise RuntimeError("Sharding is not enabled (SHARD_BINDS is empty)")
+    return router
+
+
+def shard_users(app):
+    """Return {bind_key: set of user ids stored on that shard}"""
+    router = _router(app)
+    users = {}
+    with app.app_context():
+        for bind_key in router.bind_keys:
+            query = sa.union(*(sa.select(table.c.user_id) for table in _ID_TABLES + (_PROFILE_TABLE,)))
+            with db.engines[bind_key].connect() as connection:
+                users[bind_key] = set(connection.execute(query).scalars())
+    return users
+
+
+def plan(app, bind_keys):
+    """List (user_id, current shard, shard under a ring over `bind_keys`) for users that would move"""
+    router = _router(app)
+    ring = HashRing(bind_keys, router.vnodes)
+    moves = []
+    for bind_key, user_ids in shard_users(app).items():
+        for user_id in sorted(user_ids):
+            target = ring.node_for(str(user_id))
+            if target != bind_key:
+                moves.append((user_id, bind_key, target))
+    return moves
+
+
+def pin(app, bind_keys):
+    """Pin users that would move under the new ring to their current shard, returns the number pinned"""
+    moves = plan(app, bind_keys)
+    with app.app_context():
+        for user_id, current, _ in moves:
+            _set_placement(app, user_id, current)
+    return len(moves)
+
+
+def move_user(app, user_id, target, settle_seconds=None, drain_timeout=300):
+    """Move one user's rows to `target` online, returns the number of rows copied"""
+    router = _router(app)
+    if settle_seconds is None:
+        settle_seconds = router.directory_ttl + 1
+
+    with app.app_context():
+        router.reload()
+        source = router.shard_for(user_id)
+        if source == target:
+            return 0
+        source_engine, target_engine = db.engines[source], db.engines[target]
+
+        # The target does not serve this user yet, so leftovers of an interrupted move are discarded
+        with target_engine.begin() as connection:
+            _delete_user(connection, user_id)
+        copied = {}
+        count = _copy_user(source_engine, target_engine, user_id, copied)
+
+        # Flip the directory, then give every worker time to pick up the new placement
+        _set_placement(app, user_id, target)
+        time.sleep(settle_seconds)
+
+        # Drain the old shard; writers that routed there before the flip may still commit
+        deadline = time.monotonic() + drain_timeout
+        while True:
+            count += _copy_user(source_engine, target_engine, user_id, copied)
+            with source_engine.begin() as connection:
+                _delete_copied(connection, user_id, copied)
+                remaining = _count_user(connection, user_id)
+            if not remaining:
+                break
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{remaining} rows of {user_id} kept arriving on {source}, they were left there")
+            time.sleep(min(settle_seconds, 1.0))
+
+        with target_engine.begin() as connection:
+            for table in _DERIVED_TABLES:
+                connection.execute(table.delete().where(table.c.user_id == user_id))
+
+        if router.ring.node_for(str(user_id)) == target:
+            _set_placement(app, user_id, None)
+    return count
+
+
+def rebalance(app, settle_seconds=None):
+    """Move every pinned user to its ring shard, returns {user_id: rows copied}"""
+    router = _router(app)
+    with app.app_context():
+        router.reload()
+        placements = router.placements()
+
+    moved = {}
+    for user_id, bind_key in sorted(placements.items()):
+        target = router.ring.node_for(str(user_id))
+        if bind_key == target:
+            with app.app_context():
+                _set_placement(app, user_id, None)
+            continue
+        moved[user_id] = move_user(app, user_id, target, settle_seconds)
+    return moved
+
+
+def _copy_user(source_engine, target_engine, user_id, copied):
+    """Copy the user's rows not yet in `copied` ({table: source ids}, updated in place), returns rows copied"""
+    count = 0
+    with source_engine.connect() as source, target_engine.begin() as target:
+        for table in _ID_TABLES:
+            done = copied.setdefault(table.name, set())
+            rows = [row for row in source.execute(
+                sa.select(table).where(table.c.user_id == user_id).order_by(table.c.id)
+            ).mappings() if row['id'] not in done]
+            if rows:
+                target.execute(table.insert(), [{key: value for key, value in row.items() if key != 'id'}
+                                                for row in rows])
+                done.update(row['id'] for row in rows)
+                count += len(rows)
+
+        profile = source.execute(sa.select(_PROFILE_TABLE).where(_PROFILE_TABLE.c.user_id == user_id)).mappings().first()
+        if profile is not None and dict(profile) != copied.get(_PROFILE_TABLE.name):
+            target.execute(_PROFILE_TABLE.delete().where(_PROFILE_TABLE.c.user_id == user_id))
+            target.execute(_PROFILE_TABLE.insert(), [dict(profile)])
+            copied[_PROFILE_TABLE.name] = dict(profile)
+            count += 1
+    return count
+
+
+def _delete_copied(connection, user_id, copied):
+    """Delete exactly the source rows that were copied, rows written since stay for the next pass"""
+    for table in _ID_TABLES:
+        ids = sorted(copied.get(table.name, ()))
+        for start in range(0, len(ids), 500):
+            connection.execute(table.delete().where(table.c.user_id == user_id,
+                                                    table.c.id.in_(ids[start:start + 500])))
+    profile = copied.get(_PROFILE_TABLE.name)
+    if profile is not None:
+        connection.execute(_PROFILE_TABLE.delete().where(
+            *(_PROFILE_TABLE.c[key] == value for key, value in profile.items())))
+
+
+def _count_user(connection, user_id):
+    return sum(connection.execute(sa.select(sa.func.count()).select_from(table).where(table.c.user_id == user_id))
+               .scalar() for table in _ID_TABLES + (_PROFILE_TABLE,))
+
+
+def _delete_user(connection, user_id):
+    for table in _ID_TABLES + (_PROFILE_TABLE,) + _DERIVED_TABLES:
+        connection.execute(table.delete().where(table.c.user_id == user_id))
+
+
+def _set_placement(app, user_id, bind_key):
+    """Write (or with None clear) a directory entry under a new version and apply it to this process.
+
+    Cleared entries stay as tombstones so routers see the change on their next incremental reload.
+    Versions are assigned as max + 1, so run one reshard tool at a time.
+    """
+    try:
+        version = (db.session.query(sa.func.max(ShardPlacement.version)).scalar() or 0) + 1
+        placement = db.session.get(ShardPlacement, user_id)
+        if placement is None:
+            if bind_key is None:
+                return
+            db.session.add(ShardPlacement(user_id=user_id, bind_key=bind_key, version=version))
+        else:
+            placement.bind_key = bind_key
+            placement.version = version
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        raise e
+    _router(app).place(user_id, bind_key)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    pin_parser = commands.add_parser('pin', help='Pin users that move under a new shard list')
+    pin_parser.add_argument('--to', required=True, help='Comma-separated bind keys of the new shard list')
+    rebalance_parser = commands.add_parser('rebalance', help='Move pinned users to their ring shard')
+    rebalance_parser.add_argument('--settle', type=float, help='Seconds to wait after each flip')
+    move_parser = commands.add_parser('move', help='Move one user to a shard')
+    move_parser.add_argument('user_id')
+    move_parser.add_argument('target')
+    move_parser.add_argument('--settle', type=float, help='Seconds to wait after the flip')
+    args = parser.parse_args(argv)
+
+    from ..main import create_app
+    app = create_app()
+
+    if args.command == 'pin':
+        print(f"Pinned {pin(app, args.to.split(','))} users")
+    elif args.command == 'rebalance':
+        moved = rebalance(app, args.settle)
+        print(f"Moved {len(moved)} users ({sum(moved.values())} rows)")
+    else:
+        print(f"Copied {move_user(app, args.user_id, args.target, args.settle)} rows")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,226 @@
+import bisect
+import functools
+import hashlib
+import inspect
+import operator
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import current_app
+from flask_sqlalchemy.session import Session
+import sqlalchemy as sa
+from sqlalchemy.sql.util import find_tables
+
+# Tables keyed by user_id that live on the user's shard; everything else stays on the default bind
+SHARDED_TABLES = frozenset(['wellness_activity', 'device_sync', 'user_profile', 'user_metrics', 'outbox_event'])
+
+# Bind key of the shard the current request works on, None when unrouted
+_current_bind = ContextVar('wellness_shard_bind', default=None)
+
+
+class HashRing:
+    """Consistent hash ring over shard bind keys; adding a shard moves about 1/N of the users"""
+
+    def __init__(self, nodes, vnodes=64):
+        if not nodes:
+            raise ValueError("A hash ring needs at least one node")
+        self.nodes = tuple(nodes)
+        points = sorted((_hash(f"{node}#{replica}"), node) for node in self.nodes for replica in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key):
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class ShardRouter:
+    """Maps user ids to shard bind keys.
+
+    Users are placed by the hash ring unless the shard directory (the
+    shard_placement table on the default bind) pins them elsewhere, which is
+    how the reshard tool moves users online. Every `directory_ttl` seconds the
+    router reads the entries changed since its last read (by version), so
+    placements written by other processes apply.
+    """
+
+    def __init__(self, app, bind_keys, vnodes=64, directory_ttl=5.0):
+        self.app = app
+        self.bind_keys = tuple(bind_keys)
+        self.vnodes = vnodes
+        self.ring = HashRing(self.bind_keys, vnodes)
+        self.directory_ttl = directory_ttl
+        self._placements = {}
+        self._version = 0
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def shard_for(self, user_id):
+        placements = self._directory()
+        return placements.get(user_id) or self.ring.node_for(str(user_id))
+
+    def placements(self):
+        """Current directory entries as {user_id: bind_key}"""
+        return dict(self._directory())
+
+    def place(self, user_id, bind_key):
+        """Record a placement in this process without waiting for the next directory reload"""
+        with self._lock:
+            placements = dict(self._placements)
+            if bind_key is None:
+                placements.pop(user_id, None)
+            else:
+                placements[user_id] = bind_key
+            self._placements = placements
+
+    def reload(self):
+        """Apply directory entries changed since the last reload"""
+        from .models import ShardPlacement, db
+
+        table = ShardPlacement.__table__
+        with db.engines[None].connect() as connection:
+            rows = connection.execute(
+                sa.select(table.c.user_id, table.c.bind_key, table.c.version)
+                .where(table.c.version > self._version)
+                .order_by(table.c.version)
+            ).all()
+        with self._lock:
+            if rows:
+                placements = dict(self._placements)
+                for user_id, bind_key, version in rows:
+                    if bind_key is None:
+                        placements.pop(user_id, None)
+                    else:
+                        placements[user_id] = bind_key
+                    self._version = max(self._version, version)
+                self._placements = placements
+            self._loaded_at = time.monotonic()
+
+    def _directory(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.directory_ttl:
+            self.reload()
+        return self._placements
+
+
+class RoutingSession(Session):
+    """Session that sends statements on sharded tables to the bind selected by use_shard()"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        bind_key = _current_bind.get()
+        if bind is None and bind_key is not None and _sharded_table(mapper, clause) is not None:
+            return self._db.engines[bind_key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _sharded_table(mapper, clause):
+    tables = []
+    if mapper is not None:
+        tables = [sa.inspect(mapper).local_table]
+    elif isinstance(clause, sa.Table):
+        tables = [clause]
+    elif isinstance(clause, sa.UpdateBase) and isinstance(clause.table, sa.Table):
+        tables = [clause.table]
+    elif isinstance(clause, sa.Select):
+        # Core selects over tables, aliases or joins are routed by the tables they read
+        tables = [table for from_ in clause.get_final_froms() for table in find_tables(from_)]
+    for table in tables:
+        if table.name in SHARDED_TABLES:
+            return table
+    return None
+
+
+def shard_router():
+    """Return the app's shard router, or None when sharding is disabled"""
+    return current_app.extensions.get('shard_router')
+
+
+@contextmanager
+def use_bind(bind_key):
+    """Route sharded tables to `bind_key` (None for the default bind) within the block"""
+    token = _current_bind.set(bind_key)
+    try:
+        yield bind_key
+    finally:
+        _current_bind.reset(token)
+
+
+@contextmanager
+def use_shard(user_id):
+    """Route sharded tables to `user_id`'s shard within the block"""
+    router = shard_router()
+    with use_bind(router.shard_for(user_id) if router is not None else None) as bind_key:
+        yield bind_key
+
+
+def shard_by_user(fn):
+    """Decorator: run `fn` on the shard of its `user_id` argument"""
+    signature = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        user_id = signature.bind_partial(*args, **kwargs).arguments['user_id']
+        with use_shard(user_id):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def group_by_shard(rows, key='user_id'):
+    """Split rows into {bind_key: rows} by the shard of each row's user (`key` is a field name or callable)"""
+    router = shard_router()
+    if router is None:
+        return {None: list(rows)}
+    user_of = key if callable(key) else operator.itemgetter(key)
+    groups = {}
+    for row in rows:
+        groups.setdefault(router.shard_for(user_of(row)), []).append(row)
+    return groups
+
+
+def fan_out(fn):
+    """Run `fn()` once per shard and return {bind_key: result}, for cross-user reads"""
+    router = shard_router()
+    bind_keys = router.bind_keys if router is not None else (None,)
+    results = {}
+    for bind_key in bind_keys:
+        with use_bind(bind_key):
+            results[bind_key] = fn()
+    return results
+
+
+def create_shard_schema(app):
+    """Create the sharded tables, and any indexes they are missing, on every shard bind"""
+    from .models import create_missing_indexes, db
+
+    router = app.extensions.get('shard_router')
+    if router is None:
+        return
+    tables = [table for table in db.metadata.sorted_tables if table.name in SHARDED_TABLES]
+    with app.app_context():
+        for bind_key in router.bind_keys:
+            db.metadata.create_all(db.engines[bind_key], tables=tables)
+            create_missing_indexes(db.engines[bind_key], tables)
+
+
+def init_sharding(app):
+    """Route users across the SHARD_BINDS binds when sharding is configured"""
+    bind_keys = app.config.get('SHARD_BINDS')
+    if not bind_keys:
+        return None
+
+    missing = [key for key in bind_keys if key not in app.config.get('SQLALCHEMY_BINDS', {})]
+    if missing:
+        raise ValueError(f"Shard binds missing from SQLALCHEMY_BINDS: {missing}")
+
+    router = ShardRouter(
+        app,
+        bind_keys,
+        vnodes=app.config.get('SHARD_VNODES', 64),
+        directory_ttl=app.config.get('SHARD_DIRECTORY_TTL', 5.0)
+    )
+    app.extensions['shard_router'] = router
+    return router
@@ -1,3 +1,38 @@
 from .activity_service import ActivityService
+from .change_feed import ChangeFeed, InProcessChangeFeed, init_change_feed
+from .device_client import DeviceFetchError, stream_device_records
+from .hot_store import HotActivityStore, init_hot_store
+from .metrics_service import MetricsBackfill, MetricsService, init_metrics_backfill, record_metrics
+from .outbox import OutboxDispatcher, init_outbox, stage_events
+from .single_flight import SingleFlight
+from .user_service import UserService
+from .validation import ACTIVITY_TYPES, ACTIVITY_VALIDATOR, DEVICE_RECORD_VALIDATOR, RecordValidator, ValidationError
+from .write_buffer import WriteBehindBuffer, WriteBufferFull, init_write_buffer
 
-__all__ = ['ActivityService']
+__all__ = [
+    'ActivityService',
+    'ChangeFeed',
+    'InProcessChangeFeed',
+    'init_change_feed',
+    'DeviceFetchError',
+    'stream_device_records',
+    'HotActivityStore',
+    'init_hot_store',
+    'MetricsBackfill',
+    'MetricsService',
+    'init_metrics_backfill',
+    'record_metrics',
+    'OutboxDispatcher',
+    'init_outbox',
+    'stage_events',
+    'SingleFlight',
+    'UserService',
+    'ACTIVITY_TYPES',
+    'ACTIVITY_VALIDATOR',
+    'DEVICE_RECORD_VALIDATOR',
+    'RecordValidator',
+    'ValidationError',
+    'WriteBehindBuffer',
+    'WriteBufferFull',
+    'init_write_buffer'
+]
@@ -0,0 +1,165 @@
+import json
+import socket
+import pytest
+import sqlalchemy as sa
+from wellness_tracking.repository import db, WellnessActivity, DeviceSync
+from wellness_tracking.service import ActivityService, DeviceFetchError
+from wellness_tracking.service import activity_service
+from wellness_tracking.service.device_client import iter_json_array, iter_ndjson
+
+RECORDS = [{
+    "user_id": "u1",
+    "date": f"2024-01-{day:02d}",
+    "activity_type": "running",
+    "value": 10.5 + day,
+    "unit": "minutes"
+} for day in range(1, 26)]
+
+@pytest.fixture
+def app(make_app):
+    return make_app({
+        'SYNC_CHUNK_SIZE': 10,
+        'SYNC_RESPONSE_PREVIEW': 5
+    })
+
+def _split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+@pytest.mark.parametrize('size', [1, 3, 7, 64])
+def test_iter_json_array_handles_any_chunking(size):
+    """Test array elements are parsed correctly however the body is split"""
+    body = json.dumps(RECORDS + [1.25, "text", None, [1, 2]], indent=1)
+    assert list(iter_json_array(_split(body, size))) == RECORDS + [1.25, "text", None, [1, 2]]
+
+def test_iter_json_array_edge_cases():
+    """Test empty arrays parse and malformed bodies raise ValueError"""
+    assert list(iter_json_array(['[ ', ']'])) == []
+    with pytest.raises(ValueError):
+        list(iter_json_array(_split(json.dumps(RECORDS)[:-20], 8)))
+    with pytest.raises(ValueError):
+        list(iter_json_array(['{"user_id": "u1"}']))
+
+def test_iter_json_array_stops_at_oversized_element():
+    """Test a malformed element fails once it passes the size limit instead of buffering the whole body"""
+    read = []
+
+    def chunks():
+        yield '[{"user_id": "u1"}, {"user_id": "unterminated'
+        for _ in range(1000):
+            read.append(1)
+            yield 'x' * 64
+
+    parsed = iter_json_array(chunks(), max_element_chars=256)
+    assert next(parsed) == {"user_id": "u1"}
+    with pytest.raises(ValueError, match="exceeds 256 characters"):
+        next(parsed)
+    assert len(read) < 10
+
+@pytest.mark.parametrize('size', [1, 5, 64])
+def test_iter_ndjson_handles_any_chunking(size):
+    """Test NDJSON lines are parsed one record each, skipping blank lines"""
+    body = '\n'.join(json.dumps(record) for record in RECORDS[:3]) + '\n\n'
+    assert list(iter_ndjson(_split(body, size))) == RECORDS[:3]
+    assert list(iter_ndjson(_split(body.rstrip(), size))) == RECORDS[:3]
+
+def test_iter_ndjson_stops_at_oversized_line():
+    """Test a line without an end fails once it passes the size limit instead of buffering the whole body"""
+    read = []
+
+    def chunks():
+        yield '{"user_id": "u1"}\n{"user_id": "unterminated'
+        for _ in range(1000):
+            read.append(1)
+            yield 'x' * 64
+
+    parsed = iter_ndjson(chunks(), max_line_chars=256)
+    assert next(parsed) == {"user_id": "u1"}
+    with pytest.raises(ValueError, match="exceeds 256 characters"):
+        next(parsed)
+    assert len(read) < 10
+
+def test_sync_downloads_before_opening_the_transaction(app, monkeypatch):
+    """Test device records are fully read before the first insert, so a slow download holds no write lock"""
+    consumed = []
+    consumed_at_first_write = []
+
+    def records(user_id):
+        for record in RECORDS:
+            consumed.append(record)
+            yield record
+
+    def before_execute(conn, cursor, statement, *args):
+        if statement.startswith('INSERT') and not consumed_at_first_write:
+            consumed_at_first_write.append(len(consumed))
+
+    monkeypatch.setattr(activity_service, 'stream_device_records', records)
+    with app.app_context():
+        sa.event.listen(db.engine, 'before_cursor_execute', before_execute)
+        try:
+            result = ActivityService.sync_user_device('u1')
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute', before_execute)
+    assert result['synced_count'] == len(RECORDS)
+    assert consumed_at_first_write == [len(RECORDS)]
+
+def test_stalled_device_api_times_out(make_app):
+    """Test a device API that accepts the connection but never answers fails the sync after the read timeout"""
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    try:
+        app = make_app({
+            'DEVICE_API_BASE': f"http://127.0.0.1:{listener.getsockname()[1]}",
+            'DEVICE_API_READ_TIMEOUT': 0.2
+        })
+        with app.app_context():
+            with pytest.raises(DeviceFetchError):
+                ActivityService.sync_user_device('u1')
+            assert WellnessActivity.query.count() == 0
+    finally:
+        listener.close()
+
+def test_sync_consumes_records_lazily_in_chunks(app):
+    """Test sync accepts a generator, inserts every chunk and caps the preview"""
+    consumed = []
+
+    def records():
+        for record in RECORDS:
+            consumed.append(record)
+            yield record
+
+    with app.app_context():
+        result = ActivityService.sync_device_data('u1', records())
+        assert result['synced_count'] == len(RECORDS)
+        assert len(result['synced_activities']) == 5
+        assert len(consumed) == len(RECORDS)
+        assert WellnessActivity.query.filter_by(user_id='u1').count() == len(RECORDS)
+        assert DeviceSync.query.filter_by(user_id='u1').count() == 1
+
+def test_sync_rejects_invalid_rows_individually(app):
+    """Test invalid device rows are reported while the valid ones are synced"""
+    bad = [
+        {"user_id": "u1", "date": "not-a-date", "activity_type": "running", "value": 1, "unit": "minutes"},
+        {"user_id": "u1", "date": "2024-01-02", "activity_type": "flying", "value": 1, "unit": "minutes"},
+        {"user_id": "u1", "date": "2024-01-02", "activity_type": "running", "unit": "minutes"}
+    ]
+
+    with app.app_context():
+        result = ActivityService.sync_device_data('u1', RECORDS[:12] + bad)
+        assert result['synced_count'] == 12
+        assert result['rejected_count'] == 3
+        assert [row['index'] for row in result['rejected']] == [12, 13, 14]
+        assert result['rejected'][2]['error'] == 'Missing required field: value'
+        assert WellnessActivity.query.count() == 12
+
+def test_sync_rolls_back_all_chunks_on_error(app):
+    """Test a stream failing midway aborts the whole sync, including chunks already inserted"""
+    def records():
+        yield from RECORDS[:15]
+        raise DeviceFetchError("connection reset")
+
+    with app.app_context():
+        with pytest.raises(DeviceFetchError):
+            ActivityService.sync_device_data('u1', records())
+        assert WellnessActivity.query.count() == 0
+        assert DeviceSync.query.count() == 0
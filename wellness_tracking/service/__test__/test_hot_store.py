@@ -0,0 +1,160 @@
+import pytest
+import threading
+from array import array
+from datetime import date, datetime, timedelta
+from wellness_tracking.repository import db, WellnessActivity
+from wellness_tracking.service import ACTIVITY_TYPES, ActivityService, HotActivityStore
+
+@pytest.fixture
+def app(make_app):
+    app = make_app({
+        'HOT_STORE_ENABLED': True,
+        'HOT_STORE_ADMIT_AFTER': 1,
+        'HOT_STORE_WINDOW_DAYS': 30
+    })
+    with app.app_context():
+        yield app
+
+def _add(user_id, days_ago, activity_type='running', value=10.0):
+    db.session.add(WellnessActivity(
+        user_id=user_id,
+        date=date.today() - timedelta(days=days_ago),
+        activity_type=activity_type,
+        value=value,
+        unit='minutes'
+    ))
+    db.session.commit()
+
+def _forbid_database(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("database was queried")
+    monkeypatch.setattr(db.session, 'query', fail)
+    monkeypatch.setattr(WellnessActivity, 'query', property(fail))
+
+def test_store_columns_and_eviction():
+    """Test rows are stored in typed arrays and the memory budget evicts least recently used users"""
+    store = HotActivityStore(window_days=30, admit_after=1)
+    # 200 bytes for rows on top of the interned strings
+    store.memory_budget_bytes = store.memory_usage() + 200
+    today = date.today()
+    row = (1, today, 'running', 12.5, 'minutes', datetime(2025, 1, 1, 8, 30))
+
+    assert store.load('user_1', [row], today, False, store.version())
+    columns = store.lookup('user_1', today)
+    assert columns.values.typecode == 'd' and columns.days.typecode == 'i'
+    assert store.activities(columns)[0]['created_at'] == '2025-01-01T08:30:00'
+
+    store.load('user_2', [row] * 3, today, False, store.version())
+    store.load('user_3', [row] * 3, today, False, store.version())
+    assert store.lookup('user_1', today) is None
+    assert store.memory_usage() <= store.memory_budget_bytes
+
+def test_stale_load_is_discarded():
+    """Test a load that raced a write is not installed"""
+    store = HotActivityStore()
+    version = store.version()
+    store.record('user_1', [])
+    assert not store.load('user_1', [], date.today(), False, version)
+
+def test_record_skips_rows_the_load_already_read():
+    """Test a write committed between the version read and the load is not counted twice"""
+    store = HotActivityStore()
+    today = date.today()
+    row = (7, today, 'running', 12.5, 'minutes', datetime(2025, 1, 1, 8, 30))
+
+    assert store.load('user_1', [row], today, False, store.version())
+    store.record('user_1', [row, (8,) + row[1:]])
+    assert [a['id'] for a in store.activities(store.lookup('user_1', today))] == [7, 8]
+
+def test_full_string_table_resets_the_store():
+    """Test new units beyond max_strings empty the store instead of overflowing the codes"""
+    store = HotActivityStore(max_strings=len(ACTIVITY_TYPES) + 1)
+    today = date.today()
+    row = (1, today, 'running', 1.0, 'minutes', datetime(2025, 1, 1))
+
+    assert store.load('user_1', [row], today, False, store.version())
+    store.record('user_1', [(2, today, 'running', 1.0, 'steps', datetime(2025, 1, 1))])
+    assert store.lookup('user_1', today) is None
+    assert not store.load('user_2', [row, (2, today, 'running', 1.0, 'steps', datetime(2025, 1, 1))],
+                          today, False, store.version())
+    assert store.load('user_1', [row], today, False, store.version())
+
+def test_reads_never_see_a_half_recorded_row():
+    """Test scans wait for a concurrent write that has appended only some of a row's columns"""
+    store = HotActivityStore(window_days=30, admit_after=1)
+    today = date.today()
+    created = datetime(2025, 1, 1, 8, 30)
+    store.load('user_1', [(1, today, 'running', 1.0, 'minutes', created)], today, False, store.version())
+    columns = store.lookup('user_1', today)
+    midway = threading.Event()
+    resume = threading.Event()
+
+    class PausingArray(array):
+        def append(self, value):
+            midway.set()
+            resume.wait(5)
+            super().append(value)
+
+    # Writes append ids, days and values, then pause before the type code
+    columns.types = PausingArray('H', columns.types)
+    writer = threading.Thread(target=store.record,
+                              args=('user_1', [(2, today, 'sleep', 8.0, 'hours', created)]))
+    writer.start()
+    assert midway.wait(5)
+
+    results = []
+    def read():
+        try:
+            results.append((store.activities(columns), store.totals(columns, today, today)))
+        except Exception as e:
+            results.append(e)
+    reader = threading.Thread(target=read)
+    reader.start()
+    reader.join(0.2)
+    resume.set()
+    writer.join()
+    reader.join()
+
+    [(rows, totals)] = results
+    assert sorted(row['activity_type'] for row in rows) == ['running', 'sleep']
+    assert sorted(totals) == [('running', 1.0, 1, 'minutes'), ('sleep', 8.0, 1, 'hours')]
+
+def test_hot_store_failure_does_not_fail_committed_write(app, monkeypatch):
+    """Test the post-commit hook drops the user instead of raising"""
+    _add('user_1', 0)
+    ActivityService.get_user_activities('user_1')
+    store = app.extensions['hot_store']
+    assert store.lookup('user_1', date.today()) is not None
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(store, 'record', fail)
+    result = ActivityService.log_activity('user_1', 'running', 5.0, 'minutes')
+    assert result['activity_id']
+    assert store.lookup('user_1', date.today()) is None
+
+def test_reads_served_from_store_after_writes(app, monkeypatch):
+    """Test hot users' history and summaries are answered without touching the database"""
+    _add('user_1', 0, 'running', 10.0)
+    _add('user_1', 3, 'sleep', 7.5)
+    expected = ActivityService.get_user_activities('user_1')
+    ActivityService.log_activity('user_1', 'running', 5.0, 'minutes')
+
+    _forbid_database(monkeypatch)
+    activities = ActivityService.get_user_activities('user_1')['activities']
+    assert len(activities) == len(expected['activities']) + 1
+    assert {a['id'] for a in expected['activities']} < {a['id'] for a in activities}
+
+    summary = ActivityService.get_user_summary('user_1', period='week')['summary']
+    assert summary['running'] == {"total_value": 15.0, "unit": "minutes", "count": 2}
+    assert summary['sleep']['count'] == 1
+
+def test_reads_outside_window_fall_back_to_database(app):
+    """Test a user with history older than the window is read from the database for full history"""
+    _add('user_1', 0)
+    _add('user_1', 45)
+    ActivityService.get_user_activities('user_1')
+
+    assert len(ActivityService.get_user_activities('user_1')['activities']) == 2
+    recent = ActivityService.get_user_activities('user_1', start_date=date.today().isoformat())
+    assert len(recent['activities']) == 1
@@ -0,0 +1,164 @@
+import pytest
+import json
+import random
+from datetime import datetime, timedelta
+from wellness_tracking.repository import db, UserMetrics
+from wellness_tracking.service import ActivityService, MetricsService
+from wellness_tracking.service import metrics_service
+from wellness_tracking.service.metrics_service import _apply, _rebuild, record_metrics
+
+@pytest.fixture
+def app(make_app):
+    app = make_app({
+        'ACTIVITY_GOALS': {"running": 25.0},
+        'METRICS_BACKFILL_ENABLED': True
+    })
+    # Run the backfill manually in tests
+    app.extensions['metrics_backfill'].stop()
+    return app
+
+def _device_rows(user_id, days_ago, activity_type='running', value=30.0, unit='minutes'):
+    today = datetime.utcnow().date()
+    return [{
+        "user_id": user_id,
+        "date": (today - timedelta(days=offset)).isoformat(),
+        "activity_type": activity_type,
+        "value": value,
+        "unit": unit
+    } for offset in days_ago]
+
+def test_apply_tracks_streaks_and_daily_totals():
+    """Test in-order days extend streaks, gaps reset them and backfills are detected"""
+    state = {}
+    for day, value in [(100, 1.0), (101, 2.0), (101, 0.5), (102, 1.0), (105, 4.0), (106, 1.0)]:
+        assert _apply(state, 'sleep', 'hours', day, value)
+    last_day, current, longest, totals, unit = state['sleep']
+    assert (last_day, current, longest, unit) == (106, 2, 3, 'hours')
+    assert totals[:7] == [1.0, 4.0, 0.0, 0.0, 1.0, 2.5, 1.0]
+
+    # Backfill onto an active day is absorbed, onto an inactive one needs a rebuild
+    assert _apply(state, 'sleep', 'hours', 101, 1.0)
+    assert state['sleep'][3][5] == 3.5
+    assert not _apply(state, 'sleep', 'hours', 104, 1.0)
+
+def test_incremental_state_matches_rebuild(app):
+    """Test metrics kept on writes equal a rebuild from the activity table, whatever the write order"""
+    rng = random.Random(3)
+    days = list(range(45))
+    rng.shuffle(days)
+    backfill = app.extensions['metrics_backfill']
+    with app.app_context():
+        for chunk_start in range(0, len(days), 5):
+            ActivityService.sync_device_data('u1', _device_rows('u1', days[chunk_start:chunk_start + 5],
+                                                                value=float(rng.randint(5, 40))))
+            ActivityService.log_activity('u1', 'hydration', 1.5, 'liters')
+            if chunk_start % 10:
+                backfill.run_pending()
+        backfill.run_pending()
+        stored = db.session.get(UserMetrics, 'u1').state
+        assert stored == _rebuild('u1')
+        assert stored['running'][1:3] == [45, 45]
+
+def test_metrics_endpoint_reports_streaks_averages_and_goals(app):
+    """Test the endpoint serves streaks, rolling averages and goal progress"""
+    with app.app_context():
+        # Active today and the two days before, plus an older 4-day streak
+        ActivityService.sync_device_data('u2', _device_rows('u2', [0, 1, 2, 10, 11, 12, 13], value=20.0))
+        ActivityService.log_activity('u2', 'running', 10.0, 'minutes')
+
+    client = app.test_client()
+    response = client.get('/api/metrics/u2')
+    assert response.status_code == 200
+    running = json.loads(response.data)['metrics']['running']
+    assert running['current_streak'] == 3
+    assert running['longest_streak'] == 4
+    assert running['today_total'] == 30.0
+    assert running['rolling_average_7d'] == round(70.0 / 7, 3)
+    assert running['rolling_average_30d'] == round(150.0 / 30, 3)
+    assert running['goal'] == {
+        "daily_target": 25.0,
+        "completed_today": True,
+        "progress": 1.0,
+        "days_completed_7d": 1
+    }
+
+    # Users without activity get an empty state row
+    assert json.loads(client.get('/api/metrics/nobody').data)['metrics'] == {}
+    app.extensions['metrics_backfill'].run_pending()
+    nobody = json.loads(client.get('/api/metrics/nobody').data)
+    assert nobody['pending'] is False and nobody['metrics'] == {}
+
+def test_concurrent_first_write_applies_to_the_winner_state(app, monkeypatch):
+    """Test a first write that loses the state-row insert race updates the existing row instead of failing"""
+    with app.app_context():
+        ActivityService.log_activity('u3', 'running', 10.0, 'minutes')
+        ActivityService.log_activity('u3', 'running', 5.0, 'minutes')
+        winner = db.session.get(UserMetrics, 'u3').state
+
+        # Both writers saw no row; this one's rebuild misses the other's activity
+        real_get = db.session.get
+        calls = []
+        def get(entity, ident, **kwargs):
+            calls.append(ident)
+            return None if len(calls) == 1 else real_get(entity, ident, **kwargs)
+        monkeypatch.setattr(db.session, 'get', get)
+        monkeypatch.setattr(metrics_service, '_rebuild', lambda user_id: {})
+        today = datetime.utcnow().date()
+        record_metrics([{"user_id": "u3", "date": today, "activity_type": "running", "value": 2.0, "unit": "minutes"}])
+        db.session.commit()
+        monkeypatch.undo()
+
+        state = db.session.get(UserMetrics, 'u3').state
+        assert state['running'][3][0] == winner['running'][3][0] + 2.0
+
+def test_existing_users_are_rebuilt_off_the_write_path(app, monkeypatch):
+    """Test writes and reads never rebuild from history: the backfill worker builds missing and stale rows"""
+    backfill = app.extensions['metrics_backfill']
+    with app.app_context():
+        ActivityService.sync_device_data('u4', _device_rows('u4', [1, 2, 3]))
+        db.session.query(UserMetrics).delete()
+        db.session.commit()
+
+        rebuilds = []
+        rebuild = metrics_service._rebuild
+        monkeypatch.setattr(metrics_service, '_rebuild', lambda user_id: rebuilds.append(user_id) or rebuild(user_id))
+        ActivityService.log_activity('u4', 'running', 10.0, 'minutes')
+        ActivityService.log_activity('u4', 'running', 5.0, 'minutes')
+        assert rebuilds == []
+        assert db.session.get(UserMetrics, 'u4').stale
+
+    client = app.test_client()
+    pending = json.loads(client.get('/api/metrics/u4').data)
+    assert pending['pending'] is True
+
+    assert backfill.run_pending() == 1
+    assert rebuilds == ['u4']
+    running = json.loads(client.get('/api/metrics/u4').data)['metrics']['running']
+    assert running['today_total'] == 15.0
+    assert running['current_streak'] == 4
+
+    # A backfill onto an inactive earlier day marks the row stale instead of rebuilding inline
+    with app.app_context():
+        ActivityService.sync_device_data('u4', _device_rows('u4', [6]))
+        assert db.session.get(UserMetrics, 'u4').stale
+    assert rebuilds == ['u4']
+    backfill.run_pending()
+    with app.app_context():
+        assert db.session.get(UserMetrics, 'u4').state == rebuild('u4')
+
+def test_metrics_read_does_not_write(app):
+    """Test reading metrics for a user without a state row is a lookup that asks the backfill for a row"""
+    with app.app_context():
+        ActivityService.log_activity('u4', 'sleep', 7.0, 'hours')
+        db.session.query(UserMetrics).delete()
+        db.session.commit()
+
+    response = app.test_client().get('/api/metrics/u4')
+    assert response.status_code == 200
+    assert json.loads(response.data)['pending'] is True
+    with app.app_context():
+        assert db.session.get(UserMetrics, 'u4') is None
+
+    app.extensions['metrics_backfill'].run_pending()
+    response = app.test_client().get('/api/metrics/u4')
+    assert json.loads(response.data)['metrics']['sleep']['today_total'] == 7.0
@@ -0,0 +1,178 @@
+import pytest
+import threading
+from wellness_tracking.main import create_app
+from wellness_tracking.repository import db, fan_out, OutboxEvent, WellnessActivity
+from wellness_tracking.service import ActivityService, OutboxDispatcher
+from wellness_tracking.service import activity_service
+
+@pytest.fixture
+def app(make_app):
+    app = make_app({
+        'OUTBOX_ENABLED': True,
+        'OUTBOX_RETRY_BASE_MS': 0
+    })
+    # Dispatch manually in tests
+    app.extensions['outbox'].stop()
+    return app
+
+def _log(user_id, value=1.0):
+    return ActivityService.log_activity(user_id, 'hydration', value, 'liters')
+
+def test_events_commit_with_the_write_and_are_delivered_later(app):
+    """Test writes stage events in the outbox instead of publishing inline"""
+    feed = app.extensions['change_feed']
+    with app.app_context():
+        cursor = feed.latest_cursor()
+        _log('u1')
+        ActivityService.log_activities([{"user_id": "u2", "activity_type": "sleep", "value": 8.0, "unit": "hours"}])
+        ActivityService.sync_device_data('u1', [])
+        assert feed.latest_cursor() == cursor
+        assert [event.event_type for event in OutboxEvent.query.order_by(OutboxEvent.id)] == ['activity', 'activity', 'sync']
+
+    assert app.extensions['outbox'].dispatch() == 3
+    events, _, _ = feed.wait_for_events('u1', cursor, 0)
+    assert [event['type'] for _, event in events] == ['activity', 'sync']
+    with app.app_context():
+        assert OutboxEvent.query.count() == 0
+
+def test_failed_write_leaves_no_event(app, monkeypatch):
+    """Test the outbox row rolls back with the write"""
+    def failing_commit():
+        raise RuntimeError("disk full")
+
+    with app.app_context():
+        monkeypatch.setattr(db.session, 'commit', failing_commit)
+        with pytest.raises(RuntimeError):
+            _log('u1')
+        monkeypatch.undo()
+        assert OutboxEvent.query.count() == 0
+        assert WellnessActivity.query.count() == 0
+
+def test_retries_keep_per_user_order(app):
+    """Test a failing event holds back the user's later events until it is delivered"""
+    dispatcher = app.extensions['outbox']
+    delivered = []
+    failures = {"remaining": 1}
+
+    def flaky(event):
+        if event['user_id'] == 'u1' and failures["remaining"]:
+            failures["remaining"] -= 1
+            raise ConnectionError("webhook down")
+        delivered.append((event['user_id'], event['payload']['activity']['value']))
+
+    dispatcher.add_consumer(flaky)
+    with app.app_context():
+        _log('u1', 1.0)
+        _log('u1', 2.0)
+        _log('u2', 3.0)
+
+    assert dispatcher.dispatch() == 1
+    assert delivered == [('u2', 3.0)]
+    assert dispatcher.dispatch() == 2
+    assert delivered == [('u2', 3.0), ('u1', 1.0), ('u1', 2.0)]
+
+def test_events_are_dropped_after_max_attempts(app):
+    """Test a poisoned event stops blocking its user after the last attempt"""
+    dispatcher = app.extensions['outbox']
+    dispatcher.max_attempts = 2
+    delivered = []
+
+    def poisoned(event):
+        if event['payload']['activity']['value'] == 1.0:
+            raise ValueError("cannot deliver")
+        delivered.append(event['payload']['activity']['value'])
+
+    dispatcher.add_consumer(poisoned)
+    with app.app_context():
+        _log('u1', 1.0)
+        _log('u1', 2.0)
+
+    assert dispatcher.dispatch() == 0
+    assert dispatcher.dispatch() == 1
+    assert delivered == [2.0]
+    with app.app_context():
+        event = OutboxEvent.query.one()
+        assert event.attempts == 2
+        assert event.last_error == "cannot deliver"
+
+def test_concurrent_dispatchers_deliver_each_event_once(tmp_path):
+    """Test dispatchers sharing a database lease events instead of delivering them twice"""
+    # A file database, so every dispatcher thread has its own connection
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'wellness.db'}",
+        'OUTBOX_ENABLED': True
+    })
+    app.extensions['outbox'].stop()
+    delivered = []
+    dispatchers = [OutboxDispatcher(app, batch_size=5, retry_base_ms=0) for _ in range(3)]
+    for dispatcher in dispatchers:
+        dispatcher.add_consumer(lambda event: delivered.append((event['user_id'], event['payload']['activity']['value'])))
+    with app.app_context():
+        for value in range(30):
+            _log(f'u{value % 3}', float(value))
+
+    def drain(dispatcher):
+        while dispatcher.dispatch():
+            pass
+    threads = [threading.Thread(target=drain, args=(dispatcher,)) for dispatcher in dispatchers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    while any(dispatcher.dispatch() for dispatcher in dispatchers):
+        pass
+
+    assert sorted(value for _, value in delivered) == [float(value) for value in range(30)]
+    for user in ('u0', 'u1', 'u2'):
+        values = [value for user_id, value in delivered if user_id == user]
+        assert values == sorted(values)
+    with app.app_context():
+        assert OutboxEvent.query.count() == 0
+
+def test_backing_off_user_does_not_block_others(app):
+    """Test a user waiting for a retry does not fill the batch with its held events"""
+    dispatcher = app.extensions['outbox']
+    dispatcher.batch_size = 2
+    dispatcher.retry_base = 60
+    delivered = []
+
+    def flaky(event):
+        if event['payload']['activity']['value'] == 1.0:
+            raise ConnectionError("webhook down")
+        delivered.append(event['user_id'])
+
+    dispatcher.add_consumer(flaky)
+    with app.app_context():
+        for value in (1.0, 2.0, 3.0, 4.0):
+            _log('u1', value)
+        _log('u2', 5.0)
+
+    assert dispatcher.dispatch() == 0
+    assert dispatcher.dispatch() == 1
+    assert delivered == ['u2']
+
+def test_dispatch_delivers_events_from_every_shard(tmp_path):
+    """Test the dispatcher reads and clears the outbox on each shard, not the default bind"""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'directory.db'}",
+        'SQLALCHEMY_BINDS': {f'shard{i}': f"sqlite:///{tmp_path / f'shard{i}.db'}" for i in range(2)},
+        'SHARD_BINDS': ['shard0', 'shard1'],
+        'OUTBOX_ENABLED': True
+    })
+    dispatcher = app.extensions['outbox']
+    dispatcher.stop()
+    delivered = []
+    dispatcher.add_consumer(lambda event: delivered.append(event['user_id']))
+    users = [f'user_{i}' for i in range(8)]
+    with app.app_context():
+        for user_id in users:
+            _log(user_id)
+        router = app.extensions['shard_router']
+        assert {router.shard_for(user_id) for user_id in users} == {'shard0', 'shard1'}
+
+    assert dispatcher.dispatch() == len(users)
+    assert sorted(delivered) == sorted(users)
+    with app.app_context():
+        assert sum(fan_out(lambda: OutboxEvent.query.count()).values()) == 0
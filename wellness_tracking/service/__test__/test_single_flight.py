@@ -0,0 +1,90 @@
+import pytest
+import threading
+import time
+from wellness_tracking.repository import DeviceSync
+from wellness_tracking.service import ActivityService, SingleFlight
+from wellness_tracking.service import activity_service
+
+def _run_concurrently(target, count=5):
+    results = [None] * count
+    start = threading.Barrier(count)
+
+    def worker(index):
+        start.wait()
+        results[index] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_single_flight_shares_result_and_error():
+    """Test concurrent callers share one execution, including its exception"""
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"value": 42}
+
+    results = _run_concurrently(lambda: flight.do('key', slow))
+    assert len(calls) == 1
+    assert all(result == {"value": 42} for result in results)
+    assert flight.in_flight() == 0
+
+    def failing():
+        time.sleep(0.1)
+        raise ValueError("boom")
+
+    errors = _run_concurrently(lambda: _capture(lambda: flight.do('key', failing)))
+    assert all(isinstance(error, ValueError) for error in errors)
+
+def _capture(fn):
+    try:
+        fn()
+    except Exception as e:
+        return e
+
+def test_concurrent_summaries_are_coalesced(app, monkeypatch):
+    """Test identical concurrent summary requests run one computation"""
+    calls = []
+    build = ActivityService._build_user_summary
+
+    def slow_build(user_id, period, end_date):
+        calls.append(user_id)
+        time.sleep(0.1)
+        return build(user_id, period, end_date)
+
+    monkeypatch.setattr(ActivityService, '_build_user_summary', staticmethod(slow_build))
+
+    def request_summary():
+        with app.app_context():
+            return ActivityService.get_user_summary('user_1', period='week')
+
+    results = _run_concurrently(request_summary)
+    assert len(calls) == 1
+    assert all(result['user_id'] == 'user_1' for result in results)
+
+def test_concurrent_syncs_for_a_user_are_coalesced(app, monkeypatch):
+    """Test duplicate syncs for the same user fetch and insert once"""
+    fetches = []
+
+    def fake_fetch(user_id):
+        fetches.append(user_id)
+        time.sleep(0.1)
+        return [{"user_id": user_id, "date": "2025-01-10", "activity_type": "running", "value": 30.0, "unit": "minutes"}]
+
+    monkeypatch.setattr(activity_service, 'stream_device_records', fake_fetch)
+
+    def sync():
+        with app.app_context():
+            return ActivityService.sync_user_device('user_1')
+
+    results = _run_concurrently(sync)
+    assert fetches == ['user_1']
+    assert all(len(result['synced_activities']) == 1 for result in results)
+    with app.app_context():
+        assert DeviceSync.query.filter_by(user_id='user_1').count() == 1
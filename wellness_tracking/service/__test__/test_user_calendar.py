@@ -0,0 +1,84 @@
+import pytest
+import json
+import time
+from datetime import datetime, date
+from zoneinfo import ZoneInfo
+from wellness_tracking.repository import db
+from wellness_tracking.service.user_calendar import TimezoneCache, local_day, period_window
+
+@pytest.fixture
+def client(make_app):
+    app = make_app()
+    with app.test_client() as client:
+        with app.app_context():
+            yield client
+
+def test_local_day_and_windows():
+    """Test UTC timestamps map to local days and windows are plain day ranges"""
+    utc = datetime(2025, 1, 10, 23, 30)
+    assert local_day(utc, ZoneInfo('UTC')) == date(2025, 1, 10)
+    assert local_day(utc, ZoneInfo('Asia/Tokyo')) == date(2025, 1, 11)
+    assert local_day(utc, ZoneInfo('America/Los_Angeles')) == date(2025, 1, 10)
+
+    assert period_window('week', date(2025, 3, 10)) == (date(2025, 3, 3), date(2025, 3, 10))
+    assert period_window('month', date(2025, 3, 10)) == (date(2025, 3, 1), date(2025, 3, 10))
+    assert period_window('year', date(2025, 3, 10)) == (date(2025, 1, 1), date(2025, 3, 10))
+    with pytest.raises(ValueError):
+        period_window('decade', date(2025, 3, 10))
+
+def test_timezone_cache_is_bounded_and_expires(monkeypatch):
+    """Test the per-worker timezone cache evicts least recently used users and expired entries"""
+    cache = TimezoneCache(max_size=2, ttl=10)
+    cache.put('u1', 'UTC')
+    cache.put('u2', 'Asia/Tokyo')
+    assert cache.get('u1') == 'UTC'
+    cache.put('u3', 'Europe/Paris')
+    assert len(cache) == 2
+    assert cache.get('u2') is None
+    assert cache.get('u1') == 'UTC'
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 11)
+    assert cache.get('u1') is None
+    assert len(cache) == 1
+
+def test_set_timezone_and_bucket_activity(client):
+    """Test activities are bucketed into the user's local day"""
+    timezone = 'Pacific/Kiritimati'
+    response = client.put('/api/users/user_1/timezone',
+                          data=json.dumps({"timezone": timezone}),
+                          content_type='application/json')
+    assert response.status_code == 200
+    assert json.loads(client.get('/api/users/user_1/timezone').data)['timezone'] == timezone
+
+    response = client.post('/api/activities',
+                           data=json.dumps({
+                               "user_id": "user_1",
+                               "activity_type": "sleep",
+                               "value": 8.0,
+                               "unit": "hours"
+                           }),
+                           content_type='application/json')
+    activity = json.loads(response.data)['activity']
+    assert activity['date'] == datetime.now(ZoneInfo(timezone)).date().isoformat()
+
+    summary = json.loads(client.get('/api/summary/user_1').data)
+    assert summary['end_date'] == activity['date']
+    assert summary['summary']['sleep']['total_value'] == 8.0
+
+def test_invalid_timezone(client):
+    """Test unknown timezone names are rejected"""
+    response = client.put('/api/users/user_1/timezone',
+                          data=json.dumps({"timezone": "Mars/Olympus_Mons"}),
+                          content_type='application/json')
+    assert response.status_code == 400
+    assert json.loads(client.get('/api/users/user_1/timezone').data)['timezone'] == 'UTC'
+
+def test_summary_rollup_is_index_only(client):
+    """Test the summary aggregation is answered from the covering index"""
+    plan = db.session.execute(db.text(
+        "EXPLAIN QUERY PLAN SELECT activity_type, sum(value), count(*), min(unit) "
+        "FROM wellness_activity WHERE user_id = 'u' AND date >= '2025-01-01' AND date <= '2025-01-31' "
+        "GROUP BY activity_type"
+    )).fetchall()
+    assert any('COVERING INDEX idx_user_date_rollup' in row[-1] for row in plan)
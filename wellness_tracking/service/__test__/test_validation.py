@@ -0,0 +1,52 @@
+import pytest
+from datetime import date
+from wellness_tracking.service import ACTIVITY_TYPES, ACTIVITY_VALIDATOR, DEVICE_RECORD_VALIDATOR, ValidationError
+
+VALID = {"user_id": "u1", "activity_type": "sleep", "value": 7, "unit": "hours"}
+
+def test_validate_returns_declared_fields_only():
+    """Test a valid record is normalized to the declared fields"""
+    assert ACTIVITY_VALIDATOR.validate(dict(VALID, extra=True)) == VALID
+    record = DEVICE_RECORD_VALIDATOR.validate(dict(VALID, date="2024-03-01"))
+    assert record['date'] == date(2024, 3, 1)
+
+@pytest.mark.parametrize('record, error', [
+    ({"user_id": "u1", "activity_type": "sleep"}, "Missing required field: value"),
+    (dict(VALID, activity_type="flying"), f"Invalid activity type. Must be one of: {list(ACTIVITY_TYPES)}"),
+    (dict(VALID, activity_type={"a": 1}), f"Invalid activity type. Must be one of: {list(ACTIVITY_TYPES)}"),
+    (dict(VALID, activity_type=["sleep"]), f"Invalid activity type. Must be one of: {list(ACTIVITY_TYPES)}"),
+    (dict(VALID, user_id=None), "Invalid user_id: must be a non-empty string"),
+    (dict(VALID, user_id=""), "Invalid user_id: must be a non-empty string"),
+    (dict(VALID, user_id=42), "Invalid user_id: must be a non-empty string"),
+    (dict(VALID, unit={"a": 1}), "Invalid unit: must be a non-empty string"),
+    (dict(VALID, value="7"), "Invalid value: must be a number"),
+    (dict(VALID, value=True), "Invalid value: must be a number"),
+    (dict(VALID, value=float('nan')), "Invalid value: must be a finite number"),
+    (dict(VALID, value=float('inf')), "Invalid value: must be a finite number"),
+    (dict(VALID, value=float('-inf')), "Invalid value: must be a finite number"),
+    (dict(VALID, value=10 ** 400), "Invalid value: must be a finite number"),
+    (["not", "a", "dict"], "Record must be a JSON object"),
+    (None, "Record must be a JSON object")
+])
+def test_validate_reports_first_problem(record, error):
+    """Test invalid records raise ValidationError with a client-facing message"""
+    with pytest.raises(ValidationError) as excinfo:
+        ACTIVITY_VALIDATOR.validate(record)
+    assert str(excinfo.value) == error
+
+@pytest.mark.parametrize('value', ["2024-3-1", "20240301", "2024-02-30", 20240301])
+def test_device_dates_must_be_iso_days(value):
+    """Test device dates must be exactly YYYY-MM-DD"""
+    with pytest.raises(ValidationError):
+        DEVICE_RECORD_VALIDATOR.validate(dict(VALID, date=value))
+
+def test_partition_and_filter_reject_rows_individually():
+    """Test batch helpers keep valid rows and report rejected ones by index"""
+    records = [VALID, dict(VALID, activity_type="flying"), VALID, {}]
+    valid, rejected = ACTIVITY_VALIDATOR.partition(records)
+    assert valid == [VALID, VALID]
+    assert [row['index'] for row in rejected] == [1, 3]
+
+    seen = []
+    assert list(ACTIVITY_VALIDATOR.filter(iter(records), lambda index, error: seen.append(index))) == [VALID, VALID]
+    assert seen == [1, 3]
@@ -0,0 +1,189 @@
+import pytest
+import glob
+import json
+from datetime import date
+from sqlalchemy.exc import OperationalError
+from wellness_tracking.main import create_app
+from wellness_tracking.repository import db, WellnessActivity
+from wellness_tracking.service import write_buffer
+
+# Flush manually in tests
+BUFFERED = {'WRITE_BEHIND_ENABLED': True, 'WRITE_BEHIND_FLUSH_MS': 60000}
+
+def _file_app(database_uri, **config):
+    """Buffered app on a file database.
+
+    Restart and multi-worker tests need several apps on one database, while
+    make_app gives each app its own copy, so these use create_app directly.
+    """
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        **BUFFERED,
+        **config
+    })
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(BUFFERED)
+    yield app
+    app.extensions['write_buffer'].stop()
+
+def _log(client, user_id, value=15.0):
+    return client.post('/api/activities',
+                       data=json.dumps({
+                           "user_id": user_id,
+                           "activity_type": "hydration",
+                           "value": value,
+                           "unit": "liters"
+                       }),
+                       content_type='application/json')
+
+def _crash(app):
+    """Drop the pending rows without flushing and release the journal lock, as a dead process would"""
+    buffer = app.extensions['write_buffer']
+    buffer._pending.clear()
+    buffer._owner_lock.close()
+
+def test_buffered_write_is_acknowledged_before_commit(app):
+    """Test buffered writes return 202 and are not yet in the database"""
+    client = app.test_client()
+    response = _log(client, 'user_1')
+
+    assert response.status_code == 202
+    with app.app_context():
+        assert WellnessActivity.query.count() == 0
+    assert app.extensions['write_buffer'].pending_count() == 1
+
+def test_reads_see_buffered_writes(app):
+    """Test history and summary include buffered writes exactly once, before and after flush"""
+    client = app.test_client()
+    _log(client, 'user_1', 1.5)
+    _log(client, 'user_1', 0.5)
+    _log(client, 'user_2', 2.0)
+
+    for _ in range(2):
+        history = json.loads(client.get('/api/activities/user_1').data)
+        assert len(history['activities']) == 2
+        summary = json.loads(client.get('/api/summary/user_1').data)
+        assert summary['summary']['hydration']['total_value'] == 2.0
+        assert summary['summary']['hydration']['count'] == 2
+
+        assert app.extensions['write_buffer'].flush() in (3, 0)
+
+    with app.app_context():
+        assert WellnessActivity.query.count() == 3
+
+def test_journal_is_replayed_after_restart(tmp_path):
+    """Test rows left in the journal by a crashed process are committed on the next start"""
+    database_uri = f"sqlite:///{tmp_path / 'wellness.db'}"
+    journal = str(tmp_path / 'activities.journal')
+
+    crashed = _file_app(database_uri, WRITE_BEHIND_JOURNAL=journal)
+    _log(crashed.test_client(), 'user_1')
+    _crash(crashed)
+
+    restarted = _file_app(database_uri, WRITE_BEHIND_JOURNAL=journal)
+    with restarted.app_context():
+        assert WellnessActivity.query.filter_by(user_id='user_1').count() == 1
+    restarted.extensions['write_buffer'].stop()
+
+def test_failed_flush_journal_is_not_replayed_after_retry(tmp_path, monkeypatch):
+    """Test rows of a failed flush are committed once, and their rotated journal is not replayed later"""
+    database_uri = f"sqlite:///{tmp_path / 'wellness.db'}"
+    journal = str(tmp_path / 'activities.journal')
+    app = _file_app(database_uri, WRITE_BEHIND_JOURNAL=journal)
+    buffer = app.extensions['write_buffer']
+    client = app.test_client()
+
+    _log(client, 'user_1')
+    insert_rows = write_buffer._insert_rows
+    def fail(rows):
+        raise RuntimeError("database unavailable")
+    monkeypatch.setattr(write_buffer, '_insert_rows', fail)
+    assert buffer.flush() == 0
+    assert glob.glob(f"{journal}.*.flushing")
+
+    monkeypatch.setattr(write_buffer, '_insert_rows', insert_rows)
+    _log(client, 'user_2')
+    assert buffer.flush() == 2
+    assert glob.glob(f"{journal}.*.flushing") == []
+    _crash(app)
+
+    restarted = _file_app(database_uri, WRITE_BEHIND_JOURNAL=journal)
+    with restarted.app_context():
+        assert WellnessActivity.query.filter_by(user_id='user_1').count() == 1
+        assert WellnessActivity.query.filter_by(user_id='user_2').count() == 1
+    restarted.extensions['write_buffer'].stop()
+
+def test_rejected_row_is_dead_lettered_without_blocking_later_writes(make_app, tmp_path):
+    """Test a row the database refuses is isolated from its batch instead of failing every flush"""
+    journal = str(tmp_path / 'activities.journal')
+    app = make_app(dict(BUFFERED, WRITE_BEHIND_JOURNAL=journal))
+    buffer = app.extensions['write_buffer']
+    client = app.test_client()
+
+    _log(client, 'user_1', 1.0)
+    buffer.append({"user_id": 'user_1', "date": date(2024, 1, 1), "activity_type": 'hydration',
+                   "value": None, "unit": 'liters'})
+    _log(client, 'user_2', 2.0)
+    assert buffer.flush() == 2
+    _log(client, 'user_2', 3.0)
+    assert buffer.flush() == 1
+
+    assert buffer.pending_count() == 0
+    [(record, error)] = buffer.dead_letters()
+    assert record['value'] is None and 'NOT NULL' in error
+    with open(f"{journal}.dead") as f:
+        assert json.loads(f.read())['user_id'] == 'user_1'
+    with app.app_context():
+        assert sorted(activity.value for activity in WellnessActivity.query) == [1.0, 2.0, 3.0]
+    buffer.stop()
+
+def test_full_buffer_rejects_writes_while_the_database_is_down(app, monkeypatch):
+    """Test appends past WRITE_BEHIND_MAX_PENDING get 503 instead of growing the buffer"""
+    buffer = app.extensions['write_buffer']
+    buffer.max_pending = 2
+    client = app.test_client()
+    def fail(rows):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+    monkeypatch.setattr(write_buffer, '_insert_rows', fail)
+
+    assert _log(client, 'user_1').status_code == 202
+    assert _log(client, 'user_1').status_code == 202
+    assert buffer.flush() == 0
+    response = _log(client, 'user_1')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    batch = client.post('/api/activities/batch', json={"activities": [
+        {"user_id": "user_2", "activity_type": "sleep", "value": 8.0, "unit": "hours"}
+    ]})
+    assert batch.status_code == 503
+    assert buffer.pending_count() == 2
+    assert buffer.dead_letters() == []
+
+    monkeypatch.undo()
+    assert buffer.flush() == 2
+    assert _log(client, 'user_1').status_code == 202
+
+def test_workers_sharing_a_journal_prefix_replay_only_dead_workers(tmp_path):
+    """Test each worker journals to its own files and a starting worker leaves live workers' journals alone"""
+    database_uri = f"sqlite:///{tmp_path / 'wellness.db'}"
+    journal = str(tmp_path / 'activities.journal')
+    live = _file_app(database_uri, WRITE_BEHIND_JOURNAL=journal)
+    crashed = _file_app(database_uri, WRITE_BEHIND_JOURNAL=journal)
+    _log(live.test_client(), 'user_live')
+    _log(crashed.test_client(), 'user_crashed')
+    _crash(crashed)
+
+    restarted = _file_app(database_uri, WRITE_BEHIND_JOURNAL=journal)
+    with restarted.app_context():
+        assert WellnessActivity.query.filter_by(user_id='user_crashed').count() == 1
+        assert WellnessActivity.query.filter_by(user_id='user_live').count() == 0
+    assert live.extensions['write_buffer'].pending_count() == 1
+    assert len(glob.glob(f"{journal}.*.journal")) == 2
+
+    live.extensions['write_buffer'].stop()
+    assert len(glob.glob(f"{journal}.*.journal")) == 1
+    with restarted.app_context():
+        assert WellnessActivity.query.filter_by(user_id='user_live').count() == 1
@@ -1,107 +1,409 @@
-from datetime import datetime, date, timedelta
-from ..repository import db, WellnessActivity, DeviceSync
+from datetime import date, datetime
+from flask import current_app
+from sqlalchemy import func, insert
+from ..repository import db, WellnessActivity, DeviceSync, group_by_shard, shard_by_user, use_bind
+from .change_feed import summary_delta
+from .device_client import spool_records, stream_device_records
+from .metrics_service import record_metrics
+from .outbox import stage_events
+from .single_flight import SingleFlight
+from .user_calendar import local_day, period_window, user_zone
+from .validation import DEVICE_RECORD_VALIDATOR
+
+def _write_buffer():
+    """Return the app's write-behind buffer, or None when writes go straight to the database"""
+    return current_app.extensions.get('write_buffer')
+
+def _read_with_buffer(user_id, query):
+    """Run a query and collect the user's buffered (not yet committed) activities alongside it"""
+    buffer = _write_buffer()
+    if buffer is None:
+        return query(), []
+    return buffer.read_consistent(user_id, query)
+
+def _single_flight():
+    """Return the app's request coalescer"""
+    return current_app.extensions.setdefault('single_flight', SingleFlight())
+
+def _hot_store():
+    """Return the app's hot-user activity store, or None when it is disabled"""
+    return current_app.extensions.get('hot_store')
+
+def _hot_columns(store, user_id, today):
+    """Return the user's resident columns, loading the window from the database once the user is hot"""
+    columns = store.lookup(user_id, today)
+    if columns is not None or not store.should_admit(user_id):
+        return columns
+    
+    version = store.version()
+    window_start = date.fromordinal(store.window_start(today))
+    rows = db.session.query(
+        WellnessActivity.id,
+        WellnessActivity.date,
+        WellnessActivity.activity_type,
+        WellnessActivity.value,
+        WellnessActivity.unit,
+        WellnessActivity.created_at
+    ).filter(
+        WellnessActivity.user_id == user_id,
+        WellnessActivity.date >= window_start
+    ).all()
+    has_older = db.session.query(WellnessActivity.id).filter(
+        WellnessActivity.user_id == user_id,
+        WellnessActivity.date < window_start
+    ).first() is not None
+    
+    if not store.load(user_id, rows, today, has_older, version):
+        return None
+    return store.lookup(user_id, today)
+
+def _hot_read(user_id, start, read):
+    """Answer a read from the hot store when its window covers `start`, else return None"""
+    store = _hot_store()
+    if store is None:
+        return None
+    columns = _hot_columns(store, user_id, datetime.now(user_zone(user_id)).date())
+    if columns is None:
+        return None
+    return store.read(columns, start, read)
+
+def _record_hot(rows):
+    """Write hook: feed committed (id, user_id, date, activity_type, value, unit, created_at) rows to the hot store"""
+    store = _hot_store()
+    if store is None:
+        return
+    by_user = {}
+    for row in rows:
+        by_user.setdefault(row[1], []).append((row[0],) + tuple(row[2:]))
+    for user_id, user_rows in by_user.items():
+        try:
+            store.record(user_id, user_rows)
+        except Exception:
+            # The write is already committed, a cache failure must not fail the request
+            current_app.logger.exception("Hot store update failed for %s, dropping the user", user_id)
+            store.invalidate(user_id)
+
+def _invalidate_hot(user_ids):
+    """Drop users whose rows were written without known ids from the hot store"""
+    store = _hot_store()
+    if store is not None:
+        for user_id in user_ids:
+            store.invalidate(user_id)
+
+def _chunked(records, size):
+    """Yield lists of up to `size` records from any iterable"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _publish(user_id, event):
+    """Notify stream subscribers of a committed (or buffered) change"""
+    feed = current_app.extensions.get('change_feed')
+    if feed is not None:
+        feed.publish(user_id, event)
+
+def _deliver(events, staged):
+    """After commit: wake the outbox dispatcher for staged events, otherwise publish them inline"""
+    if staged:
+        current_app.extensions['outbox'].notify()
+        return
+    for user_id, event in events:
+        _publish(user_id, event)
+
+def _activity_events(rows, activity_ids, created_at):
+    """(user_id, event) pairs announcing newly logged activities"""
+    events = []
+    for activity_id, row in zip(activity_ids, rows):
+        activity = {
+            "id": activity_id,
+            "user_id": row['user_id'],
+            "date": row['date'].isoformat(),
+            "activity_type": row['activity_type'],
+            "value": row['value'],
+            "unit": row['unit'],
+            "created_at": created_at.isoformat()
+        }
+        events.append((row['user_id'], {
+            "type": "activity",
+            "activity": activity,
+            "summary_delta": summary_delta([(row['activity_type'], row['value'], row['unit'])])
+        }))
+    return events
 
 class ActivityService:
     """Service layer for wellness activity operations"""
     
     @staticmethod
+    @shard_by_user
     def log_activity(user_id, activity_type, value, unit):
-        """Log a new wellness activity"""
+        """Log a new wellness activity, bucketed into the user's local day"""
+        created_at = datetime.utcnow()
+        activity_date = local_day(created_at, user_zone(user_id))
+        
+        buffer = _write_buffer()
+        if buffer is not None:
+            record = buffer.append({
+                "user_id": user_id,
+                "date": activity_date,
+                "activity_type": activity_type,
+                "value": value,
+                "unit": unit,
+                "created_at": created_at
+            })
+            result = {
+                "success": True,
+                "buffered": True,
+                "activity_id": None,
+                "activity": {
+                    "id": None,
+                    "user_id": record['user_id'],
+                    "date": record['date'].isoformat(),
+                    "activity_type": record['activity_type'],
+                    "value": record['value'],
+                    "unit": record['unit'],
+                    "created_at": record['created_at'].isoformat()
+                }
+            }
+            _publish(user_id, {
+                "type": "activity",
+                "activity": result['activity'],
+                "summary_delta": summary_delta([(activity_type, value, unit)])
+            })
+            return result
+
         try:
             activity = WellnessActivity(
                 user_id=user_id,
-                date=date.today(),
+                date=activity_date,
                 activity_type=activity_type,
                 value=value,
-                unit=unit
+                unit=unit,
+                created_at=created_at
             )
             
             db.session.add(activity)
-            db.session.commit()
+            # Read the id before commit expires the instance, avoiding a refresh query
+            db.session.flush()
+            activity_id = activity.id
+            record_metrics([{
+                "user_id": user_id,
+                "date": activity_date,
+                "activity_type": activity_type,
+                "value": value,
+                "unit": unit
+            }])
             
-            return {
+            result = {
                 "success": True,
-                "activity_id": activity.id,
+                "activity_id": activity_id,
                 "activity": {
-                    "id": activity.id,
-                    "user_id": activity.user_id,
-                    "date": activity.date.isoformat(),
-                    "activity_type": activity.activity_type,
-                    "value": activity.value,
-                    "unit": activity.unit,
-                    "created_at": activity.created_at.isoformat()
+                    "id": activity_id,
+                    "user_id": user_id,
+                    "date": activity_date.isoformat(),
+                    "activity_type": activity_type,
+                    "value": value,
+                    "unit": unit,
+                    "created_at": created_at.isoformat()
                 }
             }
+            events = [(user_id, {
+                "type": "activity",
+                "activity": result['activity'],
+                "summary_delta": summary_delta([(activity_type, value, unit)])
+            })]
+            # With the outbox enabled the events commit with the write and are delivered in the background
+            staged = stage_events(current_app, events)
+            db.session.commit()
         except Exception as e:
             db.session.rollback()
             raise e
+        
+        _record_hot([(activity_id, user_id, activity_date, activity_type, value, unit, created_at)])
+        _deliver(events, staged)
+        return result
+    
+    @staticmethod
+    def log_activities(records):
+        """Log a batch of validated activities in one transaction, each bucketed into its user's local day"""
+        created_at = datetime.utcnow()
+        rows = [{
+            "user_id": record['user_id'],
+            "date": local_day(created_at, user_zone(record['user_id'])),
+            "activity_type": record['activity_type'],
+            "value": record['value'],
+            "unit": record['unit'],
+            "created_at": created_at
+        } for record in records]
+        
+        buffer = _write_buffer()
+        activity_ids = [None] * len(rows)
+        staged = False
+        if buffer is not None:
+            buffer.extend(rows)
+            events = _activity_events(rows, activity_ids, created_at)
+        else:
+            try:
+                # Each shard gets one multi-row insert; ids are mapped back to request order
+                for bind_key, positions in group_by_shard(range(len(rows)), key=lambda i: rows[i]['user_id']).items():
+                    with use_bind(bind_key):
+                        shard_ids = db.session.scalars(
+                            insert(WellnessActivity).returning(WellnessActivity.id, sort_by_parameter_order=True),
+                            [rows[i] for i in positions]
+                        ).all()
+                    for position, activity_id in zip(positions, shard_ids):
+                        activity_ids[position] = activity_id
+                record_metrics(rows)
+                events = _activity_events(rows, activity_ids, created_at)
+                staged = stage_events(current_app, events)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                raise e
+            
+            _record_hot([(activity_id, row['user_id'], row['date'], row['activity_type'],
+                          row['value'], row['unit'], created_at)
+                         for activity_id, row in zip(activity_ids, rows)])
+        
+        _deliver(events, staged)
+        return {
+            "success": True,
+            "buffered": buffer is not None,
+            "activity_ids": activity_ids,
+            "activities": [event['activity'] for _, event in events]
+        }
     
     @staticmethod
     def get_user_activities(user_id, start_date=None, end_date=None, activity_type=None):
-        """Get user's historical activity records"""
+        """Get user's historical activity records (concurrent identical requests share one query)"""
+        return _single_flight().do(
+            ('activities', user_id, start_date, end_date, activity_type),
+            lambda: ActivityService._load_user_activities(user_id, start_date, end_date, activity_type)
+        )
+    
+    @staticmethod
+    @shard_by_user
+    def _load_user_activities(user_id, start_date, end_date, activity_type):
         try:
-            query = WellnessActivity.query.filter_by(user_id=user_id)
-            
-            if start_date:
-                query = query.filter(WellnessActivity.date >= datetime.strptime(start_date, '%Y-%m-%d').date())
-            if end_date:
-                query = query.filter(WellnessActivity.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
-            if activity_type:
-                query = query.filter_by(activity_type=activity_type)
-            
-            activities = query.order_by(WellnessActivity.date.desc()).all()
+            start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+            end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
             
-            return {
-                "user_id": user_id,
-                "activities": [{
+            def query():
+                hot = _hot_read(user_id, start, lambda store, columns: store.activities(columns, start, end, activity_type))
+                if hot is not None:
+                    return hot
+                
+                # Plain column rows: ORM instances from different shards could share an identity
+                query = db.session.query(
+                    WellnessActivity.id,
+                    WellnessActivity.date,
+                    WellnessActivity.activity_type,
+                    WellnessActivity.value,
+                    WellnessActivity.unit,
+                    WellnessActivity.created_at
+                ).filter(WellnessActivity.user_id == user_id)
+                if start:
+                    query = query.filter(WellnessActivity.date >= start)
+                if end:
+                    query = query.filter(WellnessActivity.date <= end)
+                if activity_type:
+                    query = query.filter(WellnessActivity.activity_type == activity_type)
+                
+                return [{
                     "id": activity.id,
                     "date": activity.date.isoformat(),
                     "activity_type": activity.activity_type,
                     "value": activity.value,
                     "unit": activity.unit,
                     "created_at": activity.created_at.isoformat()
-                } for activity in activities]
+                } for activity in query.order_by(WellnessActivity.date.desc()).all()]
+            
+            results, buffered = _read_with_buffer(user_id, query)
+            
+            if buffered:
+                results.extend({
+                    "id": None,
+                    "date": record['date'].isoformat(),
+                    "activity_type": record['activity_type'],
+                    "value": record['value'],
+                    "unit": record['unit'],
+                    "created_at": record['created_at'].isoformat()
+                } for record in buffered
+                    if (start is None or record['date'] >= start)
+                    and (end is None or record['date'] <= end)
+                    and (not activity_type or record['activity_type'] == activity_type))
+                # ISO dates sort chronologically; the sort is stable so database order is kept
+                results.sort(key=lambda activity: activity['date'], reverse=True)
+            
+            return {
+                "user_id": user_id,
+                "activities": results
             }
         except Exception as e:
             raise e
     
     @staticmethod
     def get_user_summary(user_id, period='week', end_date=None):
-        """Get user's summary statistics"""
+        """Get user's summary statistics (concurrent identical requests share one computation)"""
+        return _single_flight().do(
+            ('summary', user_id, period, end_date),
+            lambda: ActivityService._build_user_summary(user_id, period, end_date)
+        )
+    
+    @staticmethod
+    @shard_by_user
+    def _build_user_summary(user_id, period, end_date):
         try:
-            if not end_date:
-                end_date = date.today().isoformat()
+            if end_date:
+                end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
+            else:
+                end_date_obj = datetime.now(user_zone(user_id)).date()
             
-            end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
+            # Windows are plain local-day ranges, so their cost does not depend on the timezone
+            start_date, end_date_obj = period_window(period, end_date_obj)
             
-            # Calculate start date based on period
-            if period == 'week':
-                start_date = end_date_obj - timedelta(days=7)
-            elif period == 'month':
-                start_date = end_date_obj.replace(day=1)
-            elif period == 'year':
-                start_date = end_date_obj.replace(month=1, day=1)
-            else:
-                raise ValueError("Invalid period. Must be week, month, or year")
+            def query():
+                hot = _hot_read(user_id, start_date, lambda store, columns: store.totals(columns, start_date, end_date_obj))
+                if hot is not None:
+                    return hot
+                
+                # Aggregate in the database; the rollup index makes this an index-only scan
+                return db.session.query(
+                    WellnessActivity.activity_type,
+                    func.sum(WellnessActivity.value),
+                    func.count(),
+                    func.min(WellnessActivity.unit)
+                ).filter(
+                    WellnessActivity.user_id == user_id,
+                    WellnessActivity.date >= start_date,
+                    WellnessActivity.date <= end_date_obj
+                ).group_by(WellnessActivity.activity_type).all()
             
-            # Query activity data
-            activities = WellnessActivity.query.filter(
-                WellnessActivity.user_id == user_id,
-                WellnessActivity.date >= start_date,
-                WellnessActivity.date <= end_date_obj
-            ).all()
+            totals, buffered = _read_with_buffer(user_id, query)
             
             # Group statistics by activity type
             summary = {}
-            for activity in activities:
-                if activity.activity_type not in summary:
-                    summary[activity.activity_type] = {
+            for activity_type, total_value, count, unit in totals:
+                summary[activity_type] = {
+                    "total_value": total_value,
+                    "unit": unit,
+                    "count": count
+                }
+            for record in buffered:
+                if not start_date <= record['date'] <= end_date_obj:
+                    continue
+                if record['activity_type'] not in summary:
+                    summary[record['activity_type']] = {
                         "total_value": 0,
-                        "unit": activity.unit,
+                        "unit": record['unit'],
                         "count": 0
                     }
-                summary[activity.activity_type]["total_value"] += activity.value
-                summary[activity.activity_type]["count"] += 1
+                summary[record['activity_type']]["total_value"] += record['value']
+                summary[record['activity_type']]["count"] += 1
             
             return {
                 "user_id": user_id,
@@ -114,49 +416,117 @@ class ActivityService:
             raise e
     
     @staticmethod
+    @shard_by_user
     def sync_device_data(user_id, device_data):
-        """Sync device data and save to database"""
+        """Sync device data and save to database
+
+        `device_data` may be any iterable (e.g. a streamed response); records are
+        inserted in chunks of SYNC_CHUNK_SIZE within one transaction, so memory
+        stays bounded by the chunk size rather than the payload size.
+        """
+        chunk_size = current_app.config.get('SYNC_CHUNK_SIZE', 1000)
+        preview_size = current_app.config.get('SYNC_RESPONSE_PREVIEW', 100)
+        created_at = datetime.utcnow()
+        
+        synced_activities = []
+        synced_count = 0
+        synced_users = set()
+        delta = {}
+        rejected = []
+        rejected_count = 0
+        # Per (user, day, type) totals for the metrics update, bounded by days rather than records
+        daily_totals = {}
+        
+        def reject(index, error):
+            nonlocal rejected_count
+            rejected_count += 1
+            if len(rejected) < preview_size:
+                rejected.append({"index": index, "error": error})
+        
         try:
-            synced_activities = []
-            
-            for device_record in device_data:
-                activity = WellnessActivity(
-                    user_id=device_record['user_id'],
-                    date=datetime.strptime(device_record['date'], '%Y-%m-%d').date(),
-                    activity_type=device_record['activity_type'],
-                    value=device_record['value'],
-                    unit=device_record['unit']
-                )
-                
-                db.session.add(activity)
-                synced_activities.append({
+            # Invalid device rows are skipped and reported instead of failing the whole sync
+            for chunk in _chunked(DEVICE_RECORD_VALIDATOR.filter(device_data, reject), chunk_size):
+                rows = [{
+                    "user_id": device_record['user_id'],
+                    "date": device_record['date'],
                     "activity_type": device_record['activity_type'],
                     "value": device_record['value'],
-                    "unit": device_record['unit']
-                })
+                    "unit": device_record['unit'],
+                    "created_at": created_at
+                } for device_record in chunk]
+                
+                # Device rows normally belong to the syncing user, but each row goes to its own user's shard
+                for bind_key, shard_rows in group_by_shard(rows).items():
+                    with use_bind(bind_key):
+                        db.session.execute(WellnessActivity.__table__.insert(), shard_rows)
+                
+                for row in rows:
+                    key = (row['user_id'], row['date'], row['activity_type'])
+                    if key in daily_totals:
+                        daily_totals[key]['value'] += row['value']
+                    else:
+                        daily_totals[key] = dict(row)
+                
+                synced_count += len(rows)
+                synced_users.update(row['user_id'] for row in rows)
+                summary_delta(((row['activity_type'], row['value'], row['unit']) for row in rows), delta)
+                synced_activities.extend({
+                    "activity_type": row['activity_type'],
+                    "value": row['value'],
+                    "unit": row['unit']
+                } for row in rows[:preview_size - len(synced_activities)])
             
             # Record sync status
             sync_record = DeviceSync(
                 user_id=user_id,
-                sync_date=date.today()
+                sync_date=datetime.now(user_zone(user_id)).date()
             )
             db.session.add(sync_record)
             
+            record_metrics(daily_totals.values())
+            events = [(user_id, {
+                "type": "sync",
+                "synced_count": synced_count,
+                "summary_delta": delta
+            })]
+            staged = stage_events(current_app, events)
             db.session.commit()
-            
-            return {
-                "success": True,
-                "synced_activities": synced_activities
-            }
         except Exception as e:
             db.session.rollback()
             raise e
+        
+        # Bulk inserts do not report row ids, so hot users are reloaded from the database
+        _invalidate_hot(synced_users)
+        _deliver(events, staged)
+        return {
+            "success": True,
+            "synced_count": synced_count,
+            "synced_activities": synced_activities,
+            "rejected_count": rejected_count,
+            "rejected": rejected
+        }
+    
+    @staticmethod
+    def sync_user_device(user_id):
+        """Fetch a user's device data and sync it; concurrent syncs for the same user run once
+
+        The download is spooled before the sync starts, so a slow device API
+        never holds the database write transaction open.
+        """
+        return _single_flight().do(
+            ('sync', user_id),
+            lambda: ActivityService.sync_device_data(user_id, spool_records(stream_device_records(user_id)))
+        )
     
     @staticmethod
+    @shard_by_user
     def get_sync_status(user_id):
         """Get device sync status"""
         try:
-            sync_record = DeviceSync.query.filter_by(user_id=user_id).order_by(DeviceSync.last_sync_at.desc()).first()
+            sync_record = db.session.query(
+                DeviceSync.sync_date,
+                DeviceSync.last_sync_at
+            ).filter(DeviceSync.user_id == user_id).order_by(DeviceSync.last_sync_at.desc()).first()
             
             if sync_record:
                 return {
@@ -0,0 +1,134 @@
+import itertools
+import threading
+import uuid
+from collections import OrderedDict, deque
+
+
+class ChangeFeed:
+    """Per-user change feed interface.
+
+    Events get a feed-wide increasing sequence number which clients use as a
+    cursor; implementations backed by a shared broker must keep that contract.
+    `epoch` names the sequence space: cursors handed out under another epoch
+    (a restarted process, another worker) are stale. None means sequences
+    never restart.
+    """
+
+    epoch = None
+
+    def publish(self, user_id, event):
+        """Publish an event for a user, returns its sequence number"""
+        raise NotImplementedError
+
+    def latest_cursor(self):
+        """Cursor positioned after every event published so far"""
+        raise NotImplementedError
+
+    def wait_for_events(self, user_id, cursor, timeout):
+        """Return (events, cursor, reset) for events after `cursor`, waiting up to `timeout` seconds.
+
+        `events` is a list of (sequence, event); `reset` is True when events
+        after the cursor were already dropped, or the cursor is ahead of the
+        feed, and the client should refetch.
+        """
+        raise NotImplementedError
+
+
+class _UserChannel:
+    def __init__(self, history):
+        self.events = deque(maxlen=history)
+        self.dropped_through = 0
+
+
+class InProcessChangeFeed(ChangeFeed):
+    """Change feed for a single process, keeping recent events per user for catch-up"""
+
+    def __init__(self, history=100, max_users=10000):
+        self.history = history
+        self.max_users = max_users
+        # Sequences restart with the process, so each feed instance is its own epoch
+        self.epoch = uuid.uuid4().hex[:8]
+        self._sequence = itertools.count(1)
+        self._latest = 0
+        # Last sequence of any evicted channel; older cursors may have missed events
+        self._evicted_through = 0
+        self._channels = OrderedDict()
+        self._condition = threading.Condition()
+
+    def publish(self, user_id, event):
+        with self._condition:
+            sequence = next(self._sequence)
+            self._latest = sequence
+            channel = self._channel(user_id)
+            if len(channel.events) == channel.events.maxlen:
+                channel.dropped_through = channel.events[0][0]
+            channel.events.append((sequence, event))
+            self._condition.notify_all()
+        return sequence
+
+    def latest_cursor(self):
+        with self._condition:
+            return self._latest
+
+    def wait_for_events(self, user_id, cursor, timeout):
+        with self._condition:
+            events, reset = self._events_after(user_id, cursor)
+            if not events and not reset and timeout > 0:
+                self._condition.wait_for(lambda: self._has_events_after(user_id, cursor), timeout)
+                events, reset = self._events_after(user_id, cursor)
+            if reset:
+                return [], self._latest, True
+            return events, (events[-1][0] if events else max(cursor, 0)), False
+
+    def _channel(self, user_id):
+        channel = self._channels.get(user_id)
+        if channel is None:
+            channel = self._channels[user_id] = _UserChannel(self.history)
+            channel.dropped_through = self._evicted_through
+            while len(self._channels) > self.max_users:
+                _, evicted = self._channels.popitem(last=False)
+                if evicted.events:
+                    self._evicted_through = max(self._evicted_through, evicted.events[-1][0])
+        else:
+            self._channels.move_to_end(user_id)
+        return channel
+
+    def _has_events_after(self, user_id, cursor):
+        channel = self._channels.get(user_id)
+        return channel is not None and bool(channel.events) and channel.events[-1][0] > cursor
+
+    def _events_after(self, user_id, cursor):
+        # Issued by an earlier feed (before a restart): events since then are unknown
+        if cursor > self._latest:
+            return [], True
+        channel = self._channels.get(user_id)
+        if channel is None:
+            return [], cursor < self._evicted_through
+        if cursor < channel.dropped_through:
+            return [], True
+        return [(sequence, event) for sequence, event in channel.events if sequence > cursor], False
+
+
+def summary_delta(rows, delta=None):
+    """Summarize (activity_type, value, unit) rows the way get_user_summary reports them.
+
+    Pass an existing `delta` to fold further rows into it.
+    """
+    delta = {} if delta is None else delta
+    for activity_type, value, unit in rows:
+        if activity_type not in delta:
+            delta[activity_type] = {
+                "total_value": 0,
+                "unit": unit,
+                "count": 0
+            }
+        delta[activity_type]["total_value"] += value
+        delta[activity_type]["count"] += 1
+    return delta
+
+
+def init_change_feed(app):
+    """Attach the change feed used to push activity updates to stream subscribers"""
+    feed = app.config.get('CHANGE_FEED') or InProcessChangeFeed(app.config.get('CHANGE_FEED_HISTORY', 100))
+    app.extensions['change_feed'] = feed
+    return feed
@@ -0,0 +1,155 @@
+from flask import current_app
+import json
+import tempfile
+
+# Mock API URL
+MOCK_API_BASE = "http://localhost:5001"  # Local mock API service
+
+# Characters read from the response per iteration while parsing
+STREAM_CHUNK_CHARS = 64 * 1024
+# Largest array element or NDJSON line accepted; a malformed one would otherwise buffer the rest of the body
+MAX_ELEMENT_CHARS = 1024 * 1024
+# Spooled device records stay in memory up to this size, then move to a temporary file
+SPOOL_MEMORY_BYTES = 4 * 1024 * 1024
+
+
+class DeviceFetchError(Exception):
+    """Raised when device data cannot be fetched from the device API"""
+
+
+def iter_json_array(chunks, max_element_chars=MAX_ELEMENT_CHARS):
+    """Incrementally parse a JSON array from text chunks, yielding one element at a time.
+
+    Raises ValueError on malformed input, including an element that is still
+    incomplete after `max_element_chars` characters.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    chunks = iter(chunks)
+    exhausted = False
+
+    while True:
+        # Skip whitespace and separators between elements
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError("Expected a JSON array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                # Element split across chunks; read more unless the stream is over
+                if exhausted:
+                    raise
+            else:
+                # Only accept an element once a delimiter follows it, a number may continue in the next chunk
+                if end < len(buffer) and buffer[end] in ' \t\r\n,]' or exhausted:
+                    position = end
+                    yield element
+                    continue
+                if end < len(buffer) and buffer[end] not in '.eE+-0123456789':
+                    raise ValueError(f"Unexpected character after array element at {end}")
+
+        if exhausted:
+            raise ValueError("Unexpected end of JSON array")
+        if len(buffer) - position > max_element_chars:
+            raise ValueError(f"Array element exceeds {max_element_chars} characters")
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            continue
+        # Drop consumed text so the buffer stays around one chunk in size
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_ndjson(chunks, max_line_chars=MAX_ELEMENT_CHARS):
+    """Parse newline-delimited JSON from text chunks, skipping blank lines.
+
+    Raises ValueError on malformed input, including a line longer than
+    `max_line_chars` characters.
+    """
+    pending = ''
+    for chunk in chunks:
+        lines = (pending + chunk).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            if len(line) > max_line_chars:
+                raise ValueError(f"NDJSON line exceeds {max_line_chars} characters")
+            if line.strip():
+                yield json.loads(line)
+        if len(pending) > max_line_chars:
+            raise ValueError(f"NDJSON line exceeds {max_line_chars} characters")
+    if pending.strip():
+        yield json.loads(pending)
+
+
+def spool_records(records, max_memory_bytes=SPOOL_MEMORY_BYTES):
+    """Drain `records` into a temporary file and return an iterator over the copy.
+
+    Lets a sync finish every network read before it opens its database
+    transaction; errors while draining are raised here.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory_bytes, mode='w+', encoding='utf-8')
+    try:
+        for record in records:
+            spool.write(json.dumps(record) + '\n')
+        spool.seek(0)
+    except Exception as e:
+        spool.close()
+        raise e
+    return _read_spool(spool)
+
+
+def _read_spool(spool):
+    with spool:
+        for line in spool:
+            yield json.loads(line)
+
+
+def stream_device_records(user_id):
+    """Stream a user's activity records from the device API without buffering the whole response"""
+    # Imported on first use to keep app startup fast
+    import requests
+
+    device_api_base = current_app.config.get('DEVICE_API_BASE', MOCK_API_BASE)
+    # A connect timeout, and a limit on the wait for each read of the streamed body
+    timeout = (
+        current_app.config.get('DEVICE_API_CONNECT_TIMEOUT', 5),
+        current_app.config.get('DEVICE_API_READ_TIMEOUT', 30)
+    )
+    try:
+        # In production environment, this would call the real device API
+        response = requests.get(
+            f"{device_api_base}/device-activity",
+            params={"user_id": user_id},
+            headers={"Accept": "application/x-ndjson, application/json;q=0.9"},
+            stream=True,
+            timeout=timeout
+        )
+    except Exception as e:
+        raise DeviceFetchError(str(e)) from e
+
+    with response:
+        if response.status_code >= 400:
+            raise DeviceFetchError(f"Device API returned {response.status_code}")
+
+        # iter_content transparently decompresses gzip
+        response.encoding = response.encoding or 'utf-8'
+        chunks = response.iter_content(STREAM_CHUNK_CHARS, decode_unicode=True)
+        try:
+            if response.headers.get('Content-Type', '').startswith('application/x-ndjson'):
+                yield from iter_ndjson(chunks)
+            else:
+                yield from iter_json_array(chunks)
+        except (ValueError, requests.RequestException) as e:
+            raise DeviceFetchError(str(e)) from e
@@ -0,0 +1,269 @@
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from .validation import ACTIVITY_TYPES
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _to_micros(value):
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(micros):
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+class _UserColumns:
+    """One user's recent activities stored column-wise in typed arrays"""
+
+    __slots__ = ('ids', 'days', 'values', 'types', 'units', 'created', 'window_start', 'has_older')
+
+    def __init__(self, window_start, has_older):
+        self.ids = array('q')
+        self.days = array('i')       # date.toordinal()
+        self.values = array('d')
+        self.types = array('H')      # codes into HotActivityStore._strings (at most 65536 entries)
+        self.units = array('H')
+        self.created = array('q')    # created_at, microseconds since the epoch (UTC)
+        self.window_start = window_start
+        self.has_older = has_older
+
+    def nbytes(self):
+        return sum(column.itemsize * len(column) for column in
+                   (self.ids, self.days, self.values, self.types, self.units, self.created))
+
+    def trim(self, window_start):
+        """Drop rows that fell out of the window"""
+        keep = [i for i, day in enumerate(self.days) if day >= window_start]
+        if len(keep) != len(self.days):
+            self.has_older = True
+            for name in ('ids', 'days', 'values', 'types', 'units', 'created'):
+                column = getattr(self, name)
+                setattr(self, name, array(column.typecode, (column[i] for i in keep)))
+        self.window_start = window_start
+
+
+class _StringTableFull(Exception):
+    """Raised when a new string would not fit the store's string table"""
+
+
+class HotActivityStore:
+    """Bounded in-process store of recent activity for frequently read users.
+
+    Users are admitted after `admit_after` reads, loaded once from the database
+    and then kept current by ActivityService write hooks. The store is local to
+    the process, so it must only be enabled where all writes for a user reach
+    the same process (single worker or user-sticky routing).
+
+    Activity types and units are interned into a string table of at most
+    `max_strings` entries, counted against the memory budget. When it is full
+    the store is emptied and starts over from the activity types.
+    """
+
+    def __init__(self, window_days=90, memory_budget_bytes=64 * 1024 * 1024, admit_after=2, max_strings=4096):
+        self.window_days = window_days
+        self.memory_budget_bytes = memory_budget_bytes
+        self.admit_after = admit_after
+        self.max_strings = min(max_strings, 1 << 16)
+        self._users = OrderedDict()
+        self._reads = OrderedDict()
+        self._bytes = 0
+        # Bumped by every write so loads racing a write are discarded
+        self._version = 0
+        self._lock = threading.RLock()
+        self._reset()
+
+    def window_start(self, today):
+        return today.toordinal() - self.window_days + 1
+
+    def _code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            if len(self._strings) >= self.max_strings:
+                raise _StringTableFull()
+            code = self._codes[sys.intern(value)] = len(self._strings)
+            self._strings.append(value)
+            self._bytes += sys.getsizeof(value)
+        return code
+
+    def _reset(self):
+        """Drop every user and restart the string table from the known activity types"""
+        self._version += 1
+        self._users.clear()
+        self._strings = []
+        self._codes = {}
+        self._bytes = 0
+        for activity_type in ACTIVITY_TYPES:
+            self._code(activity_type)
+
+    def lookup(self, user_id, today):
+        """Return the user's columns if resident, trimmed to the window ending today"""
+        with self._lock:
+            columns = self._users.get(user_id)
+            if columns is None:
+                return None
+            self._users.move_to_end(user_id)
+            window_start = self.window_start(today)
+            if columns.window_start < window_start:
+                before = columns.nbytes()
+                columns.trim(window_start)
+                self._bytes += columns.nbytes() - before
+            return columns
+
+    def should_admit(self, user_id):
+        """Count a read for a non-resident user, returns True once it is hot enough to load"""
+        with self._lock:
+            reads = self._reads.pop(user_id, 0) + 1
+            if reads >= self.admit_after:
+                return True
+            self._reads[user_id] = reads
+            while len(self._reads) > 100000:
+                self._reads.popitem(last=False)
+            return False
+
+    def version(self):
+        return self._version
+
+    def load(self, user_id, rows, today, has_older, version):
+        """Install a user's window loaded from the database.
+
+        `rows` are (id, date, activity_type, value, unit, created_at) tuples.
+        The load is dropped when any write happened since `version` was read.
+        """
+        columns = _UserColumns(self.window_start(today), has_older)
+        with self._lock:
+            if version != self._version:
+                return False
+            try:
+                for row in rows:
+                    self._append(columns, row)
+            except _StringTableFull:
+                self._reset()
+                return False
+            self._users[user_id] = columns
+            self._bytes += columns.nbytes()
+            self._evict()
+        return True
+
+    def record(self, user_id, rows):
+        """Write hook: add committed rows for a resident user, skipping rows it already holds"""
+        with self._lock:
+            self._version += 1
+            columns = self._users.get(user_id)
+            if columns is None:
+                return
+            # A load that started before the write may already have read these rows
+            known = set(columns.ids)
+            before = columns.nbytes()
+            try:
+                for row in rows:
+                    if row[0] in known:
+                        continue
+                    if row[1].toordinal() < columns.window_start:
+                        columns.has_older = True
+                    else:
+                        self._append(columns, row)
+            except _StringTableFull:
+                self._reset()
+                return
+            self._bytes += columns.nbytes() - before
+            self._evict()
+
+    def invalidate(self, user_id):
+        """Drop a user, e.g. after rows were written without known ids"""
+        with self._lock:
+            self._version += 1
+            columns = self._users.pop(user_id, None)
+            if columns is not None:
+                self._bytes -= columns.nbytes()
+
+    def memory_usage(self):
+        with self._lock:
+            return self._bytes
+
+    def _append(self, columns, row):
+        activity_id, activity_date, activity_type, value, unit, created_at = row
+        # Encode first, so a full string table leaves the columns untouched
+        type_code, unit_code = self._code(activity_type), self._code(unit)
+        columns.ids.append(activity_id)
+        columns.days.append(activity_date.toordinal())
+        columns.values.append(value)
+        columns.types.append(type_code)
+        columns.units.append(unit_code)
+        columns.created.append(_to_micros(created_at))
+
+    def _evict(self):
+        while self._bytes > self.memory_budget_bytes and self._users:
+            _, columns = self._users.popitem(last=False)
+            self._bytes -= columns.nbytes()
+
+    def read(self, columns, start, read):
+        """Return `read(self, columns)` when the resident window covers `start`, else None.
+
+        The check and the scan run under the store lock, so writes and trims
+        never interleave with them.
+        """
+        with self._lock:
+            if columns.has_older and (start is None or start.toordinal() < columns.window_start):
+                return None
+            return read(self, columns)
+
+    def activities(self, columns, start=None, end=None, activity_type=None):
+        """Rows in [start, end] as response dicts, newest day first"""
+        start = start.toordinal() if start else None
+        end = end.toordinal() if end else None
+        with self._lock:
+            type_code = self._codes.get(activity_type) if activity_type else None
+            if activity_type and type_code is None:
+                return []
+
+            start = columns.window_start if start is None else start
+            strings = self._strings
+            days = columns.days
+            matches = [i for i in range(len(days))
+                       if days[i] >= start and (end is None or days[i] <= end)
+                       and (type_code is None or columns.types[i] == type_code)]
+            matches.sort(key=lambda i: days[i], reverse=True)
+            return [{
+                "id": columns.ids[i],
+                "date": date.fromordinal(days[i]).isoformat(),
+                "activity_type": strings[columns.types[i]],
+                "value": columns.values[i],
+                "unit": strings[columns.units[i]],
+                "created_at": _from_micros(columns.created[i]).isoformat()
+            } for i in matches]
+
+    def totals(self, columns, start, end):
+        """(activity_type, total_value, count, unit) per type for days in [start, end]"""
+        start, end = start.toordinal(), end.toordinal()
+        totals = {}
+        with self._lock:
+            for i, day in enumerate(columns.days):
+                if start <= day <= end:
+                    code = columns.types[i]
+                    entry = totals.get(code)
+                    if entry is None:
+                        totals[code] = [columns.values[i], 1, columns.units[i]]
+                    else:
+                        entry[0] += columns.values[i]
+                        entry[1] += 1
+            return [(self._strings[code], total, count, self._strings[unit])
+                    for code, (total, count, unit) in totals.items()]
+
+
+def init_hot_store(app):
+    """Create the hot-user activity store when HOT_STORE_ENABLED is set"""
+    if not app.config.get('HOT_STORE_ENABLED'):
+        return None
+
+    store = HotActivityStore(
+        window_days=app.config.get('HOT_STORE_WINDOW_DAYS', 90),
+        memory_budget_bytes=app.config.get('HOT_STORE_MEMORY_BYTES', 64 * 1024 * 1024),
+        admit_after=app.config.get('HOT_STORE_ADMIT_AFTER', 2),
+        max_strings=app.config.get('HOT_STORE_MAX_STRINGS', 4096)
+    )
+    app.extensions['hot_store'] = store
+    return store
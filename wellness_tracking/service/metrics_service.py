@@ -0,0 +1,336 @@
+import atexit
+import copy
+import threading
+from datetime import date, datetime
+from flask import current_app
+import sqlalchemy as sa
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from ..repository import db, UserMetrics, WellnessActivity, fan_out, group_by_shard, shard_by_user, use_bind, use_shard
+from .user_calendar import user_zone
+
+# Daily totals kept per activity type, enough for the longest rolling average
+WINDOW_DAYS = 30
+
+# Daily goal per activity type, in the unit the activity is logged in; override with ACTIVITY_GOALS
+DEFAULT_GOALS = {
+    "meditation": 10.0,
+    "workout": 30.0,
+    "hydration": 2.0,
+    "sleep": 7.0,
+    "running": 20.0,
+    "walking": 30.0
+}
+
+
+def _apply(state, activity_type, unit, day, value):
+    """Fold one (day ordinal, value) into the state, returns False when it needs a rebuild"""
+    entry = state.get(activity_type)
+    if entry is None:
+        state[activity_type] = [day, 1, 1, [value], unit]
+        return True
+
+    last_day, current, longest, totals, _ = entry
+    if day == last_day:
+        totals[0] += value
+    elif day > last_day:
+        gap = day - last_day
+        totals[:0] = [value] + [0.0] * (min(gap, WINDOW_DAYS) - 1)
+        del totals[WINDOW_DAYS:]
+        current = current + 1 if gap == 1 else 1
+        entry[0], entry[1], entry[2] = day, current, max(longest, current)
+    else:
+        # A backfill only leaves streaks untouched when it lands on a day that was already active
+        offset = last_day - day
+        if offset >= len(totals) or not totals[offset] > 0:
+            return False
+        totals[offset] += value
+    return True
+
+
+def _rebuild(user_id):
+    """Recompute a user's state from the activity table (caller routes to the user's shard)"""
+    rows = db.session.query(
+        WellnessActivity.activity_type,
+        WellnessActivity.date,
+        func.sum(WellnessActivity.value),
+        func.min(WellnessActivity.unit)
+    ).filter(
+        WellnessActivity.user_id == user_id
+    ).group_by(
+        WellnessActivity.activity_type,
+        WellnessActivity.date
+    ).order_by(WellnessActivity.date).all()
+
+    state = {}
+    for activity_type, activity_date, total, unit in rows:
+        _apply(state, activity_type, unit, activity_date.toordinal(), total)
+    return state
+
+
+def _create_state(user_id, state, stale=False):
+    """Insert a user's state row unless one exists, returns False when another writer created it first"""
+    table = UserMetrics.__table__
+    values = {"user_id": user_id, "state": state, "stale": stale, "updated_at": datetime.utcnow()}
+    dialect = db.session.get_bind(mapper=UserMetrics).dialect.name
+    if dialect == 'postgresql':
+        statement = postgresql.insert(table).values(values).on_conflict_do_nothing(index_elements=['user_id'])
+    elif dialect == 'sqlite':
+        statement = sqlite.insert(table).values(values).on_conflict_do_nothing(index_elements=['user_id'])
+    else:
+        statement = table.insert().values(values).prefix_with('IGNORE')
+    return db.session.execute(statement).rowcount == 1
+
+
+def _has_history(user_id, new_rows):
+    """True when the user has activity rows besides the `new_rows` inserted in this transaction"""
+    return db.session.query(WellnessActivity.id).filter(
+        WellnessActivity.user_id == user_id
+    ).offset(new_rows).limit(1).first() is not None
+
+
+def _backfill():
+    return current_app.extensions.get('metrics_backfill')
+
+
+def record_metrics(rows):
+    """Write hook: update derived metrics for rows already inserted in the current transaction.
+
+    `rows` are dicts with user_id, date, activity_type, value and unit; the
+    caller commits. Rebuilding a state from the activity table never happens
+    here: users with history but no state row, and users whose state cannot
+    absorb a row incrementally (an out-of-order backfill), get their row
+    marked stale for the metrics backfill worker.
+    """
+    by_user = {}
+    for row in rows:
+        by_user.setdefault(row['user_id'], []).append(row)
+
+    marked = False
+    for user_id, user_rows in by_user.items():
+        with use_shard(user_id):
+            metrics = db.session.get(UserMetrics, user_id, with_for_update=True)
+            if metrics is None:
+                if _has_history(user_id, len(user_rows)):
+                    if _create_state(user_id, {}, stale=True):
+                        marked = True
+                        continue
+                # A new user: the rebuild only reads the rows of this transaction
+                elif _create_state(user_id, _rebuild(user_id)):
+                    continue
+                # A concurrent first write won; its state lacks our rows, so apply them to it
+                metrics = db.session.get(UserMetrics, user_id, with_for_update=True, populate_existing=True)
+            if metrics.stale:
+                # The backfill worker's rebuild will include these rows
+                continue
+            state = copy.deepcopy(metrics.state)
+            user_rows.sort(key=lambda row: row['date'])
+            for row in user_rows:
+                if not _apply(state, row['activity_type'], row['unit'], row['date'].toordinal(), row['value']):
+                    metrics.stale = True
+                    marked = True
+                    break
+            else:
+                metrics.state = state
+            # Flush while routed, the caller's commit may run outside this user's shard
+            db.session.flush()
+
+    backfill = _backfill()
+    if marked and backfill is not None:
+        backfill.notify()
+
+
+def _rebuild_stale(batch_size):
+    """Rebuild stale state rows on the current bind, one transaction per user; returns the number rebuilt"""
+    rebuilt = 0
+    while True:
+        user_ids = db.session.scalars(
+            sa.select(UserMetrics.user_id).where(UserMetrics.stale.is_(True)).limit(batch_size)
+        ).all()
+        db.session.rollback()
+        for user_id in user_ids:
+            try:
+                # Write the row before reading activities: a concurrent write either commits first and is
+                # in the rebuild, or waits for this commit and then applies its rows incrementally
+                claimed = db.session.execute(
+                    sa.update(UserMetrics)
+                    .where(UserMetrics.user_id == user_id, UserMetrics.stale.is_(True))
+                    .values(updated_at=datetime.utcnow())
+                ).rowcount
+                if claimed:
+                    db.session.execute(
+                        sa.update(UserMetrics)
+                        .where(UserMetrics.user_id == user_id)
+                        .values(state=_rebuild(user_id), stale=False, updated_at=datetime.utcnow())
+                    )
+                    rebuilt += 1
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                raise e
+        if len(user_ids) < batch_size:
+            return rebuilt
+
+
+def _mark_missing(user_ids=None):
+    """Add stale state rows on the current bind for `user_ids`, or for every user with activity but no row"""
+    if user_ids is None:
+        user_ids = db.session.scalars(
+            sa.select(WellnessActivity.user_id).distinct().where(
+                ~sa.exists().where(UserMetrics.user_id == WellnessActivity.user_id)
+            )
+        ).all()
+    try:
+        for user_id in user_ids:
+            _create_state(user_id, {}, stale=True)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        raise e
+
+
+class MetricsBackfill:
+    """Background worker that builds metrics state rows out of the write path.
+
+    Writes mark rows stale instead of rebuilding them (see `record_metrics`);
+    the worker rebuilds stale rows every `interval_ms`, or as soon as it is
+    notified, in batches of `batch_size`. Reads of a user without a row ask
+    for one with `request(user_id)`.
+    """
+
+    def __init__(self, app, batch_size=100, interval_ms=1000):
+        self.app = app
+        self.batch_size = batch_size
+        self.interval = interval_ms / 1000
+
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._requested = set()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background worker"""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='metrics-backfill', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the background worker; stale rows stay marked for the next start"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            atexit.unregister(self.stop)
+
+    def notify(self):
+        """Wake the worker instead of waiting for the next interval"""
+        self._wake.set()
+
+    def request(self, user_id):
+        """Ask for a state row for a user that has none"""
+        with self._lock:
+            self._requested.add(user_id)
+        self._wake.set()
+
+    def run_pending(self):
+        """Create requested rows and rebuild every stale row, returns the number of rows rebuilt"""
+        with self._lock:
+            requested, self._requested = self._requested, set()
+        with self._run_lock, self.app.app_context():
+            for bind_key, user_ids in group_by_shard(requested, key=lambda user_id: user_id).items():
+                with use_bind(bind_key):
+                    _mark_missing(user_ids)
+            return sum(fan_out(lambda: _rebuild_stale(self.batch_size)).values())
+
+    def backfill_all(self):
+        """Build state rows for every user with activity but no row, returns the number of rows rebuilt"""
+        with self.app.app_context():
+            fan_out(_mark_missing)
+        return self.run_pending()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.run_pending()
+            except Exception:
+                self.app.logger.exception("Metrics backfill failed")
+
+
+def _window(totals, age, days):
+    """Daily totals of the `days` days ending today, where today is `age` days after the last active day"""
+    return totals[max(-age, 0):max(days - age, 0)]
+
+
+class MetricsService:
+    """Service layer for derived per-user metrics"""
+
+    @staticmethod
+    @shard_by_user
+    def get_metrics(user_id):
+        """Get streaks, rolling averages and goal progress per activity type from the state row"""
+        try:
+            # A missing or stale row is (re)built by the backfill worker; the read itself stays a single lookup
+            metrics = db.session.get(UserMetrics, user_id)
+            if metrics is None:
+                backfill = _backfill()
+                if backfill is not None:
+                    backfill.request(user_id)
+            state = metrics.state if metrics is not None else {}
+            pending = metrics is None or metrics.stale
+
+            goals = dict(DEFAULT_GOALS, **current_app.config.get('ACTIVITY_GOALS', {}))
+            today = datetime.now(user_zone(user_id)).date()
+            result = {}
+            for activity_type, (last_day, current, longest, totals, unit) in state.items():
+                age = today.toordinal() - last_day
+                today_total = totals[-age] if 0 <= -age < len(totals) else 0.0
+                goal = goals.get(activity_type)
+                result[activity_type] = {
+                    "unit": unit,
+                    "last_active_date": date.fromordinal(last_day).isoformat(),
+                    "current_streak": current if age <= 1 else 0,
+                    "longest_streak": longest,
+                    "today_total": today_total,
+                    "rolling_average_7d": round(sum(_window(totals, age, 7)) / 7, 3),
+                    "rolling_average_30d": round(sum(_window(totals, age, 30)) / 30, 3),
+                    "goal": None if goal is None else {
+                        "daily_target": goal,
+                        "completed_today": today_total >= goal,
+                        "progress": round(min(today_total / goal, 1.0), 3) if goal else 1.0,
+                        "days_completed_7d": sum(1 for total in _window(totals, age, 7) if total >= goal)
+                    }
+                }
+
+            return {
+                "user_id": user_id,
+                "as_of": today.isoformat(),
+                "pending": pending,
+                "metrics": result
+            }
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+
+def init_metrics_backfill(app):
+    """Create and start the metrics backfill worker when METRICS_BACKFILL_ENABLED is set"""
+    if not app.config.get('METRICS_BACKFILL_ENABLED'):
+        return None
+
+    backfill = MetricsBackfill(
+        app,
+        batch_size=app.config.get('METRICS_BACKFILL_BATCH_SIZE', 100),
+        interval_ms=app.config.get('METRICS_BACKFILL_INTERVAL_MS', 1000)
+    )
+    app.extensions['metrics_backfill'] = backfill
+    backfill.start()
+    return backfill
@@ -0,0 +1,221 @@
+import atexit
+import threading
+import uuid
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from ..repository import db, OutboxEvent, fan_out, group_by_shard, use_bind
+
+
+class OutboxDispatcher:
+    """Background dispatcher for the transactional outbox.
+
+    Writes add OutboxEvent rows in their own transaction (see `stage_events`);
+    dispatchers drain them in id order, in batches of `batch_size`, and hand
+    each event to every registered consumer. An event is leased to one
+    dispatcher for `lease_seconds` before delivery, so every worker process
+    can run a dispatcher against the same database. Failed events are retried
+    with exponential backoff up to `max_attempts` times; while a user's event
+    waits for its retry or is leased elsewhere, the user's later events are
+    not claimed, so consumers see each user's events in order. Delivery is at
+    least once (a lease that expires mid-delivery is claimed again).
+    """
+
+    def __init__(self, app, batch_size=100, interval_ms=200, max_attempts=8, retry_base_ms=500, lease_seconds=30):
+        self.app = app
+        self.batch_size = batch_size
+        self.interval = interval_ms / 1000
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base_ms / 1000
+        self.lease = timedelta(seconds=lease_seconds)
+        self.consumers = []
+        self.token = uuid.uuid4().hex
+
+        self._dispatch_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def add_consumer(self, consumer):
+        """Register `consumer(event)`, called with {"id", "user_id", "type", "payload"} per event"""
+        self.consumers.append(consumer)
+        return consumer
+
+    def start(self):
+        """Start the background dispatcher"""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='outbox-dispatcher', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the background dispatcher; undelivered events stay in the outbox"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            atexit.unregister(self.stop)
+
+    def notify(self):
+        """Wake the dispatcher after a commit instead of waiting for the next interval"""
+        self._wake.set()
+
+    def dispatch(self):
+        """Deliver one batch per shard, returns the number of events delivered"""
+        with self._dispatch_lock, self.app.app_context():
+            return sum(fan_out(self._drain).values())
+
+    def _claim(self, now):
+        """Lease the next deliverable events to this dispatcher, returns their rows in id order"""
+        table = OutboxEvent.__table__
+        earlier = table.alias('earlier')
+        unleased = sa.or_(table.c.claimed_until.is_(None), table.c.claimed_until < now)
+        candidates = db.session.execute(
+            sa.select(table.c.id, table.c.user_id).where(
+                table.c.attempts < self.max_attempts,
+                table.c.available_at <= now,
+                unleased,
+                # Skip users whose earlier event is backing off or leased to another dispatcher
+                ~sa.exists().where(
+                    earlier.c.user_id == table.c.user_id,
+                    earlier.c.id < table.c.id,
+                    earlier.c.attempts < self.max_attempts,
+                    sa.or_(earlier.c.available_at > now, earlier.c.claimed_until >= now)
+                )
+            ).order_by(table.c.id).limit(self.batch_size)
+        ).all()
+        if not candidates:
+            db.session.rollback()
+            return []
+
+        # Only rows still unleased are taken, a concurrent dispatcher may have won some
+        ids = [event_id for event_id, _ in candidates]
+        db.session.execute(table.update().where(table.c.id.in_(ids), unleased).values(
+            claimed_by=self.token,
+            claimed_until=now + self.lease
+        ))
+        db.session.commit()
+        rows = db.session.execute(
+            sa.select(table.c.id, table.c.user_id, table.c.event_type, table.c.payload, table.c.attempts)
+            .where(table.c.id.in_(ids), table.c.claimed_by == self.token)
+            .order_by(table.c.id)
+        ).all()
+
+        # Events after one another dispatcher won are left for later (released by the caller)
+        won = {row.id for row in rows}
+        first_lost = {}
+        for event_id, user_id in candidates:
+            if event_id not in won:
+                first_lost.setdefault(user_id, event_id)
+        return [row for row in rows if row.id < first_lost.get(row.user_id, row.id + 1)]
+
+    def _drain(self):
+        now = datetime.utcnow()
+        try:
+            rows = self._claim(now)
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+        table = OutboxEvent.__table__
+        delivered = []
+        held_users = set()
+        try:
+            for event_id, user_id, event_type, payload, attempts in rows:
+                # An earlier event of this user failed in this batch
+                if user_id in held_users:
+                    continue
+                try:
+                    event = {"id": event_id, "user_id": user_id, "type": event_type, "payload": payload}
+                    for consumer in self.consumers:
+                        consumer(event)
+                except Exception as e:
+                    attempts += 1
+                    if attempts >= self.max_attempts:
+                        # Left in the table for inspection, the user's later events go ahead
+                        self.app.logger.error("Outbox event %s failed %d times, giving up: %s", event_id, attempts, e)
+                    else:
+                        held_users.add(user_id)
+                        self.app.logger.warning("Outbox event %s failed, will retry: %s", event_id, e)
+                    db.session.execute(table.update().where(table.c.id == event_id).values(
+                        attempts=attempts,
+                        available_at=now + timedelta(seconds=self.retry_base * 2 ** (attempts - 1)),
+                        last_error=str(e)[:500]
+                    ))
+                    continue
+                delivered.append(event_id)
+
+            if delivered:
+                db.session.execute(table.delete().where(table.c.id.in_(delivered)))
+            # Release failed and held-back events for the next claim
+            db.session.execute(table.update().where(table.c.claimed_by == self.token).values(
+                claimed_by=None,
+                claimed_until=None
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        return len(delivered)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                # Keep going while full batches come back
+                while self.dispatch() >= self.batch_size:
+                    pass
+            except Exception:
+                self.app.logger.exception("Outbox dispatch failed")
+
+
+def stage_events(app, events):
+    """Add (user_id, event) pairs to the outbox in the current transaction.
+
+    Returns False when the outbox is disabled and the caller should publish
+    the events itself after committing.
+    """
+    if app.extensions.get('outbox') is None:
+        return False
+
+    now = datetime.utcnow()
+    rows = [{
+        "user_id": user_id,
+        "event_type": event['type'],
+        "payload": event,
+        "created_at": now,
+        "attempts": 0,
+        "available_at": now
+    } for user_id, event in events]
+    for bind_key, shard_rows in group_by_shard(rows).items():
+        with use_bind(bind_key):
+            db.session.execute(OutboxEvent.__table__.insert(), shard_rows)
+    return True
+
+
+def init_outbox(app):
+    """Create and start the outbox dispatcher when OUTBOX_ENABLED is set"""
+    if not app.config.get('OUTBOX_ENABLED'):
+        return None
+
+    dispatcher = OutboxDispatcher(
+        app,
+        batch_size=app.config.get('OUTBOX_BATCH_SIZE', 100),
+        interval_ms=app.config.get('OUTBOX_INTERVAL_MS', 200),
+        max_attempts=app.config.get('OUTBOX_MAX_ATTEMPTS', 8),
+        retry_base_ms=app.config.get('OUTBOX_RETRY_BASE_MS', 500),
+        lease_seconds=app.config.get('OUTBOX_LEASE_SECONDS', 30)
+    )
+
+    # Stream subscribers are the first consumer; more can be added with add_consumer()
+    feed = app.extensions.get('change_feed')
+    if feed is not None:
+        dispatcher.add_consumer(lambda event: feed.publish(event['user_id'], event['payload']))
+
+    app.extensions['outbox'] = dispatcher
+    dispatcher.start()
+    return dispatcher
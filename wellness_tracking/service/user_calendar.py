@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from flask import current_app
+from ..repository import db, UserProfile, use_shard
+
+# How long a worker trusts its cached copy of a user's timezone
+TIMEZONE_CACHE_TTL = 300
+# Users whose timezone a worker keeps cached, least recently used are dropped first
+TIMEZONE_CACHE_SIZE = 10000
+
+
+@lru_cache(maxsize=None)
+def get_zone(name):
+    """Return a (cached) tzinfo for an IANA timezone name"""
+    return ZoneInfo(name)
+
+
+def is_valid_timezone(name):
+    try:
+        get_zone(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return False
+
+
+def local_day(utc_datetime, zone):
+    """Local calendar day of a naive UTC timestamp in the given zone"""
+    return utc_datetime.replace(tzinfo=timezone.utc).astimezone(zone).date()
+
+
+class TimezoneCache:
+    """Bounded LRU map of user id -> timezone name whose entries expire after `ttl` seconds"""
+
+    def __init__(self, max_size=TIMEZONE_CACHE_SIZE, ttl=TIMEZONE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[0]
+
+    def put(self, user_id, name):
+        with self._lock:
+            self._entries[user_id] = (name, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _cache():
+    cache = current_app.extensions.get('timezone_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault('timezone_cache', TimezoneCache(
+            max_size=current_app.config.get('TIMEZONE_CACHE_SIZE', TIMEZONE_CACHE_SIZE)
+        ))
+    return cache
+
+
+def user_zone(user_id):
+    """Return the user's tzinfo, falling back to DEFAULT_TIMEZONE for users without a profile"""
+    cache = _cache()
+    name = cache.get(user_id)
+    if name is not None:
+        return get_zone(name)
+
+    with use_shard(user_id):
+        profile = db.session.get(UserProfile, user_id)
+    name = profile.timezone if profile else current_app.config.get('DEFAULT_TIMEZONE', 'UTC')
+    cache.put(user_id, name)
+    return get_zone(name)
+
+
+def forget_user_zone(user_id):
+    _cache().pop(user_id)
+
+
+def period_window(period, end_date):
+    """Return the (start, end) local days of a summary period ending on end_date"""
+    if period == 'week':
+        return end_date - timedelta(days=7), end_date
+    elif period == 'month':
+        return end_date.replace(day=1), end_date
+    elif period == 'year':
+        return end_date.replace(month=1, day=1), end_date
+    raise ValueError("Invalid period. Must be week, month, or year")
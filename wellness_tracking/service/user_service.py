@@ -0,0 +1,40 @@
+from ..repository import db, UserProfile, shard_by_user
+from .user_calendar import forget_user_zone, is_valid_timezone, user_zone
+
+class UserService:
+    """Service layer for per-user settings"""
+    
+    @staticmethod
+    def get_timezone(user_id):
+        """Get the user's timezone (the default timezone when none was set)"""
+        try:
+            return {
+                "user_id": user_id,
+                "timezone": user_zone(user_id).key
+            }
+        except Exception as e:
+            raise e
+    
+    @staticmethod
+    @shard_by_user
+    def set_timezone(user_id, timezone):
+        """Set the user's timezone; activities logged afterwards are bucketed into its local days"""
+        if not is_valid_timezone(timezone):
+            raise ValueError(f"Invalid timezone: {timezone}")
+        
+        try:
+            profile = db.session.get(UserProfile, user_id)
+            if profile is None:
+                profile = UserProfile(user_id=user_id)
+                db.session.add(profile)
+            profile.timezone = timezone
+            db.session.commit()
+            forget_user_zone(user_id)
+            
+            return {
+                "user_id": user_id,
+                "timezone": profile.timezone
+            }
+        except Exception as e:
+            db.session.rollback()
+            raise e
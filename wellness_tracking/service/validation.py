@@ -0,0 +1,103 @@
+import math
+from datetime import date
+
+# Ordered for error messages, looked up through the frozenset
+ACTIVITY_TYPES = ('meditation', 'workout', 'hydration', 'sleep', 'running', 'walking')
+
+
+class ValidationError(ValueError):
+    """Raised when a record fails validation"""
+
+
+class RecordValidator:
+    """Validator compiled once from a field specification and reused for every record.
+
+    `validate` returns a normalized copy holding only the declared fields
+    (dates parsed to `date`) or raises ValidationError with the first problem.
+    `strings` fields must be non-empty strings and `numbers` finite numbers.
+    """
+
+    def __init__(self, required, choices=None, strings=(), numbers=(), dates=()):
+        self.required = tuple(required)
+        self._required_set = frozenset(self.required)
+        self._choices = tuple(
+            (field, frozenset(allowed), f"Invalid {field.replace('_', ' ')}. Must be one of: {list(allowed)}")
+            for field, allowed in (choices or {}).items()
+        )
+        self._strings = tuple(strings)
+        self._numbers = tuple(numbers)
+        self._dates = tuple(dates)
+
+    def validate(self, record):
+        if not isinstance(record, dict):
+            raise ValidationError("Record must be a JSON object")
+        if not self._required_set <= record.keys():
+            missing = next(field for field in self.required if field not in record)
+            raise ValidationError(f"Missing required field: {missing}")
+
+        for field, allowed, message in self._choices:
+            value = record[field]
+            # Choices are strings; checking the type first keeps unhashable JSON objects/arrays out of the lookup
+            if value.__class__ is not str or value not in allowed:
+                raise ValidationError(message)
+
+        clean = {field: record[field] for field in self.required}
+        for field in self._strings:
+            value = clean[field]
+            if value.__class__ is not str or not value:
+                raise ValidationError(f"Invalid {field}: must be a non-empty string")
+        for field in self._numbers:
+            value = clean[field]
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValidationError(f"Invalid {field}: must be a number")
+            # Flask's JSON parser accepts NaN and Infinity, and huge integers overflow a float column
+            try:
+                finite = math.isfinite(value)
+            except OverflowError:
+                finite = False
+            if not finite:
+                raise ValidationError(f"Invalid {field}: must be a finite number")
+        for field in self._dates:
+            value = clean[field]
+            try:
+                if value.__class__ is not str or len(value) != 10:
+                    raise ValueError
+                clean[field] = date.fromisoformat(value)
+            except ValueError:
+                raise ValidationError(f"Invalid {field}: expected YYYY-MM-DD") from None
+        return clean
+
+    def partition(self, records):
+        """Validate a batch, returns (valid records, [{"index", "error"}] for rejected rows)"""
+        valid = []
+        rejected = []
+        for index, record in enumerate(records):
+            try:
+                valid.append(self.validate(record))
+            except ValidationError as e:
+                rejected.append({"index": index, "error": str(e)})
+        return valid, rejected
+
+    def filter(self, records, on_reject):
+        """Lazily yield valid records from any iterable, calling `on_reject(index, error)` for the rest"""
+        for index, record in enumerate(records):
+            try:
+                yield self.validate(record)
+            except ValidationError as e:
+                on_reject(index, str(e))
+
+
+ACTIVITY_VALIDATOR = RecordValidator(
+    required=('user_id', 'activity_type', 'value', 'unit'),
+    choices={'activity_type': ACTIVITY_TYPES},
+    strings=('user_id', 'unit'),
+    numbers=('value',)
+)
+
+DEVICE_RECORD_VALIDATOR = RecordValidator(
+    required=('user_id', 'date', 'activity_type', 'value', 'unit'),
+    choices={'activity_type': ACTIVITY_TYPES},
+    strings=('user_id', 'unit'),
+    numbers=('value',),
+    dates=('date',)
+)
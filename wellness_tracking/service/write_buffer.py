@@ -0,0 +1,381 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import date, datetime
+from sqlalchemy import exc
+from ..repository import db, WellnessActivity, group_by_shard, use_bind
+from .metrics_service import record_metrics
+
+
+class WriteBufferFull(Exception):
+    """Raised when the write-behind buffer holds `max_pending` rows and cannot take more"""
+    pass
+
+
+class WriteBehindBuffer:
+    """In-process write-behind buffer for activity inserts.
+
+    Writes are acknowledged once appended to the buffer (and, when a journal
+    path is configured, to an append-only journal file). A background thread
+    group-commits buffered rows every `flush_interval_ms` or as soon as
+    `max_rows` are pending. Journaled rows that were not committed before a
+    crash are replayed on the next start; rows are delivered at least once.
+
+    `journal_path` is a prefix shared by every worker: each buffer journals to
+    its own `<journal_path>.<owner>.*` files and holds an exclusive lock on
+    `<journal_path>.<owner>.lock` while it runs, so a starting worker only
+    replays the journals of owners whose lock is free (the process is gone).
+
+    A batch the database rejects because of its data is split until the
+    offending rows are found; those are dead-lettered (logged, kept in
+    `dead_letters()` and appended to `<journal>.dead`) and the rest commit.
+    Appends fail with WriteBufferFull once `max_pending` rows wait, so an
+    unavailable database pushes back on writers instead of growing the buffer.
+    """
+
+    def __init__(self, app, flush_interval_ms=200, max_rows=500, journal_path=None, fsync=False,
+                 max_pending=10000, max_dead_letters=1000):
+        self.app = app
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_rows = max_rows
+        self.max_pending = max_pending
+        self.journal_path = journal_path
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._pending = []
+        self._flushing = []
+        # Seqlock counter: odd while a batch is being committed
+        self._sequence = 0
+        self._generation = 0
+        # Rotated journals of failed flushes, their rows are back in _pending
+        self._retry_journals = []
+        self._dead_letters = deque(maxlen=max_dead_letters)
+        self._journal = None
+        self.owner = None
+        self._owner_lock = None
+        self._thread = None
+
+        if self.journal_path:
+            self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            self._owner_lock = open(self._owner_path('lock'), 'a')
+            _lock_file(self._owner_lock)
+            self._journal = open(self._owner_path('journal'), 'a', encoding='utf-8')
+
+    def start(self):
+        """Start the background flusher"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='write-behind-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the background flusher and flush anything still pending"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            atexit.unregister(self.stop)
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+            # Everything committed: nothing of this owner is left to replay
+            if not self.pending_count() and not self._retry_journals:
+                for suffix in ('journal', 'lock'):
+                    try:
+                        os.remove(self._owner_path(suffix))
+                    except FileNotFoundError:
+                        pass
+            self._owner_lock.close()
+            self._owner_lock = None
+
+    def append(self, record):
+        """Buffer an activity record and return it once it is durable enough to acknowledge"""
+        return self.extend([record])[0]
+
+    def extend(self, records):
+        """Buffer several records at once, all or none; raises WriteBufferFull when they do not fit"""
+        now = datetime.utcnow()
+        records = [dict(record, created_at=record.get('created_at') or now) for record in records]
+        with self._lock:
+            if len(self._pending) + len(self._flushing) + len(records) > self.max_pending:
+                raise WriteBufferFull("Write buffer is full, retry later")
+            if self._journal is not None:
+                self._journal.write(''.join(json.dumps(_to_journal(record)) + '\n' for record in records))
+                self._journal.flush()
+                if self.fsync:
+                    os.fsync(self._journal.fileno())
+            self._pending.extend(records)
+            pending = len(self._pending)
+
+        if pending >= self.max_rows:
+            self._wake.set()
+        return records
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending) + len(self._flushing)
+
+    def dead_letters(self):
+        """Recently dead-lettered rows as [(record, error)], oldest first"""
+        with self._lock:
+            return list(self._dead_letters)
+
+    def read_consistent(self, user_id, query):
+        """Run `query()` and return (result, buffered records for user_id) as one consistent view.
+
+        Uses a seqlock against the flusher so a row is never reported both from
+        the buffer and from the database, nor missed while a batch commits.
+        """
+        for _ in range(3):
+            sequence = self._sequence
+            if sequence % 2:
+                time.sleep(0.001)
+                continue
+            buffered = self._snapshot(user_id)
+            result = query()
+            if self._sequence == sequence:
+                return result, buffered
+
+        # The flusher kept committing underneath us, block it for one read
+        with self._flush_lock:
+            buffered = self._snapshot(user_id)
+            return query(), buffered
+
+    def _snapshot(self, user_id):
+        with self._lock:
+            return [record for record in self._flushing + self._pending if record['user_id'] == user_id]
+
+    def flush(self):
+        """Group-commit everything currently buffered, returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, []
+                rotated = self._rotate_journal()
+
+            self._sequence += 1
+            done = []
+            try:
+                written = self._commit(self._flushing, done)
+            except Exception:
+                # Put the rows that did not commit back in front so the next flush retries them
+                finished = {id(record) for record in done}
+                remaining = [record for record in self._flushing if id(record) not in finished]
+                obsolete = []
+                with self._lock:
+                    self._pending = remaining + self._pending
+                    self._flushing = []
+                    # Keep the rotated journal until the retried rows commit
+                    if rotated:
+                        self._retry_journals.append(rotated)
+                    if done and self._retry_journals:
+                        # Part of the batch committed: journal only the rest, so a restart does not insert it twice
+                        obsolete, self._retry_journals = self._retry_journals, [self._write_retry_journal(remaining)]
+                self._sequence += 1
+                for path in obsolete:
+                    os.remove(path)
+                self.app.logger.exception("Write-behind flush failed, will retry")
+                self._invalidate_hot(done)
+                return 0
+
+            self._invalidate_hot(done)
+            with self._lock:
+                self._flushing = []
+                # The batch included every row of earlier failed flushes
+                committed_journals, self._retry_journals = self._retry_journals, []
+            self._sequence += 1
+
+            if rotated:
+                committed_journals.append(rotated)
+            for path in committed_journals:
+                os.remove(path)
+            return written
+
+    def replay_journal(self):
+        """Commit rows left in journal files by workers that are gone, returns the number of rows"""
+        if not self.journal_path:
+            return 0
+
+        replayed = 0
+        prefix = glob.escape(self.journal_path)
+        with self._flush_lock:
+            for lock_path in sorted(glob.glob(f"{prefix}.*.lock")):
+                owner = lock_path[len(self.journal_path) + 1:-len('.lock')]
+                if owner == self.owner:
+                    continue
+                with open(lock_path, 'a') as owner_lock:
+                    # Held by a running worker, whose journal is not ours to replay
+                    if not _lock_file(owner_lock, blocking=False):
+                        continue
+                    owner_prefix = glob.escape(f"{self.journal_path}.{owner}")
+                    paths = sorted(glob.glob(f"{owner_prefix}.*.flushing"), key=_generation_of)
+                    paths += glob.glob(f"{owner_prefix}.journal")
+                    for path in paths:
+                        with open(path, encoding='utf-8') as f:
+                            rows = [_from_journal(json.loads(line)) for line in f if line.strip()]
+                        if rows:
+                            replayed += self._commit(rows, [])
+                        os.remove(path)
+                    # A retry journal that was never renamed into place duplicates its source
+                    for path in glob.glob(f"{owner_prefix}.*.tmp"):
+                        os.remove(path)
+                    try:
+                        os.remove(lock_path)
+                    except FileNotFoundError:
+                        pass
+        return replayed
+
+    def _commit(self, rows, done):
+        """Insert rows, bisecting batches the database rejects to dead-letter the offending rows.
+
+        Rows are added to `done` as they commit or are dead-lettered, returns
+        the number committed; errors that are not about the data (the
+        database is down) propagate.
+        """
+        try:
+            with self.app.app_context():
+                _insert_rows(rows)
+        except exc.StatementError as e:
+            if not _is_data_error(e):
+                raise e
+            if len(rows) == 1:
+                self._dead_letter(rows[0], e)
+                done.extend(rows)
+                return 0
+            middle = len(rows) // 2
+            return self._commit(rows[:middle], done) + self._commit(rows[middle:], done)
+        done.extend(rows)
+        return len(rows)
+
+    def _dead_letter(self, record, error):
+        self.app.logger.error("Write-behind row rejected by the database, dead-lettered: %s (%s)", record, error)
+        with self._lock:
+            self._dead_letters.append((record, str(error)))
+            if self.journal_path:
+                with open(f"{self.journal_path}.dead", 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(dict(_to_journal(record), error=str(error)[:500])) + '\n')
+
+    def _invalidate_hot(self, records):
+        # Flushed rows have no ids in the hot store yet, so reload those users from the database
+        hot_store = self.app.extensions.get('hot_store')
+        if hot_store is not None:
+            for user_id in {record['user_id'] for record in records}:
+                hot_store.invalidate(user_id)
+
+    def _write_retry_journal(self, records):
+        """Journal the rows of a partially committed flush in a new file (caller holds _lock)"""
+        self._generation += 1
+        path = self._owner_path(f"{self._generation}.flushing")
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(_to_journal(record)) + '\n' for record in records))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+        return path
+
+    def _rotate_journal(self):
+        """Move the live journal aside for the batch being flushed (caller holds _lock)"""
+        if self._journal is None:
+            return None
+        self._generation += 1
+        rotated = self._owner_path(f"{self._generation}.flushing")
+        self._journal.close()
+        os.replace(self._owner_path('journal'), rotated)
+        self._journal = open(self._owner_path('journal'), 'a', encoding='utf-8')
+        return rotated
+
+    def _owner_path(self, suffix):
+        return f"{self.journal_path}.{self.owner}.{suffix}"
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+def _insert_rows(rows):
+    try:
+        for bind_key, shard_rows in group_by_shard(rows).items():
+            with use_bind(bind_key):
+                db.session.execute(WellnessActivity.__table__.insert(), [{
+                    "user_id": row['user_id'],
+                    "date": row['date'],
+                    "activity_type": row['activity_type'],
+                    "value": row['value'],
+                    "unit": row['unit'],
+                    "created_at": row['created_at']
+                } for row in shard_rows])
+        record_metrics(rows)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        raise e
+
+
+def _is_data_error(e):
+    """True when the database rejected the rows themselves, rather than being unreachable"""
+    if isinstance(e, (exc.IntegrityError, exc.DataError)):
+        return True
+    # Parameters that cannot be bound fail before the statement reaches the database
+    return not isinstance(e, exc.DBAPIError)
+
+
+def _lock_file(f, blocking=True):
+    """Take an exclusive lock on an open file, released when the file is closed or the process exits"""
+    import fcntl
+
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _generation_of(path):
+    return int(path.rsplit('.', 2)[-2])
+
+
+def _to_journal(record):
+    return dict(record, date=record['date'].isoformat(), created_at=record['created_at'].isoformat())
+
+
+def _from_journal(record):
+    return dict(record,
+                date=date.fromisoformat(record['date']),
+                created_at=datetime.fromisoformat(record['created_at']))
+
+
+def init_write_buffer(app):
+    """Create and start the write-behind buffer when WRITE_BEHIND_ENABLED is set"""
+    if not app.config.get('WRITE_BEHIND_ENABLED'):
+        return None
+
+    buffer = WriteBehindBuffer(
+        app,
+        flush_interval_ms=app.config.get('WRITE_BEHIND_FLUSH_MS', 200),
+        max_rows=app.config.get('WRITE_BEHIND_MAX_ROWS', 500),
+        journal_path=app.config.get('WRITE_BEHIND_JOURNAL'),
+        fsync=app.config.get('WRITE_BEHIND_FSYNC', False),
+        max_pending=app.config.get('WRITE_BEHIND_MAX_PENDING', 10000)
+    )
+    replayed = buffer.replay_journal()
+    if replayed:
+        app.logger.info("Replayed %d journaled activities", replayed)
+
+    app.extensions['write_buffer'] = buffer
+    buffer.start()
+    return buffer